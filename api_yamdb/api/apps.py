@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .queries import install_dispatch
+        from .throttles import check_shared_cache
+
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
+        connection_created.connect(
+            install_dispatch, dispatch_uid='api.queries'
+        )
@@ -0,0 +1,182 @@
+"""
+Асинхронные версии самых частых запросов чтения для работы под ASGI.
+
+Ответы совпадают с ответами вьюсетов из api.views: те же сериализаторы,
+пагинация и фильтры, но запросы к базе идут через асинхронный ORM, и
+медленный клиент не занимает поток. Всё, что здесь не обрабатывается —
+другие методы, неверные токены, ошибки фильтров — передаётся обычному
+вьюсету.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Avg
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import resolve
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from reviews.models import Review, Title
+from .filters import TitleFilter
+from .profiling import profile_requested
+from .queries import query_budget
+from .serializers import (
+    CommentSerializer,
+    ReviewSerializer,
+    TitleReadSerializer
+)
+from .views import StandardResultsSetPagination
+
+User = get_user_model()
+
+READ_METHODS = ('GET',)
+
+
+class Fallback(Exception):
+    """Запрос должен обработать синхронный вьюсет."""
+
+
+def read_only(view):
+    """
+    Пускает в асинхронную версию только GET с корректным токеном или без
+    него, а остальное отдаёт синхронному вьюсету из ROOT_URLCONF.
+    """
+    @wraps(view)
+    async def wrapper(request, **kwargs):
+        try:
+            if (
+                request.method not in READ_METHODS
+                or profile_requested(request)
+            ):
+                raise Fallback
+            await authenticate(request)
+            return await view(request, **kwargs)
+        except Fallback:
+            match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+            return await sync_to_async(match.func)(
+                request, *match.args, **match.kwargs
+            )
+        except Http404 as error:
+            return render({'detail': str(error)}, status=404)
+
+    return wrapper
+
+
+async def authenticate(request):
+    """
+    Проверяет JWT так же, как JWTAuthentication. Чтение доступно всем,
+    поэтому пользователь не нужен, важно лишь не пропустить неверный
+    токен: ответ 401 на него собирает синхронный вьюсет.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return
+    try:
+        token = authentication.get_validated_token(raw_token)
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        raise Fallback
+    user = await User.objects.filter(
+        **{jwt_settings.USER_ID_FIELD: user_id}
+    ).only('is_active').afirst()
+    if user is None or not user.is_active:
+        raise Fallback
+
+
+def render(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status,
+        content_type='application/json'
+    )
+
+
+async def paginate(request, queryset, serializer_class, pagination_class):
+    """Страница в формате pagination_class.get_paginated_response."""
+    pagination = pagination_class()
+    pagination.request = Request(request)
+    paginator = Paginator(
+        queryset, pagination.get_page_size(pagination.request)
+    )
+    # Число строк считается асинхронно, дальше Paginator не ходит в базу.
+    paginator.count = await queryset.acount()
+    try:
+        page = paginator.page(
+            pagination.get_page_number(pagination.request, paginator)
+        )
+    except InvalidPage:
+        return render({'detail': 'Invalid page.'}, status=404)
+    page.object_list = [obj async for obj in page.object_list]
+    pagination.page = page
+    return render({
+        'count': paginator.count,
+        'next': pagination.get_next_link(),
+        'previous': pagination.get_previous_link(),
+        'results': serializer_class(page.object_list, many=True).data,
+    })
+
+
+def titles():
+    return Title.objects.select_related('category').prefetch_related(
+        'genre'
+    ).annotate(rating=Avg('reviews__score')).order_by('name')
+
+
+def filtered_titles(request):
+    # Как и DjangoFilterBackend во вьюсете, фильтры действуют и на
+    # список, и на отдельное произведение.
+    filterset = TitleFilter(request.GET, queryset=titles(), request=request)
+    if not filterset.is_valid():
+        raise Fallback
+    return filterset.qs
+
+
+@query_budget(4)
+@read_only
+async def title_list(request):
+    return await paginate(
+        request, filtered_titles(request), TitleReadSerializer,
+        StandardResultsSetPagination
+    )
+
+
+@query_budget(3)
+@read_only
+async def title_detail(request, title_pk):
+    title = await aget_object_or_404(filtered_titles(request), pk=title_pk)
+    return render(TitleReadSerializer(title).data)
+
+
+@query_budget(4)
+@read_only
+async def review_list(request, title_pk):
+    await aget_object_or_404(Title.objects.only('pk'), pk=title_pk)
+    return await paginate(
+        request,
+        Review.objects.filter(title_id=title_pk).select_related('author'),
+        ReviewSerializer, PageNumberPagination
+    )
+
+
+@query_budget(4)
+@read_only
+async def comment_list(request, title_pk, review_pk):
+    review = await aget_object_or_404(
+        Review.objects.only('pk'), pk=review_pk, title__pk=title_pk
+    )
+    return await paginate(
+        request,
+        review.comments.select_related('author'),
+        CommentSerializer, PageNumberPagination
+    )
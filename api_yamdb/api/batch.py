@@ -0,0 +1,136 @@
+"""
+Выполнение пакета запросов к API за один круг (POST /api/v1/batch/).
+
+Подзапросы не проходят middleware: пользователь берётся из запроса
+пакета и передаётся вьюхам без повторной проверки JWT, а вьюхи ищутся в
+ROOT_URLCONF. Каждый подзапрос выполняется в пуле из BATCH_WORKERS
+потоков со своим соединением с базой и своим учётом запросов к ней
+(QUERY_STATS). Идущие подряд чтения выполняются параллельно, запись — по
+одной, и она видит результат всех предыдущих подзапросов. Исключение в
+подзапросе даёт ответ 500 только этому подзапросу: записи, которые уже
+выполнены, в ответе пакета видны всегда.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, connection
+from django.urls import Resolver404, resolve
+
+from .queries import QueryStats, check_budget, isolated
+
+logger = logging.getLogger('django.request')
+
+READ_METHODS = ('GET', 'HEAD')
+SERVER_ERROR = {
+    'status': 500, 'body': {'detail': 'Внутренняя ошибка сервера.'}
+}
+# Заголовки запроса пакета, которые получают подзапросы.
+INHERITED_META = (
+    'HTTP_ACCEPT_LANGUAGE', 'HTTP_HOST', 'HTTP_USER_AGENT',
+    'HTTP_X_FORWARDED_FOR', 'REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT',
+)
+
+executor = ThreadPoolExecutor(
+    settings.BATCH_WORKERS, thread_name_prefix='batch'
+)
+
+
+def sub_request(request, item):
+    """Запрос Django для подзапроса с пользователем из пакета."""
+    path, _, query = item['path'].partition('?')
+    body = b''
+    if item.get('body') is not None:
+        body = json.dumps(item['body']).encode()
+    environ = {
+        key: request.META[key]
+        for key in INHERITED_META if key in request.META
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub = WSGIRequest(environ)
+    if request.user.is_authenticated:
+        # Так DRF берёт пользователя и токен, не проверяя JWT заново.
+        # Анониму это не нужно, а без аутентификаторов DRF отвечал бы
+        # ему 403 вместо 401.
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+    return sub
+
+
+def response_body(response):
+    data = getattr(response, 'data', None)
+    if data is not None or not response.content:
+        return data
+    return response.content.decode()
+
+
+def dispatch(request, item):
+    sub = sub_request(request, item)
+    try:
+        sub.resolver_match = resolve(
+            sub.path_info, urlconf=settings.ROOT_URLCONF
+        )
+    except Resolver404:
+        return {'status': 404, 'body': {'detail': 'Страница не найдена.'}}
+    view, args, kwargs = sub.resolver_match
+    stats = QueryStats()
+    # Контекст скопирован из запроса пакета, но его счётчики (метрики,
+    # бюджет пакета) подзапросов не касаются.
+    with isolated(), (
+        stats.capture() if settings.QUERY_STATS else nullcontext()
+    ):
+        response = view(sub, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    if settings.QUERY_STATS:
+        check_budget(sub, stats)
+    return {'status': response.status_code, 'body': response_body(response)}
+
+
+def run(context, request, item):
+    """Подзапрос в потоке пула: соединения живут как у обычного запроса."""
+    close_old_connections()
+    # PRAGMA нового соединения не должны попадать в бюджет вьюхи.
+    connection.ensure_connection()
+    try:
+        return context.run(dispatch, request, item)
+    except Exception:
+        # Как необработанное исключение обычного запроса.
+        logger.exception(
+            'Ошибка подзапроса пакета: %s %s', item['method'], item['path']
+        )
+        return SERVER_ERROR
+    finally:
+        close_old_connections()
+
+
+def submit(request, item):
+    return executor.submit(run, copy_context(), request, item)
+
+
+def run_batch(request, items):
+    """Ответы подзапросов в их порядке."""
+    results = []
+    reads = []
+    for item in items:
+        if item['method'] in READ_METHODS:
+            reads.append(submit(request, item))
+            continue
+        results += [future.result() for future in reads]
+        reads = []
+        results.append(submit(request, item).result())
+    return results + [future.result() for future in reads]
@@ -0,0 +1,148 @@
+"""
+Запись запросов к API для воспроизведения нагрузки.
+
+RequestCaptureMiddleware пишет долю REQUEST_CAPTURE_SAMPLE_RATE запросов
+к API в лог api.capture одной строкой JSON: метод, путь со строкой
+запроса, маршрут, роль пользователя, тело JSON, код и время ответа.
+Токены и заголовки не пишутся, поля тела из REDACTED_FIELDS заменяются
+на '***', а email и имена пользователей в теле и пути — на псевдонимы:
+HMAC с SECRET_KEY, одинаковый для одного значения, так что связанные
+запросы при воспроизведении остаются связанными. Записанный лог
+воспроизводит benchmarks/replay.py.
+"""
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.encoding import escape_uri_path
+
+from api_yamdb.middleware import is_api_request
+from .metrics import route_label
+
+logger = logging.getLogger('api.capture')
+
+REDACTED_FIELDS = frozenset({'password', 'confirmation_code', 'token'})
+MAX_BODY_SIZE = 64 * 1024
+
+
+def pseudonym(value):
+    return 'user-' + salted_hmac('api.capture', value).hexdigest()[:16]
+
+
+# Поле тела и псевдоним, который его заменяет. Псевдонимы проходят
+# валидацию тех же полей, чтобы запись можно было воспроизвести.
+PSEUDONYMIZED_FIELDS = {
+    'username': pseudonym,
+    'email': lambda value: f'{pseudonym(value.lower())}@example.com',
+}
+
+
+def redact(value):
+    """Тело JSON без секретов и персональных данных на любой глубине."""
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        if key in REDACTED_FIELDS:
+            item = '***'
+        elif key in PSEUDONYMIZED_FIELDS and isinstance(item, str):
+            item = PSEUDONYMIZED_FIELDS[key](item)
+        else:
+            item = redact(item)
+        result[key] = item
+    return result
+
+
+def request_body(request):
+    """Тело JSON без секретов; None, если его нет или оно не JSON."""
+    if request.method in ('GET', 'HEAD', 'OPTIONS', 'DELETE'):
+        return None
+    if request.content_type != 'application/json':
+        return None
+    if int(request.META.get('CONTENT_LENGTH') or 0) > MAX_BODY_SIZE:
+        return None
+    try:
+        return redact(json.loads(request.body))
+    except ValueError:
+        return None
+
+
+def request_path(request, match):
+    """Путь со строкой запроса; имя пользователя в нём — псевдоним."""
+    path = request.get_full_path()
+    username = match.kwargs.get('username') if match else None
+    if username:
+        path = path.replace(
+            escape_uri_path(f'/{username}/'), f'/{pseudonym(username)}/', 1
+        )
+    return path
+
+
+def user_role(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.role
+
+
+class RequestCaptureMiddleware:
+    """Пишет выборку запросов к API в лог api.capture."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_CAPTURE_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self, request):
+        return (
+            is_api_request(request)
+            and random.random() < settings.REQUEST_CAPTURE_SAMPLE_RATE
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        # Тело читается до вьюхи: после DRF поток уже прочитан.
+        body = request_body(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.log(request, body, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        body = request_body(request)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.log(request, body, response, time.perf_counter() - started)
+        return response
+
+    def log(self, request, body, response, duration):
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request_path(request, match),
+            'route': route_label(match.route) if match else None,
+            'role': user_role(request),
+            'body': body,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+        }, ensure_ascii=False, default=str))
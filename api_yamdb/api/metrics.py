@@ -0,0 +1,376 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+
+MetricsMiddleware считает запросы по маршрутам, вьюхам и кодам ответа,
+время ответа, число и время запросов к базе, а MeteredCache — попадания в
+кэш. Значения — счётчики, гистограммы хранятся как счётчики корзин.
+
+Без METRICS_DIR значения живут в памяти процесса. С METRICS_DIR каждый
+процесс пишет в свой файл в этом каталоге, отображённый в память: запись —
+это одно сложение на месте, а ручка метрик складывает файлы всех
+процессов. Каталог нужно очищать при перезапуске сервера, иначе счётчики
+продолжатся с прежних значений.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.module_loading import import_string
+
+from .queries import QueryCounter, view_name
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+QUERY_TIME_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1
+)
+
+FAMILIES = {
+    'yamdb_requests_total': (
+        'counter', 'Запросы по маршрутам, вьюхам, методам и кодам ответа.'
+    ),
+    'yamdb_request_duration_seconds': ('histogram', 'Время ответа.'),
+    'yamdb_db_queries_per_request': (
+        'histogram', 'Число запросов к базе на запрос.'
+    ),
+    'yamdb_db_duration_seconds': (
+        'histogram', 'Время запросов к базе на запрос.'
+    ),
+    'yamdb_cache_gets_total': (
+        'counter', 'Чтения из кэша: result="hit" или "miss".'
+    ),
+}
+
+
+class MemoryValues:
+    """Значения одного процесса в словаре."""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+
+    def inc(self, key, amount):
+        self.values[key] += amount
+
+    def items(self):
+        return list(self.values.items())
+
+
+class MmapValues:
+    """
+    Значения одного процесса в файле, отображённом в память. Первые
+    8 байт — занятая длина, дальше записи: длина ключа (4 байта), ключ
+    в UTF-8 с выравниванием до 8 байт и значение float64. Длина
+    обновляется после записи ключа, поэтому читатель из другого процесса
+    не увидит недописанную запись.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.INITIAL_SIZE:
+            self.file.truncate(self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = struct.unpack_from('Q', self.map)[0] or 8
+        self.positions = {
+            key: position
+            for key, _, position in self.entries(self.map, self.used)
+        }
+
+    @staticmethod
+    def entries(data, used):
+        position = 8
+        while position < used:
+            length = struct.unpack_from('i', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode()
+            position += (4 + length + 7) // 8 * 8
+            yield key, struct.unpack_from('d', data, position)[0], position
+            position += 8
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < 8:
+            return []
+        used = struct.unpack_from('Q', data)[0]
+        return [(key, value) for key, value, _ in cls.entries(data, used)]
+
+    def inc(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self.append(key)
+        value = struct.unpack_from('d', self.map, position)[0]
+        struct.pack_into('d', self.map, position, value + amount)
+
+    def append(self, key):
+        data = key.encode()
+        position = self.used + (4 + len(data) + 7) // 8 * 8
+        if position + 8 > len(self.map):
+            self.grow(position + 8)
+        struct.pack_into(
+            f'i{len(data)}s', self.map, self.used, len(data), data
+        )
+        struct.pack_into('d', self.map, position, 0.0)
+        self.used = position + 8
+        struct.pack_into('Q', self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def items(self):
+        return self.read(self.file.name)
+
+
+class Metrics:
+    """Счётчики и гистограммы поверх хранилища значений процесса."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.pid = None
+        self.store = None
+        self.keys = {}
+
+    def values(self):
+        # После fork у процесса должен быть свой файл.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            if self.directory:
+                self.store = MmapValues(
+                    os.path.join(self.directory, f'metrics-{self.pid}.db')
+                )
+            else:
+                self.store = MemoryValues()
+        return self.store
+
+    def key(self, name, labels):
+        # Строки ключей собираются один раз на серию.
+        series = (name, *labels.items())
+        key = self.keys.get(series)
+        if key is None:
+            key = self.keys[series] = json.dumps(
+                [name, labels], ensure_ascii=False
+            )
+        return key
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.values().inc(self.key(name, labels), amount)
+
+    def observe(self, name, labels, value, buckets):
+        bucket = next(
+            (str(bound) for bound in buckets if value <= bound), '+Inf'
+        )
+        with self.lock:
+            values = self.values()
+            values.inc(self.key(f'{name}_bucket', {**labels, 'le': bucket}), 1)
+            values.inc(self.key(f'{name}_sum', labels), value)
+
+    def collect(self):
+        """Значения всех процессов: {(имя, метки): сумма}."""
+        if not self.directory:
+            with self.lock:
+                pairs = self.values().items()
+        else:
+            pairs = [
+                pair
+                for filename in sorted(os.listdir(self.directory))
+                if filename.startswith('metrics-')
+                for pair in MmapValues.read(
+                    os.path.join(self.directory, filename)
+                )
+            ]
+        totals = defaultdict(float)
+        for key, value in pairs:
+            name, labels = json.loads(key)
+            totals[name, tuple(sorted(labels.items()))] += value
+        return totals
+
+    def render(self):
+        """Текст для Prometheus."""
+        samples = defaultdict(list)
+        for (name, labels), value in self.collect().items():
+            samples[name].append((dict(labels), value))
+        lines = []
+        for family, (kind, description) in FAMILIES.items():
+            lines += [
+                f'# HELP {family} {description}',
+                f'# TYPE {family} {kind}',
+            ]
+            if kind == 'histogram':
+                lines += histogram_lines(family, samples)
+            else:
+                lines += [
+                    sample_line(family, labels, value)
+                    for labels, value in sorted(
+                        samples[family], key=sort_key
+                    )
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+def sort_key(sample):
+    return sorted(sample[0].items())
+
+
+def sample_line(name, labels, value):
+    text = ','.join(
+        f'{key}="{escape(value)}"' for key, value in labels.items()
+    )
+    value = int(value) if value == int(value) else repr(value)
+    return f'{name}{{{text}}} {value}' if text else f'{name} {value}'
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+def histogram_lines(family, samples):
+    """Корзины хранятся по отдельности, Prometheus ждёт накопленные."""
+    series = defaultdict(dict)
+    for labels, count in samples[f'{family}_bucket']:
+        bound = labels.pop('le')
+        series[tuple(sorted(labels.items()))][bound] = count
+    sums = {
+        tuple(sorted(labels.items())): value
+        for labels, value in samples[f'{family}_sum']
+    }
+    lines = []
+    for labels, counts in sorted(series.items()):
+        labels = dict(labels)
+        bounds = sorted(
+            counts, key=lambda bound: float('inf') if bound == '+Inf'
+            else float(bound)
+        )
+        if '+Inf' not in counts:
+            bounds.append('+Inf')
+        total = 0
+        for bound in bounds:
+            total += counts.get(bound, 0)
+            lines.append(sample_line(
+                f'{family}_bucket', {**labels, 'le': bound}, total
+            ))
+        lines.append(sample_line(
+            f'{family}_sum', labels, sums.get(tuple(labels.items()), 0)
+        ))
+        lines.append(sample_line(f'{family}_count', labels, total))
+    return lines
+
+
+metrics = Metrics(settings.METRICS_DIR)
+
+ROUTE_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+@lru_cache(maxsize=None)
+def route_label(route):
+    """Маршрут роутера DRF без синтаксиса регулярных выражений."""
+    return ROUTE_GROUP.sub(r'<\1>', route).replace('^', '').replace('$', '')
+
+
+def record_request(request, response, duration, queries):
+    match = getattr(request, 'resolver_match', None)
+    labels = {
+        'route': route_label(match.route) if match else '',
+        'view': view_name(match.func, request.method) if match else '',
+    }
+    metrics.inc('yamdb_requests_total', {
+        **labels, 'method': request.method,
+        'status': str(response.status_code),
+    })
+    metrics.observe(
+        'yamdb_request_duration_seconds', labels, duration, LATENCY_BUCKETS
+    )
+    metrics.observe(
+        'yamdb_db_queries_per_request', labels, queries.count,
+        QUERY_COUNT_BUCKETS
+    )
+    metrics.observe(
+        'yamdb_db_duration_seconds', labels, queries.duration,
+        QUERY_TIME_BUCKETS
+    )
+
+
+class MetricsMiddleware:
+    """Записывает метрики каждого запроса."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with QueryCounter().capture() as queries:
+            response = self.get_response(request)
+        record_request(
+            request, response, time.perf_counter() - started, queries
+        )
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with QueryCounter().capture() as queries:
+            response = await self.get_response(request)
+        record_request(
+            request, response, time.perf_counter() - started, queries
+        )
+        return response
+
+
+class MeteredCache:
+    """
+    Бэкенд кэша, который считает попадания и промахи get и передаёт всё
+    бэкенду из OPTIONS['BACKEND'] с остальными OPTIONS.
+    """
+
+    missing = object()
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        self.cache = backend(location, {**params, 'OPTIONS': options})
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, self.missing, version)
+        if value is self.missing:
+            metrics.inc('yamdb_cache_gets_total', {'result': 'miss'})
+            return default
+        metrics.inc('yamdb_cache_gets_total', {'result': 'hit'})
+        return value
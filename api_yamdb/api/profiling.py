@@ -0,0 +1,212 @@
+"""
+Профилирование отдельного запроса по требованию администратора.
+
+Запрос администратора к вьюсету с ?profile=1 или заголовком X-Profile: 1
+выполняется под cProfile, и вместо ответа возвращается JSON: код и время
+исходного ответа, самые дорогие функции, дерево вызовов и список SQL с
+длительностями. Профилируется всё после проверки прав: обработчик
+действия и рендеринг. С PROFILE_DIR профиль ещё сохраняется в файл .prof
+для pstats или snakeviz.
+
+Для остальных пользователей параметр ничего не меняет, а запросы без него
+обходятся двумя поисками в словаре.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sysconfig
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .permissions import IsAdmin
+from .queries import QueryCounter
+
+TOP_FUNCTIONS = 30
+TREE_DEPTH = 15
+# Ветви дерева дешевле этой доли времени запроса отбрасываются.
+TREE_MIN_SHARE = 0.01
+STDLIB = sysconfig.get_paths()['stdlib'] + os.sep
+
+
+def profile_requested(request):
+    return (
+        request.GET.get('profile') == '1'
+        or request.META.get('HTTP_X_PROFILE') == '1'
+    )
+
+
+class QueryLog(QueryCounter):
+    """QueryCounter, который запоминает каждый запрос и его время."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        duration = self.duration
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'duration_ms': round((self.duration - duration) * 1000, 3),
+            })
+
+
+def function_label(function):
+    filename, line, name = function
+    if filename == '~':
+        # Встроенные функции: имя вида <method 'execute' of ...>.
+        return name
+    if filename.startswith(str(settings.BASE_DIR)):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    elif 'site-packages' in filename:
+        filename = filename.rpartition('site-packages/')[2]
+    else:
+        filename = filename.removeprefix(STDLIB)
+    return f'{filename}:{line}({name})'
+
+
+def top_functions(stats):
+    rows = sorted(
+        stats.items(), key=lambda item: item[1][3], reverse=True
+    )[:TOP_FUNCTIONS]
+    return [
+        {
+            'function': function_label(function),
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+        }
+        for function, (_, calls, own, total, _) in rows
+    ]
+
+
+def call_tree(stats, duration):
+    """Дерево от функций без вызывающих, по времени с вызываемыми."""
+    callees = {function: {} for function in stats}
+    for function, (*_, callers) in stats.items():
+        for caller, (calls, _, _, total) in callers.items():
+            callees.setdefault(caller, {})[function] = (calls, total)
+    roots = {
+        function: (stats[function][1], stats[function][3])
+        for function in stats if not stats[function][4]
+    }
+    return tree_nodes(roots, callees, duration * TREE_MIN_SHARE, ())
+
+
+def tree_nodes(children, callees, threshold, path):
+    if len(path) >= TREE_DEPTH:
+        return []
+    nodes = []
+    for function, (calls, total) in sorted(
+        children.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        if total < threshold or function in path:
+            continue
+        nodes.append({
+            'function': function_label(function),
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'children': tree_nodes(
+                callees.get(function, {}), callees, threshold,
+                (*path, function)
+            ),
+        })
+    return nodes
+
+
+class ProfilingMixin:
+    """Отдаёт администратору профиль запроса вместо ответа."""
+
+    profiler = None
+    profiling_stack = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Необработанное исключение минует finalize_response, а
+            # профилировщик не должен остаться включённым в потоке.
+            self.stop_profiling()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if profile_requested(request) and IsAdmin().has_permission(
+            request, self
+        ):
+            self.start_profiling()
+
+    def start_profiling(self):
+        self.profiler = cProfile.Profile()
+        self.query_log = QueryLog()
+        self.profiling_stack = ExitStack()
+        self.profiling_stack.enter_context(self.query_log.capture())
+        self.profiling_started = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # В потоке уже работает другой профилировщик.
+            self.profiler = None
+            self.profiling_stack.close()
+            self.profiling_stack = None
+
+    def stop_profiling(self):
+        """
+        Выключает профилировщик и учёт запросов к базе и возвращает
+        длительность профиля. Повторный вызов ничего не делает.
+        """
+        if self.profiling_stack is None:
+            return None
+        self.profiler.disable()
+        duration = time.perf_counter() - self.profiling_started
+        self.profiling_stack.close()
+        self.profiling_stack = None
+        return duration
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.profiler is None:
+            return response
+        response.render()
+        duration = self.stop_profiling()
+        report = self.profile_report(request, response, duration)
+        return HttpResponse(
+            json.dumps(report, ensure_ascii=False, default=str),
+            content_type='application/json'
+        )
+
+    def profile_report(self, request, response, duration):
+        view = f'{type(self).__name__}.{self.action}'
+        stats = pstats.Stats(self.profiler).stats
+        return {
+            'view': view,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': self.query_log.count,
+            'sql_ms': round(self.query_log.duration * 1000, 3),
+            'sql': self.query_log.queries,
+            'functions': top_functions(stats),
+            'tree': call_tree(stats, duration),
+            'file': self.save_profile(view),
+        }
+
+    def save_profile(self, view):
+        if not settings.PROFILE_DIR:
+            return None
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILE_DIR,
+            f'{timezone.now():%Y%m%d-%H%M%S-%f}-{view}.prof'
+        )
+        self.profiler.dump_stats(path)
+        return path
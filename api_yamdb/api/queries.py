@@ -0,0 +1,215 @@
+"""
+Учёт запросов к базе на каждый запрос к API.
+
+QueryStatsMiddleware (включается настройкой QUERY_STATS) считает запросы,
+время в базе и повторяющиеся запросы и пишет в лог api.queries, если
+действие вьюсета вышло за свой бюджет. Бюджеты объявляются во вьюсетах
+словарём query_budgets (действие — число запросов), у функций-вьюх —
+декоратором query_budget. Бюджет считается для авторизованного
+пользователя и не зависит от размера страницы: рост числа запросов вместе
+с числом объектов — это N+1.
+
+Счётчики не ставятся на соединения каждого запроса: у любого соединения
+с базой при подключении появляется один execute_wrapper, который
+передаёт запрос счётчикам из ContextVar. Контекст запроса переходит и в
+поток sync_to_async, где работает асинхронный ORM, поэтому асинхронным
+middleware не нужно переходить в этот поток, чтобы начать учёт.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger('api.queries')
+# execute_wrapper'ы, которым передаются запросы к базе в этом контексте.
+collectors = ContextVar('query_collectors', default=())
+
+
+def query_budget(count):
+    """Бюджет запросов к базе для функции-вьюхи."""
+    def decorator(view):
+        view.query_budget = count
+        return view
+
+    return decorator
+
+
+def dispatch(execute, sql, params, many, context):
+    """
+    execute_wrapper соединения: передаёт запрос счётчикам контекста.
+
+    Счётчик с непустым списком pending, например журнал медленных
+    запросов, после всей цепочки получает вызов flush(): его собственные
+    запросы к базе не попадают ни в число, ни во время запросов вьюхи.
+    """
+    wrappers = collectors.get()
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    result = execute(sql, params, many, context)
+    deferred = [
+        wrapper for wrapper in wrappers if getattr(wrapper, 'pending', None)
+    ]
+    if deferred:
+        with isolated():
+            for wrapper in deferred:
+                wrapper.flush()
+    return result
+
+
+def install_dispatch(sender, connection, **kwargs):
+    """Обработчик connection_created: ставит dispatch на соединение."""
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch)
+
+
+@contextmanager
+def capture(wrapper):
+    """
+    Передаёт wrapper запросы к базе из текущего контекста, в том числе
+    из потоков sync_to_async, которые он запускает.
+    """
+    token = collectors.set((*collectors.get(), wrapper))
+    try:
+        yield wrapper
+    finally:
+        collectors.reset(token)
+
+
+@contextmanager
+def isolated():
+    """Запросы к базе внутри не попадают в счётчики внешнего контекста."""
+    token = collectors.set(())
+    try:
+        yield
+    finally:
+        collectors.reset(token)
+
+
+def view_name(view, method):
+    """Имя вьюхи из resolver_match.func, у вьюсета — с действием."""
+    actions = getattr(view, 'actions', None)
+    if actions:
+        action = actions.get(method.lower(), method.lower())
+        return f'{view.cls.__name__}.{action}'
+    return getattr(view, 'cls', view).__name__
+
+
+def view_budget(view, method):
+    """
+    Имя действия и его бюджет для вьюхи из resolver_match.func. Бюджета
+    нет — None.
+    """
+    name = view_name(view, method)
+    if getattr(view, 'actions', None):
+        action = name.rpartition('.')[2]
+        budgets = getattr(view.cls, 'query_budgets', {})
+        return name, budgets.get(action)
+    return name, getattr(view, 'query_budget', None)
+
+
+class QueryCounter:
+    """Число и время запросов к базе, выполненных внутри capture()."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+    def capture(self):
+        return capture(self)
+
+
+class QueryStats(QueryCounter):
+    """QueryCounter, который ещё запоминает SQL для поиска повторов."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements[sql] += 1
+        self.executions[sql, repr(params)] += 1
+        return super().__call__(execute, sql, params, many, context)
+
+    def repeated(self):
+        """Один и тот же SQL с разными параметрами — признак N+1."""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count > 1
+        ]
+
+    def duplicates(self):
+        """Запросы, выполненные несколько раз с теми же параметрами."""
+        return sum(
+            count - 1 for count in self.executions.values() if count > 1
+        )
+
+    def describe(self):
+        lines = [
+            f'{self.count} запросов, {self.duration * 1000:.1f} мс, '
+            f'дубликатов {self.duplicates()}'
+        ]
+        lines += [
+            f'  {count} × {sql[:200]}' for sql, count in self.repeated()
+        ]
+        return '\n'.join(lines)
+
+
+def check_budget(request, stats):
+    """Пишет в лог api.queries, уложилась ли вьюха запроса в бюджет."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return
+    name, budget = view_budget(match.func, request.method)
+    if budget is not None and stats.count > budget:
+        logger.warning(
+            '%s %s: бюджет %s запросов превышен\n%s', name,
+            request.path, budget, stats.describe()
+        )
+    else:
+        logger.debug('%s %s: %s', name, request.path, stats.describe())
+
+
+class QueryStatsMiddleware:
+    """Считает запросы к базе и проверяет бюджеты вьюсетов."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.query_stats = stats = QueryStats()
+        with stats.capture():
+            response = self.get_response(request)
+        check_budget(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        request.query_stats = stats = QueryStats()
+        with stats.capture():
+            response = await self.get_response(request)
+        check_budget(request, stats)
+        return response
@@ -1,8 +1,12 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.db.models import Q
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import AccessToken
@@ -16,6 +20,7 @@ from reviews.models import (
     Comment
 )
 
+from users.mail import queue_mail
 from users.models import UserNameValidator
 
 MIN_YEAR = settings.MIN_YEAR
@@ -30,6 +35,26 @@ class BaseUserSerializer(serializers.ModelSerializer):
                 'Имя "me" запрещено в качестве username')
         return value
 
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def find_taken(self, username, email):
+        """
+        Одним запросом по уникальным индексам находит пользователей,
+        занявших username или email.
+        """
+        lookup = Q()
+        if username:
+            lookup |= Q(username=username)
+        if email:
+            lookup |= Q(email=email)
+        if not lookup:
+            return []
+        users = User.objects.filter(lookup).order_by()
+        if self.instance is not None:
+            users = users.exclude(pk=self.instance.pk)
+        return list(users[:2])
+
 
 class SignUpSerializer(BaseUserSerializer):
     username = serializers.CharField(
@@ -42,24 +67,23 @@ class SignUpSerializer(BaseUserSerializer):
         fields = ('email', 'username')
         extra_kwargs = {
             'username': {'required': True},
-            'email': {'required': True}
+            # Занятость email проверяется в validate вместе с username.
+            'email': {'required': True, 'validators': []}
         }
 
     def validate(self, data):
         username = data['username']
         email = data['email']
+        self.existing_user = None
 
-        users = User.objects.filter(
-            Q(username=username) | Q(email=email)
-        )
-
-        for user in users:
+        for user in self.find_taken(username, email):
             if user.username == username and user.email != email:
                 raise serializers.ValidationError(
                     {'username': 'Введенный username занят'})
             if user.email == email and user.username != username:
                 raise serializers.ValidationError(
                     {'email': 'Введенный email занят'})
+            self.existing_user = user
 
         return data
 
@@ -67,38 +91,37 @@ class SignUpSerializer(BaseUserSerializer):
         email = validated_data['email']
         username = validated_data['username']
 
-        user, created = User.objects.get_or_create(
-            email=email,
-            defaults={
-                'username': username,
-                'is_active': False
-            }
-        )
+        try:
+            # Пользователь и письмо в очереди сохраняются вместе.
+            with transaction.atomic():
+                user = self._upsert_user(email, username)
+                token = default_token_generator.make_token(user)
+                self._send_confirmation_email(email, token)
+        except IntegrityError:
+            # Тот же username или email успели занять параллельно.
+            raise serializers.ValidationError(
+                {'detail': 'Введенный username или email занят'})
+        return user
 
-        if not created:
-            user.username = username
+    def _upsert_user(self, email, username):
+        user = self.existing_user
+        if user is None:
+            return User.objects.create(
+                email=email,
+                username=username,
+                is_active=False
+            )
+        if user.is_active:
+            User.objects.filter(pk=user.pk).update(is_active=False)
             user.is_active = False
-            user.save()
-
-        token = default_token_generator.make_token(user)
-
-        self._send_confirmation_email(email, token)
         return user
 
     def _send_confirmation_email(self, email, token):
-        subject = 'Код подтверждения для регистрации'
-        message = f'Ваш код подтверждения: {token}'
-
-        try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f'Ошибка отправки email: {e}')
+        queue_mail(
+            subject='Код подтверждения для регистрации',
+            message=f'Ваш код подтверждения: {token}',
+            recipient=email,
+        )
 
 
 class TokenObtainSerializer(serializers.Serializer):
@@ -110,19 +133,38 @@ class TokenObtainSerializer(serializers.Serializer):
         confirmation_code = data['confirmation_code']
 
         try:
-            user = User.objects.get(username=username)
+            user = User.objects.only(
+                'password', 'last_login', 'email', 'is_active'
+            ).get(username=username)
         except User.DoesNotExist:
             raise NotFound({'detail': 'Неверные данные'})
 
         if not default_token_generator.check_token(user, confirmation_code):
             raise serializers.ValidationError('Неверный код подтверждения')
 
-        user.is_active = True
-        user.save()
+        if not user.is_active:
+            User.objects.filter(pk=user.pk).update(is_active=True)
+            user.is_active = True
 
-        data['access_token'] = str(AccessToken.for_user(user))
+        data['access_token'] = self._issue_token(user, confirmation_code)
         return data
 
+    def _issue_token(self, user, confirmation_code):
+        """
+        Выдаёт JWT, повторяя недавно выданный токен на тот же код,
+        если включён TOKEN_CACHE_TIMEOUT.
+        """
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if not timeout:
+            return str(AccessToken.for_user(user))
+        digest = hashlib.sha256(confirmation_code.encode()).hexdigest()
+        key = f'access-token:{user.pk}:{digest}'
+        token = cache.get(key)
+        if token is None:
+            token = str(AccessToken.for_user(user))
+            cache.set(key, token, timeout)
+        return token
+
 
 class UserSerializer(BaseUserSerializer):
     """Сериализатор для пользователей."""
@@ -133,9 +175,11 @@ class UserSerializer(BaseUserSerializer):
             'username', 'email', 'first_name',
             'last_name', 'bio', 'role'
         )
+        # Уникальность username и email проверяется в validate
+        # одним запросом.
         extra_kwargs = {
-            'username': {'required': True},
-            'email': {'required': True},
+            'username': {'required': True, 'validators': [UserNameValidator]},
+            'email': {'required': True, 'validators': []},
         }
 
     def create(self, validated_data):
@@ -143,16 +187,15 @@ class UserSerializer(BaseUserSerializer):
         return super().create(validated_data)
 
     def validate(self, data):
-        if self.instance is None:
-            username = data.get('username')
-            email = data.get('email')
+        username = data.get('username')
+        email = data.get('email')
 
-            if User.objects.filter(username=username).exists():
+        for user in self.find_taken(username, email):
+            if user.username == username:
                 raise serializers.ValidationError({
                     'username': 'Пользователь с таким username уже существует'
                 })
-
-            if User.objects.filter(email=email).exists():
+            if user.email == email:
                 raise serializers.ValidationError({
                     'email': 'Пользователь с таким email уже существует'
                 })
@@ -267,3 +310,34 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Подзапрос пакета."""
+
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'POST', 'PATCH', 'DELETE')
+    )
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True)
+
+    def validate_path(self, value):
+        if not value.startswith(settings.API_PATH_PREFIX):
+            raise serializers.ValidationError('Подзапрос должен вести к API.')
+        if value.partition('?')[0] == reverse('batch'):
+            raise serializers.ValidationError('Пакеты нельзя вкладывать.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет подзапросов для POST /api/v1/batch/."""
+
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_REQUESTS} подзапросов '
+                'в пакете.'
+            )
+        return value
@@ -0,0 +1,112 @@
+"""
+Журнал медленных запросов к базе.
+
+SlowQueryMiddleware на время каждого запроса к приложению передаёт
+запросы к базе SlowQueryLog через capture() из api.queries. Запросы
+дольше SLOW_QUERY_MS пишутся в лог api.slow_queries одной строкой JSON:
+SQL, параметры, база, вьюха с действием и план выполнения (EXPLAIN QUERY
+PLAN в SQLite), снятый сразу после запроса. EXPLAIN не входит в число и
+время запросов вьюхи, которые считают другие счётчики. В настройках
+LOGGING этот лог пишется в файл с ротацией.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .queries import capture, view_name
+
+logger = logging.getLogger('api.slow_queries')
+
+EXPLAINABLE = ('SELECT', 'WITH')
+
+
+class SlowQueryLog:
+    """execute_wrapper, который пишет в лог медленные запросы."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+        # Медленные запросы, которые api.queries.dispatch передаст в
+        # flush() после всей цепочки счётчиков.
+        self.pending = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.pending.append(
+                (sql, params, many, duration, context['connection'])
+            )
+        return result
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for entry in pending:
+            self.log(*entry)
+
+    def log(self, sql, params, many, duration, connection):
+        match = getattr(self.request, 'resolver_match', None)
+        entry = {
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'method': self.request.method,
+            'path': self.request.path,
+            'view': view_name(match.func, self.request.method)
+            if match else None,
+            'sql': sql,
+            'params': params,
+            'plan': None if many else self.explain(connection, sql, params),
+        }
+        logger.warning(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def explain(self, connection, sql, params):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        sqlite = connection.vendor == 'sqlite'
+        prefix = 'EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN '
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+        except DatabaseError:
+            return None
+        if sqlite:
+            # Строки плана SQLite: id, parent, notused, detail.
+            return [row[-1] for row in rows]
+        return [' '.join(map(str, row)) for row in rows]
+
+
+class SlowQueryMiddleware:
+    """Пишет в лог медленные запросы к базе с вьюхой и планом."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def wrapper(self, request):
+        return SlowQueryLog(request, settings.SLOW_QUERY_MS / 1000)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with capture(self.wrapper(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with capture(self.wrapper(request)):
+            return await self.get_response(request)
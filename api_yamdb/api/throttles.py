@@ -0,0 +1,116 @@
+from django.core import checks
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from .metrics import MeteredCache
+
+# Бэкенды, которые хранят счётчики вне процесса и выполняют incr атомарно.
+SHARED_CACHES = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Проверка manage.py check --deploy: кэш default, где живут счётчики
+    лимитов, должен быть общим для процессов сервера.
+    """
+    cache = caches['default']
+    if isinstance(cache, MeteredCache):
+        cache = cache.cache
+    backend = f'{type(cache).__module__}.{type(cache).__name__}'
+    if backend in SHARED_CACHES:
+        return []
+    return [checks.Error(
+        f'Кэш default ({backend}) не общий для процессов или его incr '
+        'не атомарен, и каждый процесс ограничивал бы запросы сам.',
+        hint=f'Нужен один из: {", ".join(SHARED_CACHES)}. Если сервер '
+             'работает в одном процессе, добавьте api.E001 в '
+             'SILENCED_SYSTEM_CHECKS.',
+        id='api.E001',
+    )]
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по скользящему окну.
+
+    Вместо списка времён запросов хранит в кэше два счётчика: текущего
+    и предыдущего окна. Предыдущий учитывается с весом, равным доле окна,
+    которая ещё не прошла. Счётчик увеличивается через cache.incr до
+    проверки лимита, поэтому при общем кэше (Redis, Memcached) лимит
+    соблюдается всеми процессами без гонок; см. check_shared_cache.
+    """
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        current_key = f'{self.key}:{int(window)}'
+        previous_key = f'{self.key}:{int(window) - 1}'
+        remaining = 1 - offset / self.duration
+
+        current = self._incr(current_key)
+        previous = self.cache.get(previous_key, 0)
+        if previous * remaining + current <= self.num_requests:
+            return True
+
+        # Отклонённый запрос не должен съедать лимит.
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            # Ключ уже истёк или вытеснен: откатывать нечего.
+            pass
+        self.wait_seconds = self._wait(previous, current - 1, offset)
+        return self.throttle_failure()
+
+    def wait(self):
+        return self.wait_seconds
+
+    def _incr(self, key):
+        # Окно живёт ещё одно окно после своего конца, пока оно нужно
+        # как предыдущее.
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            self.cache.set(key, 1, self.duration * 2)
+            return 1
+
+    def _wait(self, previous, current, offset):
+        if current >= self.num_requests or not previous:
+            return self.duration - offset
+        # Через сколько вес предыдущего окна освободит место под запрос.
+        free_at = 1 - (self.num_requests - current - 1) / previous
+        return max(free_at * self.duration - offset, 0)
+
+
+class SignUpRateThrottle(SlidingWindowRateThrottle):
+    scope = 'signup'
+
+
+class TokenRateThrottle(SlidingWindowRateThrottle):
+    scope = 'token'
+
+
+class ReviewRateThrottle(SlidingWindowRateThrottle):
+    scope = 'reviews'
+
+
+class CommentRateThrottle(SlidingWindowRateThrottle):
+    scope = 'comments'
@@ -0,0 +1,109 @@
+"""
+Заголовок Server-Timing с разбивкой времени ответа вьюсета.
+
+Для доли запросов SERVER_TIMING_SAMPLE_RATE ServerTimingMixin делит время
+ответа на отрезки, которые не пересекаются:
+
+- auth — аутентификация;
+- perm — проверка прав, в том числе на объект;
+- db — выборка страницы или объекта вместе с prefetch и любые SQL-запросы
+  из обработчика действия;
+- serialize — остальное время обработчика: сериализация, валидация,
+  фильтры;
+- render — рендеринг ответа.
+
+Запросы вне выборки обходятся одним вызовом random().
+"""
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class ServerTimingMixin:
+    """Добавляет Server-Timing к части ответов вьюсета."""
+
+    timings = None
+
+    def dispatch(self, request, *args, **kwargs):
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return super().dispatch(request, *args, **kwargs)
+        self.timings = {}
+        self.segment = None
+        with ExitStack() as self.handler_stack:
+            return super().dispatch(request, *args, **kwargs)
+
+    def switch(self, segment):
+        """Закрывает текущий отрезок и начинает segment."""
+        now = time.perf_counter()
+        if self.segment is not None:
+            self.timings[self.segment] = (
+                self.timings.get(self.segment, 0) + now - self.started
+            )
+        previous, self.segment, self.started = self.segment, segment, now
+        return previous
+
+    @contextmanager
+    def timing(self, segment):
+        if self.timings is None:
+            yield
+            return
+        previous = self.switch(segment)
+        try:
+            yield
+        finally:
+            self.switch(previous)
+
+    def execute_timing(self, execute, sql, params, many, context):
+        with self.timing('db'):
+            return execute(sql, params, many, context)
+
+    def perform_authentication(self, request):
+        with self.timing('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with self.timing('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with self.timing('perm'):
+            super().check_object_permissions(request, obj)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.timings is not None:
+            for alias in connections:
+                self.handler_stack.enter_context(
+                    connections[alias].execute_wrapper(self.execute_timing)
+                )
+            self.switch('serialize')
+
+    def paginate_queryset(self, queryset):
+        with self.timing('db'):
+            return super().paginate_queryset(queryset)
+
+    def get_object(self):
+        with self.timing('db'):
+            return super().get_object()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.timings is None:
+            return response
+        self.switch(None)
+        self.handler_stack.close()
+        # Django отрендерил бы ответ сразу после вьюхи; здесь это
+        # делается раньше, чтобы время попало в заголовок.
+        with self.timing('render'):
+            response.render()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.2f}'
+            for name, duration in self.timings.items()
+        )
+        return response
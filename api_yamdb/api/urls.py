@@ -28,6 +28,8 @@ reviews_router.register(
 urlpatterns = [
     path('v1/auth/signup/', views.signup),
     path('v1/auth/token/', views.token),
+    path('v1/metrics/', views.metrics),
+    path('v1/batch/', views.batch, name='batch'),
     path('v1/', include(router_v1.urls)),
     path('v1/', include(titles_router.urls)),
     path('v1/', include(reviews_router.urls))
@@ -1,9 +1,15 @@
 from django.db.models import Avg
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (
+    action,
+    api_view,
+    permission_classes,
+    throttle_classes
+)
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     AllowAny,
@@ -12,13 +18,18 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 
 from reviews.models import Category, Genre, Title, Review
+from .batch import run_batch
 from .filters import TitleFilter
+from .metrics import CONTENT_TYPE, metrics as app_metrics
 from .permissions import (
     IsAdmin,
     IsAdminOrReadOnly,
     IsAuthorOrReadOnly
 )
+from .profiling import ProfilingMixin
+from .queries import query_budget
 from .serializers import (
+    BatchSerializer,
     ReviewSerializer,
     CommentSerializer,
     CategorySerializer,
@@ -29,18 +40,41 @@ from .serializers import (
     TokenObtainSerializer,
     UserSerializer
 )
+from .throttles import (
+    CommentRateThrottle,
+    ReviewRateThrottle,
+    SignUpRateThrottle,
+    TokenRateThrottle
+)
+from .timing import ServerTimingMixin
 
 User = get_user_model()
 
 
-class NoPutModelViewSet(viewsets.ModelViewSet):
+class NoPutModelViewSet(
+    ProfilingMixin, ServerTimingMixin, viewsets.ModelViewSet
+):
     """Базовый вьюсет, реализующий все методы для модели, без PUT."""
 
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
 
 
+class CreateThrottleMixin:
+    """Применяет create_throttle_classes только к созданию объектов."""
+
+    create_throttle_classes = ()
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [throttle() for throttle in self.create_throttle_classes]
+        return super().get_throttles()
+
+
+# С EMAIL_OUTBOX_EAGER в бюджет входит и отметка об отправке письма.
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([SignUpRateThrottle])
 def signup(request):
     serializer = SignUpSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -51,14 +85,38 @@ def signup(request):
     )
 
 
+@query_budget(2)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([TokenRateThrottle])
 def token(request):
     serializer = TokenObtainSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     return Response({'token': serializer.validated_data['access_token']})
 
 
+@query_budget(1)
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def metrics(request):
+    return HttpResponse(app_metrics.render(), content_type=CONTENT_TYPE)
+
+
+# Подзапросы выполняются в потоках пула и учитываются по бюджетам своих
+# вьюх, здесь остаётся только пользователь.
+@query_budget(1)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch(request):
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response({
+        'responses': run_batch(
+            request, serializer.validated_data['requests']
+        )
+    })
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -66,6 +124,8 @@ class StandardResultsSetPagination(PageNumberPagination):
 
 
 class CategoryGenreViewSet(
+    ProfilingMixin,
+    ServerTimingMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -78,6 +138,7 @@ class CategoryGenreViewSet(
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
+    query_budgets = {'list': 3, 'create': 3, 'destroy': 4}
 
 
 class CategoryViewSet(CategoryGenreViewSet):
@@ -102,7 +163,15 @@ class TitleViewSet(NoPutModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
-    queryset = Title.objects.all().annotate(rating=Avg('reviews__score'))
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 8, 'partial_update': 8,
+        'destroy': 8,
+    }
+    # С GROUP BY Django не применяет Meta.ordering, и без явного порядка
+    # страницы списка могли бы пересекаться.
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre'
+    ).annotate(rating=Avg('reviews__score')).order_by('name')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -119,6 +188,11 @@ class UserViewSet(NoPutModelViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
     lookup_field = 'username'
+    query_budgets = {
+        'list': 3, 'retrieve': 2, 'create': 3, 'partial_update': 3,
+        # Каскадное удаление отзывов, комментариев и связей.
+        'destroy': 10, 'me': 2,
+    }
 
     @action(
         detail=False,
@@ -141,25 +215,35 @@ class UserViewSet(NoPutModelViewSet):
         return Response(self.get_serializer(request.user).data)
 
 
-class ReviewViewSet(NoPutModelViewSet):
+class ReviewViewSet(CreateThrottleMixin, NoPutModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    create_throttle_classes = (ReviewRateThrottle,)
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 4, 'partial_update': 4,
+        'destroy': 5,
+    }
 
     def _title_pk(self):
         return self.kwargs.get('title_pk')
 
     def get_queryset(self):
         title = get_object_or_404(Title, pk=self._title_pk())
-        return title.reviews.all()
+        return title.reviews.select_related('author')
 
     def perform_create(self, serializer):
         title = get_object_or_404(Title, pk=self._title_pk())
         serializer.save(author=self.request.user, title=title)
 
 
-class CommentViewSet(NoPutModelViewSet):
+class CommentViewSet(CreateThrottleMixin, NoPutModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    create_throttle_classes = (CommentRateThrottle,)
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 3, 'partial_update': 4,
+        'destroy': 4,
+    }
 
     def _title_pk(self):
         return self.kwargs.get('title_pk')
@@ -173,7 +257,7 @@ class CommentViewSet(NoPutModelViewSet):
             pk=self._review_pk(),
             title__pk=self._title_pk()
         )
-        return review.comments.all()
+        return review.comments.select_related('author')
 
     def perform_create(self, serializer):
         review = get_object_or_404(
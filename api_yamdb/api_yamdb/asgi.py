@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
+# Под ASGI синхронная работа каждого запроса идёт в новом потоке, и
+# постоянное соединение потока никогда не используется повторно, а только
+# остаётся открытым. Поэтому, как советует документация Django, здесь
+# соединение живёт один запрос.
+for database in settings.DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
+
 application = get_asgi_application()
@@ -0,0 +1,22 @@
+"""
+URLconf для запросов, пришедших через ASGI: частые запросы чтения
+обрабатывают асинхронные версии из api.async_views, остальное — те же
+маршруты, что и в api_yamdb.urls.
+"""
+from django.urls import path
+
+from api import async_views
+from api_yamdb.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/v1/titles/', async_views.title_list),
+    path('api/v1/titles/<int:title_pk>/', async_views.title_detail),
+    path(
+        'api/v1/titles/<int:title_pk>/reviews/', async_views.review_list
+    ),
+    path(
+        'api/v1/titles/<int:title_pk>/reviews/<int:review_pk>/comments/',
+        async_views.comment_list
+    ),
+    *sync_urlpatterns,
+]
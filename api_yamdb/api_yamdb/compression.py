@@ -0,0 +1,168 @@
+"""
+Сжатие ответов gzip и brotli.
+
+CompressionMiddleware сжимает ответы API от COMPRESS_MIN_SIZE байт тем
+кодированием из Accept-Encoding, которое клиент предпочитает; при равных
+весах brotli идёт раньше gzip. Ответы сжимаются на быстрых уровнях.
+
+Статика сжимается один раз при collectstatic: хранилище
+PrecompressedStaticFilesStorage кладёт рядом с текстовыми файлами
+варианты .gz и .br на максимальных уровнях, а serve_static отдаёт
+подходящий вариант без сжатия на каждый запрос.
+
+brotli используется, только если установлен одноимённый пакет.
+"""
+import gzip
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.static import serve
+
+from .middleware import is_api_request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def gzip_compress(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def brotli_compress(data, level):
+    return brotli.compress(data, quality=level)
+
+
+# Кодирование: функция, уровень для ответов API и уровень для статики.
+# Порядок — предпочтение сервера при равных весах в Accept-Encoding.
+ENCODINGS = {'gzip': (gzip_compress, 6, 9)}
+if brotli is not None:
+    ENCODINGS = {'br': (brotli_compress, 5, 11), **ENCODINGS}
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSIBLE = ('.css', '.html', '.js', '.json', '.svg', '.txt', '.yaml')
+
+
+def accepted_weights(accept_encoding):
+    """Веса q из Accept-Encoding: {'gzip': 1.0, 'br': 0.5}."""
+    weights = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, parameters = item.partition(';')
+        weight = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith('q='):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    return weights
+
+
+def negotiate(accept_encoding, available):
+    """Кодирование из available с наибольшим весом или None."""
+    weights = accepted_weights(accept_encoding)
+    best_weight, best = 0.0, None
+    for encoding in available:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best_weight, best = weight, encoding
+    return best
+
+
+class CompressionMiddleware:
+    """Сжимает ответы API от COMPRESS_MIN_SIZE байт."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.COMPRESS_MIN_SIZE is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESS_MIN_SIZE
+            or not is_api_request(request)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), ENCODINGS
+        )
+        if encoding is None:
+            return response
+        compress, level, _ = ENCODINGS[encoding]
+        content = compress(response.content, level)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class PrecompressedStaticFilesStorage(StaticFilesStorage):
+    """Кладёт рядом с текстовыми файлами статики сжатые варианты."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            with self.open(name) as file:
+                data = file.read()
+            for encoding, (compress, _, level) in ENCODINGS.items():
+                with open(self.path(name) + SUFFIXES[encoding], 'wb') as file:
+                    file.write(compress(data, level))
+            yield name, name, True
+
+
+def serve_static(request, path):
+    """
+    Отдаёт файл из STATIC_ROOT, а если collectstatic сохранил сжатый
+    вариант, который принимает клиент, — его.
+    """
+    root = settings.STATIC_ROOT
+    available = [
+        encoding for encoding, suffix in SUFFIXES.items()
+        if os.path.isfile(safe_join(root, path + suffix))
+    ]
+    encoding = negotiate(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''), available
+    )
+    response = serve(
+        request, path + SUFFIXES.get(encoding, ''), document_root=root
+    )
+    if encoding is not None and response.status_code == 200:
+        response['Content-Type'] = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        response['Content-Encoding'] = encoding
+    if available:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,111 @@
+"""
+Чтение с реплик, запись в основную базу.
+
+Запросы читают с реплик только внутри ReplicaRoutingMiddleware и только
+для безопасных методов API. Всё остальное — запись, админка, команды
+управления, тесты — работает с основной базой. Клиент, который недавно
+что-то менял, DATABASE_REPLICA_PIN_SECONDS читает с основной базы, чтобы
+видеть свои изменения, пока реплики их догоняют. Реплика выбирается один раз на
+запрос: все его чтения видят одно и то же состояние данных.
+"""
+import hashlib
+import random
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+from api_yamdb.middleware import is_api_request
+
+# Реплика, с которой читает текущий запрос; None — основная база.
+_read_replica = ContextVar('read_replica', default=None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Разрешает (или запрещает) чтение с реплик внутри блока: все чтения
+    идут с одной случайно выбранной реплики.
+    """
+    replica = None
+    if enabled and settings.DATABASE_REPLICAS:
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    token = _read_replica.set(replica)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты с них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Выбирает, можно ли запросу читать с реплик."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.routing(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with self.routing(request):
+            return await self.get_response(request)
+
+    def routing(self, request):
+        if not settings.DATABASE_REPLICAS or not is_api_request(request):
+            return nullcontext()
+        keys = self.pin_keys(request)
+        if request.method not in SAFE_METHODS:
+            cache.set_many(
+                dict.fromkeys(keys, True),
+                settings.DATABASE_REPLICA_PIN_SECONDS
+            )
+            return nullcontext()
+        return replica_reads(not cache.get_many(keys))
+
+    @staticmethod
+    def pin_keys(request):
+        """
+        Ключи клиента: заголовок Authorization (JWT ещё не разобран) и
+        IP-адрес. Запись метит оба, а чтение проверяет оба: так клиент,
+        который без токена зарегистрировался и получил токен, первым
+        запросом с токеном тоже читает с основной базы.
+        """
+        idents = [
+            request.META.get('HTTP_AUTHORIZATION'),
+            request.META.get('REMOTE_ADDR', ''),
+        ]
+        return [
+            'db-primary-pin:' + hashlib.sha256(ident.encode()).hexdigest()
+            for ident in idents if ident is not None
+        ]
@@ -0,0 +1,77 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, csrf
+
+
+def is_api_request(request):
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+class AsgiUrlconfMiddleware:
+    """
+    Под ASGI подменяет URLconf на settings.ASGI_URLCONF с асинхронными
+    версиями вьюх. Под WSGI ничего не делает: асинхронная вьюха там
+    выполнялась бы через async_to_sync и только замедлила бы запрос.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
+
+
+class SkipForApiMixin:
+    """
+    Пропускает middleware для запросов к API: JSON-ручкам с JWT не нужны
+    ни сессии, ни CSRF, ни сообщения, ни X-Frame-Options. Админка и
+    redoc работают с middleware как обычно.
+    """
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SkipForApiMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SkipForApiMixin, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_request(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs
+        )
+
+
+class AuthenticationMiddleware(SkipForApiMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SkipForApiMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(
+    SkipForApiMixin, clickjacking.XFrameOptionsMiddleware
+):
+    pass
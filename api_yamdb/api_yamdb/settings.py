@@ -29,17 +29,29 @@ INSTALLED_APPS = [
     'django_filters',
 ]
 
+# Сессии, CSRF, сообщения и X-Frame-Options из api_yamdb.middleware
+# пропускают запросы, начинающиеся с API_PATH_PREFIX.
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.capture.RequestCaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'api_yamdb.compression.CompressionMiddleware',
+    'api.queries.QueryStatsMiddleware',
+    'api.slow_queries.SlowQueryMiddleware',
+    'api_yamdb.middleware.AsgiUrlconfMiddleware',
+    'api_yamdb.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api_yamdb.middleware.CsrfViewMiddleware',
+    'api_yamdb.middleware.AuthenticationMiddleware',
+    'api_yamdb.middleware.MessageMiddleware',
+    'api_yamdb.middleware.XFrameOptionsMiddleware',
+    'api_yamdb.db_routing.ReplicaRoutingMiddleware',
 ]
+API_PATH_PREFIX = '/api/'
 
 ROOT_URLCONF = 'api_yamdb.urls'
+# URLconf запросов через ASGI: с асинхронными версиями частых чтений.
+ASGI_URLCONF = 'api_yamdb.asgi_urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
 TEMPLATES = [
@@ -67,9 +79,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами: кэш страниц и mmap не
+        # приходится набирать заново.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Транзакция сразу берёт блокировку записи. Иначе две
+            # транзакции, начавшие с чтения, не могут повысить блокировку,
+            # и одна из них падает с «database is locked» без ожидания.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Псевдонимы реплик из DATABASES: с них читают GET-запросы API. Для
+# локальной проверки подойдёт копия SQLite, которую обновляет команда
+# sync_replicas:
+#     DATABASES['replica'] = {
+#         **DATABASES['default'],
+#         'NAME': BASE_DIR / 'replica.sqlite3',
+#         'TEST': {'MIRROR': 'default'},
+#     }
+#     DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['api_yamdb.db_routing.PrimaryReplicaRouter']
+# Сколько секунд после записи клиент читает с основной базы: столько
+# реплике даётся, чтобы догнать её. Метки хранятся в кэше, поэтому при
+# нескольких процессах нужен общий кэш.
+DATABASE_REPLICA_PIN_SECONDS = 10
+
+# PRAGMA, которые reviews.sqlite выполняет на каждом новом соединении
+# SQLite. WAL позволяет читать во время записи, busy_timeout (мс) ждёт
+# освобождения блокировки вместо ошибки, с synchronous=normal в режиме WAL
+# fsync делается только при checkpoint. cache_size < 0 задаётся в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
 
 # Password validation
 
@@ -107,6 +158,25 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
+STATIC_ROOT = BASE_DIR / 'collected_static'
+
+# collectstatic кладёт рядом с текстовыми файлами сжатые варианты .gz и
+# .br. Отдавать их должен сервер перед приложением (в nginx — gzip_static
+# и brotli_static); api_yamdb.compression.serve_static отдаёт их сам
+# только при SERVE_STATIC, для разработки и проверки.
+SERVE_STATIC = DEBUG
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'api_yamdb.compression.PrecompressedStaticFilesStorage',
+    },
+}
+
+# Ответы API от этого размера в байтах сжимаются gzip или brotli
+# (api_yamdb.compression). None — не сжимать.
+COMPRESS_MIN_SIZE = 1024
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -121,7 +191,34 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Лимиты api.throttles. Счётчики хранятся в кэше 'default', поэтому
+    # при нескольких процессах он должен быть общим (Redis, Memcached).
+    'DEFAULT_THROTTLE_RATES': {
+        'signup': '10/min',
+        'token': '20/min',
+        'reviews': '30/min',
+        'comments': '60/min',
+    },
+}
+
+# api.metrics.MeteredCache считает попадания в кэш и передаёт запросы
+# бэкенду из OPTIONS['BACKEND']. LocMemCache у каждого процесса свой, для
+# нескольких процессов нужен общий кэш:
+#     CACHES['default']['OPTIONS']['BACKEND'] = (
+#         'django.core.cache.backends.redis.RedisCache'
+#     )
+#     CACHES['default']['LOCATION'] = 'redis://127.0.0.1:6379/0'
+CACHES = {
+    'default': {
+        'BACKEND': 'api.metrics.MeteredCache',
+        'OPTIONS': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
 }
+# Счётчики api.throttles живут в кэше default. Если он не общий для
+# процессов (см. api.throttles.SHARED_CACHES), каждый процесс пропускает
+# свой лимит; manage.py check --deploy сообщает об этом ошибкой api.E001.
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(weeks=1),
@@ -129,8 +226,95 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': None,
 }
 
+# Сколько секунд повторный запрос токена с тем же кодом получает
+# ранее выданный токен. 0 — каждый раз выпускать новый.
+TOKEN_CACHE_TIMEOUT = 0
+
+# Учёт запросов к базе (api.queries): превышение бюджетов query_budgets
+# вьюсетов пишется в лог api.queries.
+QUERY_STATS = DEBUG
+
+# Запросы к базе дольше SLOW_QUERY_MS миллисекунд пишутся с планом
+# выполнения в лог api.slow_queries, а он — в slow_queries.jsonl с
+# ротацией. None — не писать.
+SLOW_QUERY_MS = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'slow_queries.jsonl',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'encoding': 'utf-8',
+            'formatter': 'message',
+        },
+        'capture': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'captured_requests.jsonl',
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'encoding': 'utf-8',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'api.capture': {
+            'handlers': ['capture'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Метрики для Prometheus (api.metrics) отдаёт /api/v1/metrics/
+# администраторам. При нескольких процессах сервера METRICS_DIR — общий
+# для них каталог, который очищается перед запуском; без него у каждого
+# процесса свои метрики в памяти.
+METRICS_ENABLED = True
+METRICS_DIR = None
+
+# Доля ответов вьюсетов с заголовком Server-Timing (api.timing): 0 —
+# выключено, 1 — каждый ответ.
+SERVER_TIMING_SAMPLE_RATE = 0.01
+
+# Доля запросов к API, которые api.capture пишет в captured_requests.jsonl
+# для benchmarks/replay.py: 0 — выключено.
+REQUEST_CAPTURE_SAMPLE_RATE = 0
+
+# Пакетные запросы (api.batch): сколько подзапросов можно передать в
+# одном пакете и сколько потоков их выполняют.
+BATCH_MAX_REQUESTS = 20
+BATCH_WORKERS = 4
+
+# Каталог для файлов .prof, которые api.profiling сохраняет по запросам
+# администраторов с ?profile=1. None — профиль только в ответе.
+PROFILE_DIR = None
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Очередь исходящих писем (users.mail). Без EMAIL_OUTBOX_EAGER письма
+# отправляет команда send_queued_mail.
+EMAIL_OUTBOX_EAGER = DEBUG
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+# Сколько секунд захваченное письмо принадлежит одному отправителю. Если
+# он за это время не отметил письмо, его отправит другой.
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300
+
 # Константы
 MAX_USERNAME_LENGTH = 150
 MIN_SCORE_VALUE = 1
@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 
+from api_yamdb.compression import serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
@@ -11,3 +14,9 @@ urlpatterns = [
         name='redoc'
     ),
 ]
+
+if settings.SERVE_STATIC:
+    # Под runserver с DEBUG статику раньше отдаёт staticfiles.
+    urlpatterns.append(
+        path(f'{settings.STATIC_URL.strip("/")}/<path:path>', serve_static)
+    )
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        from reviews.sqlite import configure_connection
+
+        connection_created.connect(
+            configure_connection, dispatch_uid='reviews.sqlite'
+        )
@@ -0,0 +1,339 @@
+"""
+Проверка CSV-файлов целиком до импорта.
+
+Каждый файл читается один раз, целочисленные колонки собираются в массивы
+numpy, и все проверки идут над массивами, а не по строкам: повторы id,
+ссылки на отсутствующие объекты, повторы уникальных сочетаний полей,
+диапазоны годов и оценок. Дольше всего идёт разбор CSV, поэтому с пулом
+процессов файлы разбираются параллельно.
+"""
+import csv
+import time
+from functools import cached_property
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.db.models import UniqueConstraint
+from django.utils import timezone
+
+from reviews.csv_data import (
+    TABLES,
+    TABLES_BY_NAME,
+    chunked,
+    dependency_order,
+    find_file,
+    open_csv,
+    to_int,
+    to_optional_int,
+    to_score,
+    to_year
+)
+
+INT_CONVERTERS = (to_int, to_optional_int, to_year, to_score)
+# Самое длинное целое, которое гарантированно помещается в int64.
+MAX_INT_DIGITS = 18
+CHUNK_ROWS = 500_000
+EXAMPLE_LINES = 5
+
+
+def value_ranges():
+    return {
+        to_year: (settings.MIN_YEAR, timezone.now().year),
+        to_score: (settings.MIN_SCORE_VALUE, settings.MAX_SCORE_VALUE),
+    }
+
+
+def parse_ints(values):
+    """
+    Разбирает список строк в массив int64.
+
+    Возвращает значения, маску пустых строк и маску строк, которые не
+    являются целыми числами; у таких значений в массиве стоит 0.
+    """
+    try:
+        numbers = np.fromiter(map(int, values), np.int64, len(values))
+    except (ValueError, OverflowError):
+        return parse_ints_by_mask(values)
+    return (
+        numbers, np.zeros(len(values), dtype=bool),
+        np.zeros(len(values), dtype=bool)
+    )
+
+
+def parse_ints_by_mask(values):
+    """Медленный путь parse_ints для пачки, где есть не числа."""
+    strings = np.char.strip(np.array(values, dtype=str))
+    empty = strings == ''
+    digits = np.char.lstrip(strings, '-')
+    valid = (
+        np.char.isdecimal(digits)
+        & (np.char.str_len(strings) - np.char.str_len(digits) <= 1)
+        & (np.char.str_len(digits) <= MAX_INT_DIGITS)
+    )
+    numbers = np.where(valid, strings, '0').astype(np.int64)
+    return numbers, empty, ~valid & ~empty
+
+
+def duplicated(*columns):
+    """Маска повторов сочетания колонок: все вхождения, кроме первого."""
+    repeated = np.zeros(len(columns[0]), dtype=bool)
+    if not len(repeated):
+        return repeated
+    order = np.lexsort(columns[::-1])
+    same = np.ones(len(order) - 1, dtype=bool)
+    for column in columns:
+        ordered = column[order]
+        same &= ordered[1:] == ordered[:-1]
+    repeated[order[1:]] = same
+    return repeated
+
+
+class IntColumns:
+    """
+    Целочисленные колонки CSV-файла в виде массивов.
+
+    Номера строк файла нужны только для отчёта об ошибках, поэтому
+    считаются отдельным проходом при первом обращении к lines.
+    """
+
+    def __init__(self, path, table):
+        self.path = path
+        self.fields = {
+            field: (column, converter)
+            for column, field, converter in table.columns
+            if converter in INT_CONVERTERS
+        }
+        parts = {field: [] for field in self.fields}
+        self.count = 0
+        with open_csv(path) as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            positions = [
+                header.index(column) if column in header else None
+                for column, _ in self.fields.values()
+            ]
+            for rows in chunked(reader, CHUNK_ROWS):
+                self.count += len(rows)
+                for field, position in zip(self.fields, positions):
+                    parts[field].append(
+                        parse_ints(self.column(rows, position))
+                    )
+        self.values = {}
+        self.empty = {}
+        self.invalid = {}
+        no_rows = (
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=bool),
+            np.empty(0, dtype=bool)
+        )
+        for field, chunks in parts.items():
+            (
+                self.values[field], self.empty[field], self.invalid[field]
+            ) = (np.concatenate(arrays) for arrays in zip(no_rows, *chunks))
+
+    @staticmethod
+    def column(rows, position):
+        if position is None:
+            return [''] * len(rows)
+        try:
+            return list(map(itemgetter(position), rows))
+        except IndexError:
+            # Короткие строки: недостающие значения считаются пустыми.
+            return [row[position] if position < len(row) else ''
+                    for row in rows]
+
+    @cached_property
+    def lines(self):
+        with open_csv(self.path) as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            return np.fromiter(
+                (reader.line_num for _ in reader), np.int64, self.count
+            )
+
+    def __len__(self):
+        return self.count
+
+    def present(self, field):
+        return ~self.empty[field] & ~self.invalid[field]
+
+
+def read_int_columns(path, table_name):
+    """IntColumns по имени таблицы, для пула процессов."""
+    return IntColumns(path, TABLES_BY_NAME[table_name])
+
+
+class Problem:
+    """Ошибка одного вида в файле и номера строк, где она встретилась."""
+
+    def __init__(self, filename, message, lines):
+        self.filename = filename
+        self.message = message
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __str__(self):
+        examples = ', '.join(str(line) for line in self.lines[:EXAMPLE_LINES])
+        if len(self) > EXAMPLE_LINES:
+            examples += ', ...'
+        return (
+            f'{self.filename}: {self.message} — {len(self)} '
+            f'(строки {examples})'
+        )
+
+
+class CsvValidator:
+    """
+    Проверяет все CSV-файлы каталога, ничего не записывая в базу.
+
+    Таблицы проверяются в порядке зависимостей. Строки с ошибками не
+    попадут в базу при импорте, поэтому ссылки на них из следующих таблиц
+    тоже считаются ошибками, как и при настоящем импорте.
+    """
+
+    def __init__(self, path, pool=None):
+        self.path = path
+        self.pool = pool
+        self.rows = {}
+        self.missing = []
+        self.problems = []
+        # Отсортированные id, которые окажутся в базе после импорта.
+        self.known_ids = {}
+
+    def validate(self):
+        started = time.perf_counter()
+        tables = dependency_order(TABLES)
+        paths = {table.name: find_file(self.path, table) for table in tables}
+        columns = {}
+        if self.pool is not None:
+            # Разбор CSV — самая долгая часть; файлы читаются параллельно.
+            columns = {
+                name: self.pool.submit(read_int_columns, path, name)
+                for name, path in paths.items() if path is not None
+            }
+        for table in tables:
+            path = paths[table.name]
+            if path is None:
+                data = None
+            elif table.name in columns:
+                data = columns.pop(table.name).result()
+            else:
+                data = IntColumns(path, table)
+            self.validate_table(table, data)
+        self.elapsed = time.perf_counter() - started
+        return self.problems
+
+    def validate_table(self, table, data):
+        existing = np.fromiter(
+            table.model.objects.values_list('pk', flat=True).iterator(),
+            dtype=np.int64
+        )
+        if data is None:
+            self.missing.append(table.filename)
+            self.known_ids[table.name] = np.unique(existing)
+            return
+        self.rows[table.filename] = len(data)
+        ok = self.check_numbers(table, data)
+        ok &= self.check_foreign_keys(table, data)
+        ids = data.values['id']
+        repeated = np.zeros(len(data), dtype=bool)
+        repeated[ok] = duplicated(ids[ok])
+        self.report(table, repeated, data, 'повтор id')
+        ok &= ~repeated
+        ok &= self.check_unique_together(table, data, ok)
+        self.known_ids[table.name] = np.union1d(existing, ids[ok])
+
+    def check_numbers(self, table, data):
+        ok = np.ones(len(data), dtype=bool)
+        ranges = value_ranges()
+        for field, (column, converter) in data.fields.items():
+            bad = data.invalid[field]
+            if converter is not to_optional_int:
+                bad = bad | data.empty[field]
+            self.report(table, bad, data, f'{column}: не целое число')
+            ok &= ~bad
+            if converter in ranges:
+                low, high = ranges[converter]
+                values = data.values[field]
+                bad = data.present(field) & ((values < low) | (values > high))
+                self.report(
+                    table, bad, data, f'{column}: вне диапазона {low}..{high}'
+                )
+                ok &= ~bad
+        return ok
+
+    def check_foreign_keys(self, table, data):
+        ok = np.ones(len(data), dtype=bool)
+        for field, target in table.foreign_keys.items():
+            column, _ = data.fields[field]
+            bad = data.present(field) & ~np.isin(
+                data.values[field], self.known_ids[target], kind='sort'
+            )
+            self.report(table, bad, data, f'{column}: нет объекта с таким id')
+            ok &= ~bad
+        return ok
+
+    def check_unique_together(self, table, data, ok):
+        """
+        Повторы сочетаний полей из UniqueConstraint модели, например
+        второй отзыв автора на то же произведение, в файле и среди строк
+        базы, которые импорт не перезапишет.
+        """
+        result = np.ones(len(data), dtype=bool)
+        for fields in self.unique_fields(table, data):
+            values = [data.values[field][ok] for field in fields]
+            repeated = np.zeros(len(data), dtype=bool)
+            repeated[ok] = duplicated(*values)
+            columns = ', '.join(data.fields[field][0] for field in fields)
+            self.report(table, repeated, data, f'повтор пары ({columns})')
+            stored = self.stored_values(table, fields, data.values['id'][ok])
+            # Сохранённые строки идут первыми, поэтому повтором
+            # считается строка файла.
+            taken = np.zeros(len(data), dtype=bool)
+            taken[ok] = duplicated(*(
+                np.concatenate(pair) for pair in zip(stored, values)
+            ))[len(stored[0]):]
+            taken &= ~repeated
+            self.report(
+                table, taken, data, f'пара ({columns}) уже есть в базе'
+            )
+            result &= ~repeated & ~taken
+        return result
+
+    @staticmethod
+    def stored_values(table, fields, ids):
+        """
+        Колонки fields строк базы, кроме строк с id из ids: их импорт
+        перезапишет.
+        """
+        rows = np.fromiter(
+            table.model.objects.values_list('pk', *fields).iterator(),
+            dtype=np.dtype((np.int64, len(fields) + 1))
+        ).reshape(-1, len(fields) + 1)
+        rows = rows[~np.isin(rows[:, 0], ids, kind='sort')]
+        return [rows[:, index] for index in range(1, len(fields) + 1)]
+
+    @staticmethod
+    def unique_fields(table, data):
+        options = table.model._meta
+        for constraint in options.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+            fields = [
+                options.get_field(name).attname
+                for name in constraint.fields
+            ]
+            if fields and all(field in data.fields for field in fields):
+                yield fields
+
+    def report(self, table, bad, data, message):
+        if bad.any():
+            self.problems.append(
+                Problem(table.filename, message, data.lines[bad])
+            )
+
+    @property
+    def error_count(self):
+        return sum(len(problem) for problem in self.problems)
@@ -0,0 +1,365 @@
+"""Формат CSV-файлов с данными проекта (static/data) и разбор их строк."""
+import csv
+import gzip
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from functools import cached_property
+from graphlib import TopologicalSorter
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+
+User = get_user_model()
+
+# Пустое значение колонки, которое не задаёт поле: см. keep_if_empty.
+UNSET = object()
+
+
+class RowError(ValueError):
+    """Строка CSV с некорректными данными."""
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'ожидалось целое число, получено {value!r}')
+
+
+def to_optional_int(value):
+    return to_int(value) if value else None
+
+
+def to_text(value):
+    return value or ''
+
+
+def to_email(value):
+    if not value:
+        raise RowError('пустой email')
+    return User.objects.normalize_email(value)
+
+
+def to_role(value):
+    if value not in User.Role.values:
+        raise RowError(f'неизвестная роль {value!r}')
+    return value
+
+
+def to_year(value):
+    year = to_int(value)
+    if not settings.MIN_YEAR <= year <= timezone.now().year:
+        raise RowError(f'год {year} вне допустимого диапазона')
+    return year
+
+
+def to_score(value):
+    score = to_int(value)
+    if not settings.MIN_SCORE_VALUE <= score <= settings.MAX_SCORE_VALUE:
+        raise RowError(f'оценка {score} вне допустимого диапазона')
+    return score
+
+
+def to_datetime(value):
+    try:
+        parsed = parse_datetime(value or '')
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f'некорректная дата {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def to_bool(value):
+    try:
+        return {'true': True, '1': True, 'false': False, '0': False}[
+            value.lower()
+        ]
+    except KeyError:
+        raise RowError(f'ожидалось True или False, получено {value!r}')
+
+
+def keep_if_empty(converter):
+    """
+    Пустое значение колонки не задаёт поле: новая строка получит значение
+    по умолчанию из модели, а существующая при --upsert сохранит своё.
+    """
+    def convert(value):
+        return UNSET if not value else converter(value)
+
+    return convert
+
+
+def to_csv(value):
+    """Значение поля модели в виде, который разбирают функции выше."""
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc).isoformat(
+            timespec='microseconds'
+        )
+        return value.replace('+00:00', 'Z')
+    return value
+
+
+class CsvTable:
+    """
+    CSV-файл и модель, в которую он загружается.
+
+    columns — кортеж (колонка CSV, поле модели, преобразование);
+    отсутствующая в файле колонка разбирается как пустая строка, а поля,
+    для которых преобразование вернуло UNSET, в строку не попадают.
+    since_field — поле с датой создания, по которому выгружаются
+    только новые строки.
+    """
+
+    def __init__(self, name, filename, model, columns, since_field=None):
+        self.name = name
+        self.filename = filename
+        self.model = model
+        self.columns = columns
+        self.since_field = since_field
+
+    @cached_property
+    def foreign_keys(self):
+        """{поле модели: имя таблицы, на которую оно ссылается}."""
+        tables = {table.model: table.name for table in TABLES}
+        return {
+            field.attname: tables[field.related_model]
+            for field in self.model._meta.concrete_fields
+            if field.many_to_one and field.related_model in tables
+        }
+
+    @property
+    def header(self):
+        return [column for column, _, _ in self.columns]
+
+    @property
+    def fields(self):
+        return [field for _, field, _ in self.columns]
+
+    def convert(self, row):
+        """Превращает строку CSV в словарь значений полей модели."""
+        values = {}
+        for column, field, converter in self.columns:
+            try:
+                value = converter(row.get(column))
+            except RowError as error:
+                raise RowError(f'{column}: {error}')
+            if value is not UNSET:
+                values[field] = value
+        return values
+
+    def convert_rows(self, rows):
+        """
+        Разбирает пачку строк (номер строки, строка).
+
+        Возвращает разобранные значения и список ошибок. Функция не
+        обращается к базе, поэтому её можно выполнять в других процессах.
+        """
+        converted = []
+        errors = []
+        for line, row in rows:
+            try:
+                converted.append((line, self.convert(row)))
+            except RowError as error:
+                errors.append((line, str(error)))
+        return converted, errors
+
+
+TABLES = (
+    CsvTable('users', 'users.csv', User, (
+        ('id', 'id', to_int),
+        ('username', 'username', to_text),
+        ('email', 'email', to_email),
+        ('role', 'role', to_role),
+        ('bio', 'bio', to_text),
+        ('first_name', 'first_name', to_text),
+        ('last_name', 'last_name', to_text),
+        # Без них выгрузка сбросила бы пароли и права, а date_joined
+        # сдвинулся бы на время импорта.
+        ('password', 'password', keep_if_empty(to_text)),
+        ('last_login', 'last_login', keep_if_empty(to_datetime)),
+        ('is_active', 'is_active', keep_if_empty(to_bool)),
+        ('is_staff', 'is_staff', keep_if_empty(to_bool)),
+        ('is_superuser', 'is_superuser', keep_if_empty(to_bool)),
+        ('date_joined', 'date_joined', keep_if_empty(to_datetime)),
+    ), since_field='date_joined'),
+    CsvTable('categories', 'category.csv', Category, (
+        ('id', 'id', to_int),
+        ('name', 'name', to_text),
+        ('slug', 'slug', to_text),
+    )),
+    CsvTable('genres', 'genre.csv', Genre, (
+        ('id', 'id', to_int),
+        ('name', 'name', to_text),
+        ('slug', 'slug', to_text),
+    )),
+    CsvTable('titles', 'titles.csv', Title, (
+        ('id', 'id', to_int),
+        ('name', 'name', to_text),
+        ('year', 'year', to_year),
+        ('category', 'category_id', to_optional_int),
+        ('description', 'description', to_text),
+    )),
+    CsvTable('genre_titles', 'genre_title.csv', GenreTitle, (
+        ('id', 'id', to_int),
+        ('title_id', 'title_id', to_int),
+        ('genre_id', 'genre_id', to_int),
+    )),
+    CsvTable('reviews', 'review.csv', Review, (
+        ('id', 'id', to_int),
+        ('title_id', 'title_id', to_int),
+        ('text', 'text', to_text),
+        ('author', 'author_id', to_int),
+        ('score', 'score', to_score),
+        ('pub_date', 'pub_date', to_datetime),
+    ), since_field='pub_date'),
+    CsvTable('comments', 'comments.csv', Comment, (
+        ('id', 'id', to_int),
+        ('review_id', 'review_id', to_int),
+        ('text', 'text', to_text),
+        ('author', 'author_id', to_int),
+        ('pub_date', 'pub_date', to_datetime),
+    ), since_field='pub_date'),
+)
+
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+
+def dependency_graph(tables=TABLES):
+    """{имя таблицы: имена таблиц, на которые она ссылается}."""
+    return {
+        table.name: set(table.foreign_keys.values()) - {table.name}
+        for table in tables
+    }
+
+
+def dependency_order(tables=TABLES):
+    """Таблицы в порядке, при котором ссылки указывают на уже загруженные."""
+    order = TopologicalSorter(dependency_graph(tables)).static_order()
+    return [TABLES_BY_NAME[name] for name in order]
+
+
+def convert_rows(table_name, rows):
+    """Разбор пачки строк по имени таблицы, для пула процессов."""
+    return TABLES_BY_NAME[table_name].convert_rows(rows)
+
+
+def find_file(directory, table):
+    """Путь к CSV таблицы в каталоге: обычный или сжатый gzip."""
+    for name in (table.filename, table.filename + '.gz'):
+        path = directory / name
+        if path.exists():
+            return path
+    return None
+
+
+def open_csv(path, mode='r'):
+    opener = gzip.open if '.gz' in path.suffixes else open
+    return opener(path, mode=mode + 't', encoding='utf-8', newline='')
+
+
+def read_rows(path):
+    """Построчно читает CSV, возвращая пары (номер строки, строка)."""
+    with open_csv(path) as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class IdSet:
+    """
+    Множество неотрицательных целых id в виде битовой карты.
+
+    Для 10 млн плотных id занимает около мегабайта вместо сотен
+    мегабайт у set; очень большие id хранятся в обычном set.
+    """
+
+    MAX_BITMAP_ID = 2 ** 31
+
+    def __init__(self, ids=()):
+        self.bits = bytearray()
+        self.sparse = set()
+        self.update(ids)
+
+    def add(self, value):
+        if value < 0 or value >= self.MAX_BITMAP_ID:
+            self.sparse.add(value)
+            return
+        index = value >> 3
+        if index >= len(self.bits):
+            self.bits.extend(bytes(max(index + 1, 2 * len(self.bits))
+                                   - len(self.bits)))
+        self.bits[index] |= 1 << (value & 7)
+
+    def discard(self, value):
+        if value < 0 or value >= self.MAX_BITMAP_ID:
+            self.sparse.discard(value)
+        elif value >> 3 < len(self.bits):
+            self.bits[value >> 3] &= ~(1 << (value & 7)) & 0xFF
+
+    def update(self, ids):
+        for value in ids:
+            self.add(value)
+
+    def __contains__(self, value):
+        if value < 0 or value >= self.MAX_BITMAP_ID:
+            return value in self.sparse
+        index = value >> 3
+        return (
+            index < len(self.bits)
+            and bool(self.bits[index] & (1 << (value & 7)))
+        )
+
+
+class ParsedChunks:
+    """
+    Разобранные пачки строк одного файла в исходном порядке.
+
+    С пулом процессов разбор идёт параллельно: в работе держится не
+    больше window пачек. fill() позволяет начать разбор заранее, пока
+    записывается предыдущая таблица.
+    """
+
+    def __init__(self, table, path, batch_size, pool=None, window=1):
+        self.table = table
+        self.chunks = (
+            chunked(read_rows(path), batch_size) if path else iter(())
+        )
+        self.pool = pool
+        self.window = window
+        self.pending = deque()
+
+    def fill(self):
+        if self.pool is None:
+            return
+        while len(self.pending) < self.window:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return
+            self.pending.append(
+                self.pool.submit(convert_rows, self.table.name, chunk)
+            )
+
+    def __iter__(self):
+        if self.pool is None:
+            for chunk in self.chunks:
+                yield self.table.convert_rows(chunk)
+            return
+        self.fill()
+        while self.pending:
+            result = self.pending.popleft().result()
+            self.fill()
+            yield result
@@ -0,0 +1,207 @@
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from itertools import repeat
+from pathlib import Path
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api.serializers import TitleReadSerializer
+from api.views import TitleViewSet
+from reviews.ratings import (
+    CHUNK_ROWS,
+    RatingTotals,
+    existing_titles,
+    id_bounds,
+    read_totals,
+    split_range
+)
+
+
+def api_ratings(database):
+    """
+    id произведений и рейтинги в том виде, в каком их отдаёт API: тот же
+    запрос, что у TitleViewSet, и то же поле сериализатора. NaN — у
+    произведения нет рейтинга.
+    """
+    field = TitleReadSerializer().fields['rating']
+    rows = TitleViewSet.queryset.using(database).select_related(
+        None
+    ).prefetch_related(None).order_by().values_list('id', 'rating')
+    ids, ratings = [], []
+    for pk, rating in rows.iterator(CHUNK_ROWS):
+        ids.append(pk)
+        ratings.append(
+            np.nan if rating is None else field.to_representation(rating)
+        )
+    return np.array(ids, np.int64), np.array(ratings, np.float64)
+
+
+def padded(array, length, fill):
+    result = np.full(length, fill, array.dtype)
+    result[:len(array)] = array
+    return result
+
+
+def show(value):
+    return '—' if np.isnan(value) else f'{value:g}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитываем рейтинги произведений по всем отзывам и сверяем их '
+        'с тем, что отдаёт API. При расхождениях завершается с ошибкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы, по отзывам которой считаются рейтинги.'
+        )
+        parser.add_argument(
+            '--api-database',
+            action='append',
+            help='Псевдоним базы, с которой рейтинги читает API. Можно '
+                 'указать несколько раз; по умолчанию основная база и '
+                 'все реплики.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Сколько процессов читают отзывы, каждый свой диапазон id.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_ROWS,
+            help='Сколько строк отзывов читать из базы за раз.'
+        )
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='CSV с числом отзывов, средней оценкой и распределением '
+                 'оценок по каждому произведению.'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Сколько расхождений выводить.'
+        )
+
+    def handle(self, *args, **options):
+        self.show = options['show']
+        database = options['database']
+        started = time.perf_counter()
+        totals = self.recompute(
+            database, options['workers'], options['chunk_size']
+        )
+        exists = existing_titles(database, len(totals.counts))
+        elapsed = time.perf_counter() - started
+        reviews = int(totals.counts.sum())
+        self.stdout.write(
+            f'Отзывов: {reviews}, произведений: {int(exists.sum())}. '
+            f'Пересчёт за {elapsed:.1f} с '
+            f'({reviews / max(elapsed, 1e-9):,.0f} отзывов/с).'
+        )
+        problems = self.check_reviews(totals, exists)
+        expected = np.where(exists, np.trunc(totals.ratings()), np.nan)
+        for alias in (
+            options['api_database']
+            or [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        ):
+            problems += self.compare(alias, expected, exists)
+        if options['output']:
+            self.write_csv(options['output'], totals, exists)
+        if problems:
+            raise CommandError(f'Найдено расхождений: {problems}.')
+        self.stdout.write(self.style.SUCCESS('Рейтинги сходятся.'))
+
+    def recompute(self, database, workers, chunk_size):
+        low, high, size = id_bounds(database)
+        ranges = split_range(low, high, workers)
+        arguments = (
+            repeat(database), repeat(size),
+            [start for start, _ in ranges], [stop for _, stop in ranges],
+            repeat(chunk_size),
+        )
+        if workers > 1:
+            # Дочерние процессы не должны получить открытые соединения.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                workers, initializer=django.setup
+            ) as pool:
+                parts = list(pool.map(read_totals, *arguments))
+        else:
+            parts = map(read_totals, *arguments)
+        return reduce(RatingTotals.merge, parts, RatingTotals(size))
+
+    def check_reviews(self, totals, exists):
+        problems = 0
+        orphans = int(totals.counts[~exists].sum())
+        if orphans:
+            self.stdout.write(self.style.WARNING(
+                f'Отзывов на несуществующие произведения: {orphans}.'
+            ))
+            problems += orphans
+        invalid = np.flatnonzero(totals.invalid)
+        if len(invalid):
+            self.stdout.write(self.style.WARNING(
+                f'Оценки вне {settings.MIN_SCORE_VALUE}..'
+                f'{settings.MAX_SCORE_VALUE}: '
+                f'{int(totals.invalid.sum())} у произведений '
+                f'{", ".join(map(str, invalid[:self.show]))}.'
+            ))
+            problems += len(invalid)
+        return problems
+
+    def compare(self, alias, expected, exists):
+        ids, ratings = api_ratings(alias)
+        length = max(len(expected), int(ids.max(initial=-1)) + 1)
+        actual = np.full(length, np.nan)
+        actual[ids] = ratings
+        listed = np.zeros(length, dtype=bool)
+        listed[ids] = True
+        expected = padded(expected, length, np.nan)
+        exists = padded(exists, length, False)
+        same = (expected == actual) | np.isnan(expected) & np.isnan(actual)
+        differs = np.flatnonzero((exists != listed) | ~same)
+        if not len(differs):
+            self.stdout.write(f'{alias}: расхождений нет.')
+            return 0
+        self.stdout.write(self.style.WARNING(
+            f'{alias}: рейтинг расходится у {len(differs)} произведений.'
+        ))
+        for pk in differs[:self.show]:
+            self.stdout.write(
+                f'  id={pk}: API {show(actual[pk]) if listed[pk] else "нет"}'
+                f', пересчёт '
+                f'{show(expected[pk]) if exists[pk] else "нет"}'
+            )
+        return len(differs)
+
+    def write_csv(self, path, totals, exists):
+        scores = range(settings.MIN_SCORE_VALUE, settings.MAX_SCORE_VALUE + 1)
+        ids = np.flatnonzero(exists)
+        ratings = np.round(totals.ratings()[ids], 2)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow([
+                'id', 'reviews', 'rating',
+                *(f'score_{score}' for score in scores)
+            ])
+            for pk, count, rating, distribution in zip(
+                ids.tolist(), totals.counts[ids].tolist(), ratings.tolist(),
+                totals.distribution[ids].tolist()
+            ):
+                writer.writerow([
+                    pk, count, '' if count == 0 else rating, *distribution
+                ])
+        self.stdout.write(f'Рейтинги записаны в {path}.')
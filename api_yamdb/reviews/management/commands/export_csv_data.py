@@ -0,0 +1,91 @@
+import csv
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from reviews.csv_data import TABLES, open_csv, to_csv
+
+
+class Command(BaseCommand):
+    help = "Выгружаем данные в CSV файлы в формате import_csv_data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=Path,
+            default=Path('export'),
+            help='Каталог, в который пишутся CSV файлы.'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы gzip (users.csv.gz и т.д.).'
+        )
+        parser.add_argument(
+            '--since',
+            help='Выгружать пользователей, отзывы и комментарии, созданные '
+                 'не раньше этой даты (ISO 8601). Остальные таблицы '
+                 'выгружаются целиком.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        self.since = self.parse_since(options['since'])
+        path = options['path']
+        path.mkdir(parents=True, exist_ok=True)
+        suffix = '.gz' if options['gzip'] else ''
+        for table in TABLES:
+            self.export_table(
+                table, path / (table.filename + suffix), options['chunk_size']
+            )
+
+    def parse_since(self, value):
+        if value is None:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError(f'Некорректная дата --since: {value}')
+            since = datetime(date.year, date.month, date.day)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def export_table(self, table, path, chunk_size):
+        """Выгружает таблицу потоково, не держа её целиком в памяти."""
+        queryset = table.model.objects.order_by('pk')
+        if self.since is not None and table.since_field:
+            queryset = queryset.filter(**{
+                f'{table.since_field}__gte': self.since
+            })
+        rows = queryset.values_list(*table.fields).iterator(
+            chunk_size=chunk_size
+        )
+
+        started = time.perf_counter()
+        count = 0
+        # Файл подменяется целиком только после успешной выгрузки.
+        partial = path.with_name(path.name + '.part')
+        with open_csv(partial, 'w') as file:
+            writer = csv.writer(file)
+            writer.writerow(table.header)
+            for row in rows:
+                writer.writerow([to_csv(value) for value in row])
+                count += 1
+        partial.replace(path)
+        elapsed = time.perf_counter() - started
+
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{path}: {count} строк за {elapsed:.1f} с ({rate:.0f} строк/с).'
+        ))
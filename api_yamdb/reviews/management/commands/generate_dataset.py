@@ -0,0 +1,258 @@
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reviews.csv_data import TABLES_BY_NAME, open_csv
+
+CATEGORIES = (
+    ('Фильм', 'movie'), ('Книга', 'book'), ('Музыка', 'music'),
+    ('Сериал', 'series'), ('Игра', 'game'), ('Спектакль', 'play'),
+)
+GENRES = (
+    ('Драма', 'drama'), ('Комедия', 'comedy'), ('Вестерн', 'western'),
+    ('Фэнтези', 'fantasy'), ('Фантастика', 'sci-fi'),
+    ('Детектив', 'detective'), ('Триллер', 'thriller'), ('Сказка', 'tale'),
+    ('Гонзо', 'gonzo'), ('Роман', 'roman'), ('Баллада', 'ballad'),
+    ('Рок-н-ролл', 'rock-n-roll'), ('Классика', 'classical'),
+    ('Рок', 'rock'), ('Шансон', 'chanson'),
+)
+TITLE_WORDS = np.array((
+    'Тайна', 'Путь', 'Город', 'Ночь', 'Песня', 'Остров', 'Сердце',
+    'Зима', 'Дорога', 'Тень', 'Река', 'Звезда', 'Сон', 'Дом', 'Ветер',
+), dtype=object)
+REVIEW_TEXTS = np.array((
+    'Ставлю десять звёзд!', 'Смотрел дважды, и оба раза понравилось.',
+    'Скучновато, но финал хороший.', 'Не моё.',
+    'Лучшее, что я видел в этом году.',
+    'Слишком затянуто, к середине потерял интерес.',
+    'Отличная работа, рекомендую друзьям.',
+    'Ожидал большего после всех отзывов.',
+), dtype=object)
+COMMENT_TEXTS = np.array((
+    'Полностью согласен!', 'Ничего подобного.', 'А мне понравилось.',
+    'Спасибо за отзыв.', 'Спорное мнение.',
+), dtype=object)
+ROLES = np.array(('user', 'moderator', 'admin'), dtype=object)
+ROLE_WEIGHTS = (0.95, 0.04, 0.01)
+FIRST_DATE = np.datetime64('2015-01-01T00:00:00', 's')
+WRITE_CHUNK = 200_000
+
+
+class Command(BaseCommand):
+    help = "Генерируем синтетические CSV файлы в формате import_csv_data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', type=Path, default=Path('dataset'),
+            help='Каталог, в который пишутся CSV файлы.'
+        )
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--titles', type=int, default=5_000)
+        parser.add_argument('--reviews', type=int, default=100_000)
+        parser.add_argument(
+            '--comments', type=int,
+            help='По умолчанию половина числа отзывов.'
+        )
+        parser.add_argument(
+            '--genres-per-title', type=int, default=3,
+            help='Наибольшее число жанров у произведения.'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.2,
+            help='Показатель распределения Ципфа (> 1) для популярности '
+                 'произведений, активности авторов и обсуждаемости отзывов.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['zipf'] <= 1:
+            raise CommandError('--zipf должен быть больше 1.')
+        if options['reviews'] > options['users'] * options['titles']:
+            raise CommandError(
+                'Отзывов больше, чем пар (произведение, автор): увеличьте '
+                '--users или --titles.'
+            )
+        self.rng = np.random.default_rng(options['seed'])
+        self.zipf = options['zipf']
+        self.path = options['path']
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.suffix = '.gz' if options['gzip'] else ''
+        now = timezone.now()
+        self.year = now.year
+        # Даты заканчиваются началом текущих суток: в течение дня один
+        # и тот же --seed даёт одинаковые файлы.
+        self.now = np.datetime64(now.date(), 's')
+        comments = options['comments']
+        if comments is None:
+            comments = options['reviews'] // 2
+
+        started = time.perf_counter()
+        self.generate_users(options['users'])
+        self.generate_categories_and_genres()
+        self.generate_titles(options['titles'], options['genres_per_title'])
+        self.generate_reviews(
+            options['reviews'], options['titles'], options['users']
+        )
+        self.generate_comments(comments, options['reviews'], options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные записаны в {self.path} за '
+            f'{time.perf_counter() - started:.1f} с.'
+        ))
+
+    def popular(self, count, size):
+        """
+        Выбирает size id из 1..count с вероятностью по закону Ципфа.
+
+        Самые популярные id случайно перемешаны, чтобы популярность
+        не совпадала с порядком id.
+        """
+        ranks = np.empty(0, dtype=np.int64)
+        if not size:
+            return ranks
+        while len(ranks) < size:
+            sample = self.rng.zipf(self.zipf, size=int(size * 1.3) + 16)
+            ranks = np.concatenate((ranks, sample[sample <= count]))
+        popularity = self.rng.permutation(count) + 1
+        return popularity[ranks[:size] - 1]
+
+    def dates(self, size, start=FIRST_DATE):
+        """Случайные даты между start и текущим моментом в формате ISO."""
+        start = np.asarray(start, dtype='datetime64[s]')
+        span = (self.now - start).astype(np.int64)
+        offsets = (self.rng.random(size) * np.maximum(span, 1)).astype(
+            'timedelta64[s]'
+        )
+        return np.char.add(
+            np.datetime_as_string(start + offsets, unit='s').astype(str), 'Z'
+        )
+
+    def generate_users(self, count):
+        ids = np.arange(1, count + 1)
+        roles = self.rng.choice(ROLES, size=count, p=ROLE_WEIGHTS)
+        usernames = [f'user{i}' for i in range(1, count + 1)]
+        self.write('users', (
+            ids, usernames, [f'{name}@yamdb.fake' for name in usernames],
+            roles, [''] * count, [''] * count, [''] * count,
+        ))
+
+    def generate_categories_and_genres(self):
+        for name, values in (('categories', CATEGORIES), ('genres', GENRES)):
+            self.write(name, (
+                np.arange(1, len(values) + 1),
+                [value[0] for value in values],
+                [value[1] for value in values],
+            ))
+
+    def generate_titles(self, count, genres_per_title):
+        ids = np.arange(1, count + 1)
+        words = self.rng.integers(0, len(TITLE_WORDS), size=(2, count))
+        names = [
+            f'{first} {second} {i}' for first, second, i in zip(
+                TITLE_WORDS[words[0]], TITLE_WORDS[words[1]], ids.tolist()
+            )
+        ]
+        self.write('titles', (
+            ids, names,
+            self.rng.integers(1900, self.year + 1, count),
+            self.rng.integers(1, len(CATEGORIES) + 1, count),
+            [''] * count,
+        ))
+
+        # У каждого произведения от 1 до genres_per_title разных жанров:
+        # подряд идущие по кругу жанры от случайного первого.
+        genres_per_title = min(genres_per_title, len(GENRES))
+        per_title = self.rng.integers(1, genres_per_title + 1, count)
+        title_ids = np.repeat(ids, per_title)
+        first_genre = np.repeat(self.rng.integers(0, len(GENRES), count),
+                                per_title)
+        position = np.arange(len(title_ids)) - np.repeat(
+            np.cumsum(per_title) - per_title, per_title
+        )
+        self.write('genre_titles', (
+            np.arange(1, len(title_ids) + 1),
+            title_ids,
+            (first_genre + position) % len(GENRES) + 1,
+        ))
+
+    def generate_reviews(self, count, titles, users):
+        # Популярные произведения получают больше отзывов, активные
+        # пользователи пишут чаще; пара (произведение, автор) уникальна.
+        pairs = np.empty(0, dtype=np.int64)
+        for _ in range(50):
+            missing = count - len(pairs)
+            if missing <= 0:
+                break
+            size = int(missing * 1.2) + 16
+            candidates = (
+                self.popular(titles, size) * (users + 1)
+                + self.popular(users, size)
+            )
+            pairs = np.concatenate((pairs, candidates))
+            _, first = np.unique(pairs, return_index=True)
+            pairs = pairs[np.sort(first)]
+        if len(pairs) < count:
+            raise CommandError(
+                'Не удалось набрать уникальные пары (произведение, автор): '
+                'уменьшите --zipf или увеличьте --users и --titles.'
+            )
+        pairs = pairs[:count]
+        title_ids, author_ids = np.divmod(pairs, users + 1)
+
+        # Оценка складывается из «качества» произведения и разброса мнений.
+        quality = self.rng.normal(6.5, 1.5, titles + 1)
+        scores = np.clip(
+            np.rint(quality[title_ids] + self.rng.normal(0, 2, count)), 1, 10
+        ).astype(np.int64)
+        self.review_dates = self.dates(count)
+        self.write('reviews', (
+            np.arange(1, count + 1),
+            title_ids,
+            REVIEW_TEXTS[self.rng.integers(0, len(REVIEW_TEXTS), count)],
+            author_ids,
+            scores,
+            self.review_dates,
+        ))
+
+    def generate_comments(self, count, reviews, users):
+        if not reviews:
+            count = 0
+        review_ids = self.popular(reviews, count)
+        # Комментарий не может появиться раньше отзыва.
+        review_dates = np.char.rstrip(
+            self.review_dates[review_ids - 1], 'Z'
+        ).astype('datetime64[s]')
+        self.write('comments', (
+            np.arange(1, count + 1),
+            review_ids,
+            COMMENT_TEXTS[self.rng.integers(0, len(COMMENT_TEXTS), count)],
+            self.popular(users, count),
+            self.dates(count, review_dates),
+        ))
+
+    def write(self, table_name, columns):
+        """Пишет колонки в CSV пачками, не собирая строки целиком."""
+        table = TABLES_BY_NAME[table_name]
+        path = self.path / (table.filename + self.suffix)
+        count = len(columns[0])
+        started = time.perf_counter()
+        with open_csv(path, 'w') as file:
+            writer = csv.writer(file)
+            # Необязательные колонки в конце (пароли, флаги и даты
+            # пользователей) не генерируются.
+            writer.writerow(table.header[:len(columns)])
+            for start in range(0, count, WRITE_CHUNK):
+                writer.writerows(zip(*(
+                    self.tolist(column[start:start + WRITE_CHUNK])
+                    for column in columns
+                )))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{path}: {count} строк за {elapsed:.1f} с.')
+
+    @staticmethod
+    def tolist(column):
+        return column.tolist() if isinstance(column, np.ndarray) else column
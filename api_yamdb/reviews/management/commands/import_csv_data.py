@@ -1,248 +1,333 @@
-import csv
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.utils import IntegrityError
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.csv_checks import CsvValidator
+from reviews.csv_data import (
+    TABLES,
+    IdSet,
+    ParsedChunks,
+    dependency_order,
+    find_file
+)
+from reviews.sqlite import optimize
 
-
-User = get_user_model()
+TEMPORARY_PASSWORD = 'temporary_password_123'
+MAX_REPORTED_ERRORS = 20
 
 
 class Command(BaseCommand):
     help = "Импортируем все данные из CSV файлов"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=Path,
+            default=settings.BASE_DIR / 'static' / 'data',
+            help='Каталог с CSV файлами.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк записывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Сколько процессов разбирают строки CSV. Запись в базу '
+                 'всегда идёт из одного процесса.'
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Обновлять уже существующие по id строки. Строки без '
+                 'изменений пропускаются без записи.'
+        )
+        parser.add_argument(
+            '--passwords',
+            choices=('shared', 'unusable', 'hash'),
+            default='shared',
+            help='Пароли новых пользователей: shared — один хеш временного '
+                 'пароля на всех, unusable — вход по паролю невозможен, '
+                 'hash — отдельный хеш каждому (считается в --workers '
+                 'процессах).'
+        )
+        parser.add_argument(
+            '--password',
+            default=TEMPORARY_PASSWORD,
+            help='Временный пароль для режимов shared и hash.'
+        )
+        parser.add_argument(
+            '--validate-only',
+            action='store_true',
+            help='Только проверить файлы целиком: id, ссылки между '
+                 'таблицами, уникальные пары, годы и оценки. В базу '
+                 'ничего не пишется.'
+        )
+
     def handle(self, *args, **options):
-        self.import_users()
-        self.import_categories()
-        self.import_genres()
-        self.import_titles()
-        self.import_genre_titles()
-        self.import_reviews()
-        self.import_comments()
-
-    def import_model(self, filename, model, process_row_callback=None,
-                     use_bulk_create=False):
-        """Общий метод для импорта моделей из CSV файлов."""
-        model_name = model._meta.verbose_name_plural
-        self.stdout.write(f'Импортируем {model_name}.')
-        try:
-            with open(filename, mode='r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                if use_bulk_create:
-                    self._bulk_create_objects(
-                        reader, model, process_row_callback)
-                else:
-                    self._single_create_objects(
-                        reader, model, process_row_callback, model_name)
-                self.stdout.write(self.style.SUCCESS(
-                    f'{model_name.capitalize()} успешно импортированы.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(
-                f'Файл {filename} не найден.'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(
-                f'Ошибка при импорте {model_name}: {e}.'))
-
-    def _bulk_create_objects(self, reader, model, process_row_callback):
-        """Обрабатывает массовое создание объектов."""
-        objects_to_create = []
-        for row in reader:
-            if process_row_callback:
-                obj = process_row_callback(row, model)
-            else:
-                obj = model(**row)
-            if obj:
-                objects_to_create.append(obj)
-        if objects_to_create:
-            model.objects.bulk_create(objects_to_create)
-
-    def _single_create_objects(self, reader, model, process_row_callback,
-                               model_name):
-        """Обрабатывает построчное создание объектов."""
-        for row in reader:
-            try:
-                if process_row_callback:
-                    process_row_callback(row, model)
-                else:
-                    model.objects.get_or_create(**row)
-            except IntegrityError as e:
-                self.stdout.write(
-                    f'Не удалось добавить {model_name[:-1]}: {e}')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(
-                    f'Ошибка при создании {model_name[:-1]}: {e}'))
-
-    @transaction.atomic
-    def import_users(self):
-        """Импорт пользователей с обработкой пароля."""
-        def process_user_row(row, model):
-            user = model(
-                id=row['id'],
-                username=row['username'],
-                email=row['email'],
-                role=row['role'],
-                bio=row['bio'],
-                first_name=row['first_name'],
-                last_name=row['last_name'],
-            )
-            user.set_password('temporary_password_123')
-            return user
-        self.import_model(
-            'static/data/users.csv',
-            User,
-            process_row_callback=process_user_row,
-            use_bulk_create=True
+        self.path = options['path']
+        self.workers = options['workers']
+        if options['validate_only']:
+            self.validate()
+            return
+        self.batch_size = options['batch_size']
+        self.upsert = options['upsert']
+        self.passwords = options['passwords']
+        self.password = options['password']
+        self.shared_password = None
+        # id, которые уже есть в базе или импортированы: по ним
+        # проверяются внешние ключи без запросов к базе.
+        self.known_ids = {}
+        started = time.perf_counter()
+        if self.workers > 1:
+            with ProcessPoolExecutor(
+                self.workers, initializer=django.setup
+            ) as pool:
+                self.import_tables(pool)
+        else:
+            self.import_tables()
+        self.reset_sequences()
+        if connection.vendor == 'sqlite':
+            optimize(connection)
+        self.stdout.write(
+            f'Импорт завершён за {time.perf_counter() - started:.1f} с.'
         )
 
-    @transaction.atomic
-    def import_categories(self):
-        """Импорт категорий."""
-        def process_category_row(row, model):
-            return model.objects.get_or_create(
-                id=row['id'],
-                name=row['name'],
-                slug=row['slug']
-            )
-        self.import_model(
-            'static/data/category.csv',
-            Category,
-            process_row_callback=process_category_row
+    def validate(self):
+        pool = (
+            ProcessPoolExecutor(self.workers, initializer=django.setup)
+            if self.workers > 1 else nullcontext()
+        )
+        with pool as executor:
+            validator = CsvValidator(self.path, executor)
+            problems = validator.validate()
+        for filename in validator.missing:
+            self.stdout.write(self.style.WARNING(
+                f'Файл {self.path / filename} не найден.'
+            ))
+        for filename, rows in validator.rows.items():
+            self.stdout.write(f'{filename}: {rows} строк.')
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(str(problem)))
+        summary = (
+            f'Проверено {sum(validator.rows.values())} строк за '
+            f'{validator.elapsed:.1f} с'
         )
+        if problems:
+            raise CommandError(
+                f'{summary}, ошибок: {validator.error_count}.'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{summary}, ошибок нет.'))
+
+    def import_tables(self, pool=None):
+        """
+        Импортирует таблицы в порядке зависимостей по внешним ключам.
 
-    @transaction.atomic
-    def import_genres(self):
-        """Импорт жанров."""
-        def process_genre_row(row, model):
-            return model.objects.get_or_create(
-                id=row['id'],
-                name=row['name'],
-                slug=row['slug']
+        Разбор следующей таблицы начинается в пуле, пока пишется текущая.
+        """
+        self.pool = pool
+        tables = dependency_order(TABLES)
+        pipelines = [
+            ParsedChunks(
+                table, find_file(self.path, table), self.batch_size,
+                pool, window=2 * self.workers
             )
-        self.import_model(
-            'static/data/genre.csv',
-            Genre,
-            process_row_callback=process_genre_row
+            for table in tables
+        ]
+        following = pipelines[1:] + [None]
+        for table, chunks, next_chunks in zip(tables, pipelines, following):
+            self.import_table(table, chunks, next_chunks)
+
+    def import_table(self, table, chunks, next_chunks=None):
+        """Записывает разобранные пачки строк одной таблицы."""
+        model_name = table.model._meta.verbose_name_plural
+        self.known_ids[table.name] = IdSet(
+            table.model.objects.values_list('pk', flat=True).iterator()
         )
+        if find_file(self.path, table) is None:
+            self.stdout.write(self.style.ERROR(
+                f'Файл {self.path / table.filename} не найден.'
+            ))
+            return
 
-    @transaction.atomic
-    def import_titles(self):
-        """Импорт произведений."""
-        def process_title_row(row, model):
-            try:
-                category = Category.objects.get(id=row['category'])
-                return model.objects.get_or_create(
-                    id=row['id'],
-                    defaults={
-                        'name': row['name'],
-                        'year': row['year'],
-                        'category': category
-                    }
+        self.stdout.write(f'Импортируем {model_name}.')
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+        started = time.perf_counter()
+        for converted, errors in chunks:
+            if next_chunks is not None:
+                next_chunks.fill()
+            for line, error in errors:
+                self.row_error(table, line, error)
+            self.write_chunk(table, self.check_rows(table, converted))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{model_name.capitalize()}: добавлено {self.stats["created"]}, '
+            f'обновлено {self.stats["updated"]}, '
+            f'пропущено {self.stats["skipped"]}, '
+            f'ошибок {self.stats["errors"]} за {elapsed:.1f} с '
+            f'({self.rate(elapsed):.0f} строк/с).'
+        ))
+
+    def check_rows(self, table, converted):
+        """
+        Отбрасывает строки со ссылками на несуществующие объекты, а без
+        --upsert и уже импортированные строки.
+        """
+        known = self.known_ids[table.name]
+        valid = []
+        for line, values in converted:
+            if values['id'] in known and not self.upsert:
+                self.stats['skipped'] += 1
+                continue
+            missing = [
+                f'{field}={values[field]}'
+                for field, target in table.foreign_keys.items()
+                if values[field] is not None
+                and values[field] not in self.known_ids[target]
+            ]
+            if missing:
+                self.row_error(
+                    table, line, f'нет объектов для {", ".join(missing)}'
                 )
-            except Category.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
-                    f'Категория с id {row["category"]} не найдена'
-                ))
-                return None, False
-        self.import_model(
-            'static/data/titles.csv',
-            Title,
-            process_row_callback=process_title_row
-        )
+                continue
+            valid.append((line, values, values['id'] not in known))
+            known.add(values['id'])
+        if self.upsert:
+            valid = self.changed_rows(table, valid)
+        return valid
 
-    @transaction.atomic
-    def import_genre_titles(self):
-        """Импорт связей между произведениями и жанрами."""
-        self.stdout.write('Импортируем связи между произведениями и жанрами.')
+    def changed_rows(self, table, rows):
+        """
+        Оставляет новые строки и строки, отличающиеся от записанных
+        в базе. Текущие значения читаются одним запросом на пачку.
+        """
+        fields = table.fields
+        # При повторе id в файле побеждает последняя строка.
+        latest = {values['id']: (line, values) for line, values, _ in rows}
+        ids = list(latest)
+        step = connection.features.max_query_params or len(ids) or 1
+        stored = {}
+        for start in range(0, len(ids), step):
+            stored.update(
+                (row[0], row)
+                for row in table.model.objects.filter(
+                    pk__in=ids[start:start + step]
+                ).values_list(*fields)
+            )
+        changed = []
+        for line, values in latest.values():
+            current = stored.get(values['id'])
+            if current is None:
+                changed.append((line, values, True))
+                continue
+            # Поля с пустыми значениями (UNSET) остаются как в базе.
+            values = {**dict(zip(fields, current)), **values}
+            if current != tuple(values[field] for field in fields):
+                changed.append((line, values, False))
+            else:
+                self.stats['skipped'] += 1
+        return changed
+
+    def write_chunk(self, table, rows):
+        objects = [table.model(**values) for _, values, _ in rows]
+        if not objects:
+            return
+        if table.name == 'users':
+            # Хеш из выгрузки export_csv_data переносится как есть.
+            self.set_passwords([
+                obj for obj, (_, values, new) in zip(objects, rows)
+                if new and 'password' not in values
+            ])
+        options = self.bulk_options(table)
         try:
-            with open('static/data/genre_title.csv', mode='r', encoding='utf-8'
-                      ) as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    try:
-                        title = Title.objects.get(id=row['title_id'])
-                        genre = Genre.objects.get(id=row['genre_id'])
-                        title.genre.add(genre)
-                    except Title.DoesNotExist:
-                        self.stdout.write(self.style.ERROR(
-                            f'Произведение с ID {row["title_id"]} не найдено'
-                        ))
-                    except Genre.DoesNotExist:
-                        self.stdout.write(self.style.ERROR(
-                            f'Жанр с ID {row["genre_id"]} не найден'
-                        ))
-            self.stdout.write(self.style.SUCCESS(
-                'Связи между произведениями и жанрами успешно импортированы.'))
-        except FileNotFoundError:
+            with transaction.atomic():
+                table.model.objects.bulk_create(objects, **options)
+            for _, _, new in rows:
+                self.count_written(new)
+        except IntegrityError:
+            # Нарушена уникальность внутри пачки: ищем виноватые строки.
+            self.write_one_by_one(table, rows, objects, options)
+
+    def write_one_by_one(self, table, rows, objects, options):
+        for (line, values, new), obj in zip(rows, objects):
+            try:
+                with transaction.atomic():
+                    table.model.objects.bulk_create([obj], **options)
+                self.count_written(new)
+            except IntegrityError as error:
+                if new:
+                    self.known_ids[table.name].discard(values['id'])
+                self.row_error(table, line, error)
+
+    def bulk_options(self, table):
+        options = {'batch_size': self.batch_size}
+        if self.upsert:
+            options.update(
+                update_conflicts=True,
+                unique_fields=('id',),
+                update_fields=table.fields[1:],
+            )
+        return options
+
+    def count_written(self, new):
+        self.stats['created' if new else 'updated'] += 1
+
+    def set_passwords(self, users):
+        """
+        Задаёт пароли новым пользователям пачки.
+
+        Хеширование PBKDF2 занимает сотни миллисекунд на пароль, поэтому
+        по умолчанию хеш временного пароля считается один раз.
+        """
+        if self.passwords == 'unusable':
+            for user in users:
+                user.set_unusable_password()
+            return
+        if self.passwords == 'shared':
+            if self.shared_password is None:
+                self.shared_password = make_password(self.password)
+            hashes = [self.shared_password] * len(users)
+        elif self.pool is not None:
+            hashes = self.pool.map(
+                make_password, [self.password] * len(users),
+                chunksize=max(len(users) // (4 * self.workers), 1)
+            )
+        else:
+            hashes = [make_password(self.password) for _ in users]
+        for user, password in zip(users, hashes):
+            user.password = password
+
+    def row_error(self, table, line, error):
+        self.stats['errors'] += 1
+        if self.stats['errors'] <= MAX_REPORTED_ERRORS:
             self.stdout.write(self.style.ERROR(
-                'Файл static/data/genre_title.csv не найден.'))
-        except Exception as e:
+                f'{table.filename}, строка {line}: {error}'
+            ))
+        elif self.stats['errors'] == MAX_REPORTED_ERRORS + 1:
             self.stdout.write(self.style.ERROR(
-                f'Ошибка при импорте связей: {e}.'))
+                f'{table.filename}: остальные ошибки не выводятся.'
+            ))
 
-    @transaction.atomic
-    def import_reviews(self):
-        """Импорт отзывов."""
-        def process_review_row(row, model):
-            try:
-                title = Title.objects.get(id=row['title_id'])
-                author = User.objects.get(id=row['author'])
-                return model.objects.get_or_create(
-                    id=row['id'],
-                    defaults={
-                        'title': title,
-                        'author': author,
-                        'text': row['text'],
-                        'pub_date': row['pub_date'],
-                        'score': row['score']
-                    }
-                )
-            except Title.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
-                    f'Произведение с ID {row["title_id"]} не найдено'
-                ))
-                return None, False
-            except User.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
-                    f'Пользователь с ID {row["author"]} не найден'
-                ))
-                return None, False
-        self.import_model(
-            'static/data/review.csv',
-            Review,
-            process_row_callback=process_review_row
-        )
+    def rate(self, elapsed):
+        processed = sum(self.stats.values())
+        return processed / elapsed if elapsed else 0
 
-    @transaction.atomic
-    def import_comments(self):
-        """Импорт комментариев."""
-        def process_comment_row(row, model):
-            try:
-                review = Review.objects.get(id=row['review_id'])
-                author = User.objects.get(id=row['author'])
-                return model.objects.get_or_create(
-                    id=row['id'],
-                    defaults={
-                        'review': review,
-                        'author': author,
-                        'text': row['text'],
-                        'pub_date': row['pub_date']
-                    }
-                )
-            except Review.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
-                    f'Отзыв с ID {row["review_id"]} не найден'
-                ))
-                return None, False
-            except User.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
-                    f'Пользователь с ID {row["author"]} не найден'
-                ))
-                return None, False
-        self.import_model(
-            'static/data/comments.csv',
-            Comment,
-            process_row_callback=process_comment_row
-        )
+    def reset_sequences(self):
+        """Сдвигает автоинкремент за импортированные id (PostgreSQL)."""
+        models = [table.model for table in TABLES]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from reviews.sqlite import checkpoint, optimize
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляем статистику планировщика запросов SQLite. Запускать '
+        'периодически (например, раз в сутки из cron) и после импорта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы из settings.DATABASES.'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Полный ANALYZE вместо PRAGMA optimize.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            action='store_true',
+            help='Перенести журнал WAL в базу и обрезать его.'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                f'База {options["database"]} не SQLite, делать нечего.'
+            ))
+            return
+        optimize(connection, analyze=options['analyze'])
+        self.stdout.write(self.style.SUCCESS(
+            'ANALYZE выполнен.' if options['analyze']
+            else 'PRAGMA optimize выполнен.'
+        ))
+        if options['checkpoint']:
+            busy, log, checkpointed = checkpoint(connection)
+            self.stdout.write(
+                f'Checkpoint: перенесено страниц {checkpointed} из {log}'
+                f'{", база занята" if busy else ""}.'
+            )
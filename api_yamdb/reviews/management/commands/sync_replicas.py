@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from reviews.sqlite import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Копируем основную базу SQLite в реплики из '
+        'settings.DATABASE_REPLICAS (для локальной проверки реплик)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Повторять копирование, а не завершаться.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между копированиями, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError('settings.DATABASE_REPLICAS пуст.')
+        if any(db.vendor != 'sqlite' for db in [primary, *replicas]):
+            raise CommandError(
+                'Копировать можно только SQLite; реплики других СУБД '
+                'обновляет сама СУБД.'
+            )
+        while True:
+            started = time.perf_counter()
+            for replica in replicas:
+                copy_database(primary, replica)
+            self.stdout.write(
+                f'Реплики обновлены за '
+                f'{time.perf_counter() - started:.2f} с.'
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
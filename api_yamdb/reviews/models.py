@@ -113,6 +113,10 @@ class GenreTitle(models.Model):
         related_name='genres'
     )
 
+    class Meta:
+        verbose_name = 'Жанр произведения'
+        verbose_name_plural = 'Жанры произведений'
+
     def __str__(self):
         return f'{self.genre} {self.title}'
 
@@ -141,7 +145,8 @@ class Review(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         db_index=True
     )
 
@@ -178,7 +183,8 @@ class Comment(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата добавления',
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         db_index=True
     )
 
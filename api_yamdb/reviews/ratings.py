@@ -0,0 +1,124 @@
+"""
+Пересчёт рейтингов произведений по отзывам.
+
+Колонки (title_id, score) читаются из базы пачками и сразу сводятся
+через np.bincount в массивы, индексированные id произведения: число
+отзывов, сумма оценок и распределение оценок. Память зависит от числа
+произведений, а не отзывов, и диапазоны id отзывов можно сводить в
+разных процессах, а затем сложить.
+"""
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from reviews.models import Review, Title
+
+CHUNK_ROWS = 500_000
+
+
+class RatingTotals:
+    """Число отзывов, сумма и распределение оценок по id произведений."""
+
+    def __init__(self, size):
+        self.low = settings.MIN_SCORE_VALUE
+        width = settings.MAX_SCORE_VALUE - self.low + 1
+        self.counts = np.zeros(size, np.int64)
+        self.sums = np.zeros(size, np.int64)
+        self.distribution = np.zeros((size, width), np.int64)
+        # Отзывы с оценкой вне MIN_SCORE_VALUE..MAX_SCORE_VALUE.
+        self.invalid = np.zeros(size, np.int64)
+
+    def add(self, title_ids, scores):
+        size, width = self.distribution.shape
+        self.counts += np.bincount(title_ids, minlength=size)
+        self.sums += np.rint(
+            np.bincount(title_ids, weights=scores, minlength=size)
+        ).astype(np.int64)
+        offsets = scores - self.low
+        valid = (offsets >= 0) & (offsets < width)
+        self.invalid += np.bincount(title_ids[~valid], minlength=size)
+        self.distribution += np.bincount(
+            title_ids[valid] * width + offsets[valid],
+            minlength=size * width
+        ).reshape(size, width)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+        self.distribution += other.distribution
+        self.invalid += other.invalid
+        return self
+
+    def ratings(self):
+        """Средняя оценка; NaN у произведений без отзывов."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums / self.counts
+
+
+def id_bounds(database):
+    """
+    Диапазон id отзывов и размер массивов: наибольший id произведения,
+    в том числе из отзывов на удалённые произведения, плюс один.
+    """
+    connection = connections[database]
+    review, title_id, _ = columns(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(id), MAX(id), MAX({title_id}) '
+                       f'FROM {review}')
+        low, high, review_titles = cursor.fetchone()
+        cursor.execute(
+            'SELECT MAX(id) FROM '
+            f'{connection.ops.quote_name(Title._meta.db_table)}'
+        )
+        titles = cursor.fetchone()[0]
+    return low, high, max(review_titles or 0, titles or 0) + 1
+
+
+def split_range(low, high, parts):
+    """Полуинтервалы [начало, конец) id отзывов от low до high."""
+    if low is None:
+        return []
+    step = max((high - low + parts) // parts, 1)
+    return [
+        (start, min(start + step, high + 1))
+        for start in range(low, high + 1, step)
+    ]
+
+
+def read_totals(database, size, start, stop, chunk_rows=CHUNK_ROWS):
+    """Сводит отзывы с id из [start, stop)."""
+    connection = connections[database]
+    review, title_id, score = columns(connection)
+    totals = RatingTotals(size)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {title_id}, {score} FROM {review} '
+            'WHERE id >= %s AND id < %s',
+            [start, stop]
+        )
+        while rows := cursor.fetchmany(chunk_rows):
+            pairs = np.fromiter(
+                chain.from_iterable(rows), np.int64, 2 * len(rows)
+            ).reshape(-1, 2)
+            totals.add(pairs[:, 0], pairs[:, 1])
+    return totals
+
+
+def columns(connection):
+    """Таблица отзывов и её колонки title_id и score для сырого SQL."""
+    quote = connection.ops.quote_name
+    return (
+        quote(Review._meta.db_table),
+        quote(Review._meta.get_field('title').column),
+        quote(Review._meta.get_field('score').column),
+    )
+
+
+def existing_titles(database, size):
+    """Маска id произведений, которые есть в базе."""
+    exists = np.zeros(size, dtype=bool)
+    ids = Title.objects.using(database).values_list('id', flat=True)
+    exists[np.fromiter(ids.iterator(CHUNK_ROWS), np.int64)] = True
+    return exists
@@ -0,0 +1,44 @@
+"""Настройка соединений SQLite и обслуживание базы."""
+from django.conf import settings
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Выполняет settings.SQLITE_PRAGMAS на новом соединении SQLite.
+
+    PRAGMA идут напрямую через sqlite3, как и собственные PRAGMA бэкенда
+    Django: это настройка соединения, а не запросы вьюхи, и в учёт
+    запросов (execute_wrapper) они не попадают.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def optimize(connection, analyze=False):
+    """
+    Обновляет статистику, по которой SQLite выбирает индексы.
+
+    PRAGMA optimize пересчитывает только устаревшую статистику и обычно
+    занимает миллисекунды; ANALYZE пересчитывает её по всем таблицам.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE' if analyze else 'PRAGMA optimize')
+
+
+def checkpoint(connection):
+    """Переносит журнал WAL в файл базы и обрезает его."""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return cursor.fetchone()
+
+
+def copy_database(source, target):
+    """
+    Копирует базу SQLite соединения source в соединение target через
+    backup API: копия согласована, даже если в source идёт запись.
+    """
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+
+
+def queue_mail(subject, message, recipient):
+    """
+    Ставит письмо в очередь и сразу возвращает управление.
+
+    С EMAIL_OUTBOX_EAGER письмо сохраняется уже захваченным и
+    отправляется после коммита, поэтому send_queued_mail его не возьмёт.
+    """
+    eager = settings.EMAIL_OUTBOX_EAGER
+    email = OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient=recipient,
+        **(claim_fields() if eager else {}),
+    )
+    if eager:
+        transaction.on_commit(lambda: deliver([email]))
+    return email
+
+
+def claim_fields():
+    """Статус и срок, до которого письмо принадлежит отправителю."""
+    return {
+        'status': OutgoingEmail.Status.SENDING,
+        'send_after': timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT
+        ),
+    }
+
+
+def claim(batch_size):
+    """
+    Захватывает пачку писем, время отправки которых наступило.
+
+    Выборка и условный UPDATE идут в одной транзакции: в SQLite она
+    открывается BEGIN IMMEDIATE и не пересекается с другими, а СУБД с
+    SELECT ... FOR UPDATE пропускают строки, которые захватывает сосед.
+    Письма SENDING с истёкшим сроком — их отправитель упал — захватываются
+    заново.
+    """
+    ready = OutgoingEmail.objects.filter(
+        status__in=(
+            OutgoingEmail.Status.PENDING, OutgoingEmail.Status.SENDING
+        ),
+        send_after__lte=timezone.now()
+    )
+    fields = claim_fields()
+    with transaction.atomic():
+        emails = list(
+            ready.select_for_update(skip_locked=True)[:batch_size]
+        )
+        ready.filter(pk__in=[email.pk for email in emails]).update(**fields)
+    for email in emails:
+        email.status = fields['status']
+        email.send_after = fields['send_after']
+    return emails
+
+
+def send_queued_mail(batch_size=None):
+    """
+    Отправляет пачку писем, время отправки которых наступило.
+
+    Возвращает количество успешно отправленных писем.
+    """
+    return deliver(claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE))
+
+
+def deliver(emails):
+    """
+    Отправляет захваченные письма через одно SMTP-соединение.
+
+    Неудачные попытки откладываются с экспоненциально растущей паузой,
+    после EMAIL_OUTBOX_MAX_ATTEMPTS попыток письмо помечается как
+    неотправленное.
+    """
+    if not emails:
+        return 0
+    sent = 0
+    attempted = set()
+    try:
+        with get_connection() as connection:
+            for email in emails:
+                attempted.add(email.pk)
+                try:
+                    EmailMessage(
+                        subject=email.subject,
+                        body=email.body,
+                        from_email=email.from_email,
+                        to=[email.recipient],
+                        connection=connection,
+                    ).send()
+                except Exception as e:
+                    _schedule_retry(email, e)
+                else:
+                    email.status = OutgoingEmail.Status.SENT
+                    email.sent_at = timezone.now()
+                    sent += 1
+    except Exception as e:
+        # Не удалось открыть соединение или оно оборвалось:
+        # оставшиеся письма повторим позже.
+        for email in emails:
+            if email.pk not in attempted:
+                _schedule_retry(email, e)
+    _save_results(emails)
+    return sent
+
+
+def _save_results(emails):
+    """Отмечает отправленные письма одним UPDATE, остальные — пачкой."""
+    delivered = [
+        email.pk for email in emails
+        if email.status == OutgoingEmail.Status.SENT
+    ]
+    if delivered:
+        OutgoingEmail.objects.filter(pk__in=delivered).update(
+            status=OutgoingEmail.Status.SENT, sent_at=timezone.now()
+        )
+    retried = [
+        email for email in emails
+        if email.status != OutgoingEmail.Status.SENT
+    ]
+    if retried:
+        OutgoingEmail.objects.bulk_update(
+            retried, ('status', 'attempts', 'last_error', 'send_after')
+        )
+
+
+def _schedule_retry(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.Status.FAILED
+        return
+    email.status = OutgoingEmail.Status.PENDING
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+    email.send_after = timezone.now() + timedelta(seconds=delay)
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Отправляем письма из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Сколько писем отправлять за одно соединение.'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться на пустой очереди, а ждать новых писем.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между опросами пустой очереди, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_queued_mail(options['batch_size'])
+            if sent:
+                self.stdout.write(f'Отправлено писем: {sent}.')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:31
+
+import django.db.models.functions.text
+import users.models
+from django.db import IntegrityError, migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+MAX_REPORTED_CONFLICTS = 20
+
+
+def email_conflicts(User):
+    """id пользователей с email, совпадающими без учёта регистра."""
+    users = User.objects.annotate(normalized=Lower('email'))
+    duplicates = users.values('normalized').annotate(
+        count=Count('id')
+    ).filter(count__gt=1).values_list('normalized', flat=True)
+    conflicts = {}
+    for email, pk in users.filter(
+        normalized__in=list(duplicates[:MAX_REPORTED_CONFLICTS + 1])
+    ).order_by('normalized', 'id').values_list('normalized', 'id'):
+        conflicts.setdefault(email, []).append(pk)
+    return conflicts
+
+
+def lowercase_emails(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    # Уникальный индекс упал бы на середине migrate с голой
+    # IntegrityError; объединять чужие учётные записи миграция не берётся.
+    conflicts = email_conflicts(User)
+    if conflicts:
+        lines = [
+            f'  {email or "(пустой)"}: id {", ".join(map(str, ids))}'
+            for email, ids in list(conflicts.items())[:MAX_REPORTED_CONFLICTS]
+        ]
+        if len(conflicts) > MAX_REPORTED_CONFLICTS:
+            lines.append('  ...')
+        raise IntegrityError(
+            'email становится уникальным без учёта регистра, но у '
+            'пользователей совпадают email:\n' + '\n'.join(lines) +
+            '\nИсправьте email или объедините этих пользователей и '
+            'повторите migrate.'
+        )
+    User.objects.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UserManager()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(error_messages={'unique': 'Пользователь с таким email уже существует.'}, help_text='Не более 254 символов. Хранится в нижнем регистре.', max_length=254, unique=True, verbose_name='Email адрес'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.CheckConstraint(condition=models.Q(('email', django.db.models.functions.text.Lower('email'))), name='email_lowercase'),
+        ),
+    ]
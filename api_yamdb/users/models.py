@@ -1,7 +1,10 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
+from django.utils import timezone
 
 
 UserNameValidator = RegexValidator(
@@ -10,6 +13,14 @@ UserNameValidator = RegexValidator(
 )
 
 
+class UserManager(DjangoUserManager):
+    """Менеджер, приводящий email к нижнему регистру целиком."""
+
+    @classmethod
+    def normalize_email(cls, email):
+        return (email or '').lower()
+
+
 class User(AbstractUser):
     """
     Модель пользователя с расширенными полями.
@@ -30,9 +41,12 @@ class User(AbstractUser):
     )
 
     email = models.EmailField(
-        blank=True,
+        unique=True,
         verbose_name='Email адрес',
-        help_text='Не более 254 символов.'
+        help_text='Не более 254 символов. Хранится в нижнем регистре.',
+        error_messages={
+            'unique': 'Пользователь с таким email уже существует.',
+        },
     )
 
     first_name = models.CharField(
@@ -64,15 +78,23 @@ class User(AbstractUser):
         verbose_name='Роль'
     )
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['username']
         constraints = [
             models.CheckConstraint(
-                check=~models.Q(username='me'),
+                condition=~models.Q(username='me'),
                 name='username_not_me'
-            )
+            ),
+            # Уникальный индекс по email остаётся регистронезависимым,
+            # только если email всегда хранится в нижнем регистре.
+            models.CheckConstraint(
+                condition=models.Q(email=Lower('email')),
+                name='email_lowercase'
+            ),
         ]
 
     def __str__(self):
@@ -85,3 +107,65 @@ class User(AbstractUser):
     @property
     def is_moderator(self):
         return self.role == self.Role.MODERATOR
+
+
+class OutgoingEmail(models.Model):
+    """
+    Письмо в очереди на отправку.
+
+    Запросы только сохраняют письмо, отправкой занимается команда
+    send_queued_mail. Письмо в статусе SENDING захвачено отправителем до
+    send_after; если тот не успел его отправить, письмо захватывают снова.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        SENDING = 'sending', 'Отправляется'
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Не отправлено'
+
+    subject = models.CharField(
+        max_length=settings.MAX_NAME_LENGTH,
+        verbose_name='Тема'
+    )
+    body = models.TextField(verbose_name='Текст письма')
+    from_email = models.EmailField(verbose_name='Отправитель')
+    recipient = models.EmailField(verbose_name='Получатель')
+    status = models.CharField(
+        max_length=max(map(len, Status.values)),
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток отправки'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    send_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Отправить не раньше'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата отправки'
+    )
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('send_after',)
+        indexes = (
+            models.Index(
+                fields=('status', 'send_after'),
+                name='outgoing_email_queue_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.subject} -> {self.recipient}'
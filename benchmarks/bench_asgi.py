@@ -0,0 +1,203 @@
+"""
+Пропускная способность API чтения под WSGI (gunicorn, gthread) и ASGI
+(uvicorn, асинхронные вьюхи из api.async_views).
+
+Много одновременных клиентов по keep-alive соединениям запрашивают список
+и карточки произведений, отзывы и комментарии. Параллельно --slow
+медленных клиентов бесконечно дописывают заголовки своего запроса: под
+WSGI каждый такой клиент занимает поток, под ASGI — только сокет.
+
+Запуск из корня репозитория (нужны gunicorn и uvicorn):
+    python benchmarks/bench_asgi.py --connections 200 --slow 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from common import PROJECT_DIR, percentile, read_response, setup_django
+
+SERVERS = ('wsgi', 'asgi')
+SETTINGS = """
+from api_yamdb.settings import *  # noqa
+
+DEBUG = False
+DATABASES['default']['NAME'] = {db_path!r}
+"""
+
+
+def make_database(db_path, titles, reviews):
+    setup_django(db_path)
+    from django.core.management import call_command
+
+    data_dir = Path(tempfile.mkdtemp(prefix='yamdb-csv-'))
+    call_command(
+        'generate_dataset', path=data_dir, users=max(reviews // 20, 10),
+        titles=titles, reviews=reviews, stdout=StringIO()
+    )
+    call_command('import_csv_data', path=data_dir, stdout=StringIO())
+
+
+def make_paths(db_path, count=1000):
+    with sqlite3.connect(db_path) as db:
+        reviews = db.execute(
+            'SELECT title_id, id FROM reviews_review ORDER BY random() '
+            'LIMIT ?', (count,)
+        ).fetchall()
+    paths = ['/api/v1/titles/', '/api/v1/titles/?page=2']
+    for title_id, review_id in reviews:
+        paths += [
+            f'/api/v1/titles/{title_id}/',
+            f'/api/v1/titles/{title_id}/reviews/',
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+        ]
+    return paths
+
+
+def start_server(kind, port, settings_dir, args):
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'bench_settings',
+        'PYTHONPATH': os.pathsep.join((str(settings_dir), str(PROJECT_DIR))),
+    }
+    if kind == 'wsgi':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'api_yamdb.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+            '--worker-class', 'gthread', '--threads', str(args.threads),
+            '--keep-alive', '30', '--log-level', 'warning',
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'api_yamdb.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(args.workers), '--no-access-log',
+            '--log-level', 'warning',
+        ]
+    server = subprocess.Popen(command, cwd=PROJECT_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'Сервер {kind} не запустился.')
+
+
+async def client(port, paths, finish, durations, errors, seed):
+    rng = random.Random(seed)
+    reader = writer = None
+    loop = asyncio.get_running_loop()
+    while loop.time() < finish:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port
+                )
+            started = time.perf_counter()
+            writer.write(
+                f'GET {rng.choice(paths)} HTTP/1.1\r\n'
+                f'Host: localhost\r\n\r\n'.encode()
+            )
+            status, close = await read_response(reader)
+            durations.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                errors.append(status)
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append('connection')
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(port, finish):
+    """Шлёт заголовки по одному в секунду и не заканчивает запрос."""
+    loop = asyncio.get_running_loop()
+    try:
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /api/v1/titles/ HTTP/1.1\r\nHost: localhost\r\n')
+        number = 0
+        while loop.time() < finish:
+            await asyncio.sleep(1)
+            number += 1
+            writer.write(f'X-Slow-{number}: 1\r\n'.encode())
+            await writer.drain()
+        writer.close()
+    except OSError:
+        pass
+
+
+async def load(port, paths, args):
+    finish = asyncio.get_running_loop().time() + args.duration
+    durations = []
+    errors = []
+    await asyncio.gather(
+        *(slow_client(port, finish) for _ in range(args.slow)),
+        *(
+            client(port, paths, finish, durations, errors, seed)
+            for seed in range(args.connections)
+        ),
+    )
+    return durations, errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--slow', type=int, default=0,
+                        help='Сколько медленных клиентов держат соединения.')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Потоков на процесс gunicorn.')
+    parser.add_argument('--titles', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=50_000)
+    parser.add_argument('--servers', nargs='+', default=SERVERS,
+                        choices=SERVERS)
+    args = parser.parse_args()
+
+    settings_dir = Path(tempfile.mkdtemp(prefix='yamdb-bench-'))
+    db_path = settings_dir / 'db.sqlite3'
+    make_database(db_path, args.titles, args.reviews)
+    (settings_dir / 'bench_settings.py').write_text(
+        SETTINGS.format(db_path=str(db_path))
+    )
+    paths = make_paths(db_path)
+
+    for kind in args.servers:
+        port = free_port()
+        server = start_server(kind, port, settings_dir, args)
+        try:
+            durations, errors = asyncio.run(load(port, paths, args))
+        finally:
+            server.terminate()
+            server.wait()
+        print(
+            f'{kind}: {len(durations) / args.duration:8.0f} запросов/с '
+            f'p50={percentile(durations, 0.5):8.1f} ms '
+            f'p95={percentile(durations, 0.95):8.1f} ms '
+            f'ошибок={len(errors)}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Задержка и число запросов к базе для каждой ручки API на наборе данных
+заданного размера.
+
+Набор (--size: 1k, 100k или 1m произведений и столько же отзывов)
+создают generate_dataset и import_csv_data. База сохраняется во
+временном каталоге по размеру и переиспользуется следующими прогонами.
+Запросы идут через тестовый клиент Django без сети, лимиты запросов
+отключены.
+
+Результат пишется в JSON (--output). С --baseline он сравнивается с
+сохранённым результатом: рост p50 больше чем в --threshold раз, рост
+числа запросов к базе или новые ошибки считаются регрессией, и скрипт
+завершается с кодом 1. Время сравнивается с поправкой на скорость машины:
+в начале каждого прогона замеряется фиксированная работа на чистом
+Python (calibration_ms).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_endpoints.py --size 1k --output base.json
+    python benchmarks/bench_endpoints.py --size 1k --baseline base.json
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import StringIO
+from itertools import count
+from pathlib import Path
+
+from common import percentile, setup_django, timed
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+THROTTLE_SCOPES = ('signup', 'token', 'reviews', 'comments')
+
+
+def calibrate():
+    """Медиана времени фиксированной работы: мерило скорости машины."""
+    return percentile(
+        timed(lambda _: sorted(str(n) for n in range(20_000)), 30), 0.5
+    )
+
+
+def make_database(size):
+    """База набора size; создаётся один раз и переиспользуется."""
+    db_path = Path(tempfile.gettempdir()) / f'yamdb-endpoints-{size}.sqlite3'
+    setup_django(
+        db_path, DEBUG=False, QUERY_STATS=False, SLOW_QUERY_MS=None,
+        SERVER_TIMING_SAMPLE_RATE=0,
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+    )
+    from django.core.management import call_command
+    from rest_framework.throttling import SimpleRateThrottle
+
+    from reviews.models import Title
+
+    # Ставки лимитов читаются при импорте DRF, поэтому отключаются здесь.
+    SimpleRateThrottle.THROTTLE_RATES = dict.fromkeys(THROTTLE_SCOPES)
+    if not Title.objects.exists():
+        rows = SIZES[size]
+        data_dir = Path(tempfile.mkdtemp(prefix='yamdb-csv-'))
+        print(f'Создаётся набор {size} в {db_path}...')
+        call_command(
+            'generate_dataset', path=data_dir, titles=rows, reviews=rows,
+            users=max(rows // 10, 100), stdout=StringIO()
+        )
+        call_command(
+            'import_csv_data', path=data_dir, passwords='unusable',
+            stdout=StringIO()
+        )
+    return db_path
+
+
+def sample_objects():
+    """Объекты для адресов: самое обсуждаемое произведение и отзыв."""
+    from django.db.models import Count
+
+    from reviews.models import Category, Genre, Review, Title
+
+    title = Title.objects.annotate(
+        reviews_count=Count('reviews')
+    ).order_by('-reviews_count').first()
+    review = Review.objects.annotate(
+        comments_count=Count('comments')
+    ).order_by('-comments_count').first()
+    return {
+        'title': title.pk,
+        'name': title.name.split()[0][:4],
+        'year': title.year,
+        'category': Category.objects.first().slug,
+        'genre': Genre.objects.first().slug,
+        'review_title': review.title_id,
+        'review': review.pk,
+    }
+
+
+def endpoints(objects, admin):
+    """Имя, метод, адрес и данные запроса (функция от номера запроса)."""
+    from django.contrib.auth.tokens import default_token_generator
+
+    confirmation_code = default_token_generator.make_token(admin)
+    signups = count()
+    run_id = int(time.time())
+
+    def signup():
+        username = f'bench{run_id}x{next(signups)}'
+        return {'username': username, 'email': f'{username}@yamdb.fake'}
+
+    title = f'/api/v1/titles/{objects["title"]}'
+    comments = (
+        f'/api/v1/titles/{objects["review_title"]}/reviews/'
+        f'{objects["review"]}/comments/'
+    )
+    return [
+        ('categories', 'get', '/api/v1/categories/', None),
+        ('genres', 'get', '/api/v1/genres/', None),
+        ('titles', 'get', '/api/v1/titles/', None),
+        ('titles?category', 'get',
+         f'/api/v1/titles/?category={objects["category"]}', None),
+        ('titles?genre', 'get',
+         f'/api/v1/titles/?genre={objects["genre"]}', None),
+        ('titles?name', 'get',
+         f'/api/v1/titles/?name={objects["name"]}', None),
+        ('titles?year', 'get',
+         f'/api/v1/titles/?year={objects["year"]}', None),
+        ('title', 'get', f'{title}/', None),
+        ('reviews', 'get', f'{title}/reviews/', None),
+        ('comments', 'get', comments, None),
+        ('users?search', 'get', '/api/v1/users/?search=user1', None),
+        ('signup', 'post', '/api/v1/auth/signup/', signup),
+        ('token', 'post', '/api/v1/auth/token/', lambda: {
+            'username': admin.username,
+            'confirmation_code': confirmation_code,
+        }),
+    ]
+
+
+def measure(client, method, url, data, warmup, repeat):
+    from api.queries import QueryCounter
+
+    send = getattr(client, method)
+    durations = []
+    queries = 0
+    errors = 0
+    for number in range(warmup + repeat):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with counter.capture():
+            if data is None:
+                response = send(url)
+            else:
+                response = send(url, data(), format='json')
+        elapsed = (time.perf_counter() - started) * 1000
+        if number < warmup:
+            continue
+        durations.append(elapsed)
+        queries = max(queries, counter.count)
+        errors += response.status_code >= 400
+    return {
+        'p50_ms': round(percentile(durations, 0.5), 3),
+        'p95_ms': round(percentile(durations, 0.95), 3),
+        'queries': queries,
+        'errors': errors,
+    }
+
+
+def run(args):
+    make_database(args.size)
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    admin, _ = get_user_model().objects.get_or_create(
+        username='bench-admin',
+        defaults={'email': 'bench-admin@yamdb.fake', 'role': 'admin'}
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}'
+    )
+    results = {}
+    calibration = calibrate()
+    print(f'Калибровка: {calibration:.3f} ms')
+    for name, method, url, data in endpoints(sample_objects(), admin):
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(
+            client, method, url, data, args.warmup, args.repeat
+        )
+        print_row(name, results[name])
+    return {
+        'size': args.size,
+        'repeat': args.repeat,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'calibration_ms': round(calibration, 3),
+        'endpoints': results,
+    }
+
+
+def print_row(name, result):
+    print(
+        f'{name:<18} p50={result["p50_ms"]:9.3f} ms '
+        f'p95={result["p95_ms"]:9.3f} ms запросов={result["queries"]:<3} '
+        f'ошибок={result["errors"]}'
+    )
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение и возвращает имена ручек с регрессией."""
+    if baseline['size'] != results['size']:
+        print(f'Базовый замер сделан на наборе {baseline["size"]}, '
+              f'а не {results["size"]}.')
+    regressions = []
+    speed = results['calibration_ms'] / baseline['calibration_ms']
+    print(f'\nСравнение с базовым замером от {baseline["created"]} '
+          f'(машина медленнее в {speed:.2f} раза):')
+    for name, result in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        ratios = {
+            key: result[key] / base[key] / speed if base[key] else 1
+            for key in ('p50_ms', 'p95_ms')
+        }
+        regressed = (
+            ratios['p50_ms'] > threshold
+            or result['queries'] > base['queries']
+            or result['errors'] > base['errors']
+        )
+        if regressed:
+            regressions.append(name)
+        print(
+            f'{name:<18} p50 ×{ratios["p50_ms"]:5.2f} '
+            f'p95 ×{ratios["p95_ms"]:5.2f} '
+            f'запросов {base["queries"]}→{result["queries"]}'
+            + ('  РЕГРЕССИЯ' if regressed else '')
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', choices=SIZES, default='1k')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='+',
+                        help='Замерить только эти ручки.')
+    parser.add_argument('--output', type=Path,
+                        help='Куда записать результат в JSON.')
+    parser.add_argument('--baseline', type=Path,
+                        help='JSON прошлого замера для сравнения.')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='Во сколько раз может вырасти p50.')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        args.output.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2)
+        )
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\nРегрессии: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
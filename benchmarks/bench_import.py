@@ -0,0 +1,95 @@
+"""
+Сквозной замер import_csv_data при разном числе процессов и режимах
+паролей пользователей.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_import.py --reviews 1000000 --workers 1 4
+    python benchmarks/bench_import.py --reviews 20000 --workers 1 8 \
+        --passwords shared unusable hash
+"""
+import argparse
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from common import setup_django
+
+
+def make_dataset(path, reviews, seed=1):
+    from django.core.management import call_command
+
+    call_command(
+        'generate_dataset', path=path, reviews=reviews,
+        users=max(reviews // 20, 10), titles=max(reviews // 50, 10),
+        seed=seed, stdout=StringIO()
+    )
+    return count_rows(path)
+
+
+def count_rows(path):
+    return sum(
+        1 for file in path.glob('*.csv') for _ in open(file, encoding='utf-8')
+    ) - len(list(path.glob('*.csv')))
+
+
+def run(data_dir, workers, batch_size, passwords):
+    from django.core.management import call_command
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict['NAME'] = str(
+        Path(tempfile.mkdtemp(prefix='yamdb-bench-')) / 'db.sqlite3'
+    )
+    call_command('migrate', verbosity=0)
+    out = StringIO()
+    started = time.perf_counter()
+    call_command(
+        'import_csv_data', path=data_dir, workers=workers,
+        batch_size=batch_size, passwords=passwords, stdout=out
+    )
+    elapsed = time.perf_counter() - started
+    print(f'workers={workers} passwords={passwords}')
+    for line in out.getvalue().splitlines():
+        if 'строк/с' in line:
+            print('   ', line)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reviews', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument(
+        '--passwords', nargs='+', default=['shared'],
+        choices=('shared', 'unusable', 'hash')
+    )
+    parser.add_argument('--data', type=Path,
+                        help='Каталог с готовыми CSV вместо синтетических.')
+    args = parser.parse_args()
+
+    setup_django(migrate=False)
+    data_dir = args.data
+    if data_dir is None:
+        data_dir = Path(tempfile.mkdtemp(prefix='yamdb-csv-'))
+        rows = make_dataset(data_dir, args.reviews)
+        print(f'Сгенерировано строк: {rows}')
+    else:
+        rows = count_rows(data_dir)
+
+    results = {
+        (workers, passwords): run(
+            data_dir, workers, args.batch_size, passwords
+        )
+        for passwords in args.passwords
+        for workers in args.workers
+    }
+    print()
+    for (workers, passwords), elapsed in results.items():
+        print(f'workers={workers:<3} passwords={passwords:<9} '
+              f'{elapsed:7.1f} с {rows / elapsed:10.0f} строк/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Накладные расходы middleware на запрос к API: прежний набор Django
+middleware против набора, который пропускает сессии, CSRF, сообщения
+и X-Frame-Options для /api/.
+
+Запросы идут прямо в WSGIHandler без сети. Кроме API замеряется пустая
+ручка 404, где почти всё время уходит на middleware.
+
+Затем тот же список произведений запрашивается через ASGIHandler у
+асинхронной вьюхи с учётом запросов к базе (QUERY_STATS, METRICS_ENABLED,
+SLOW_QUERY_MS) и без него: так видна цена этих middleware под ASGI.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_middleware.py --repeat 5000
+"""
+import argparse
+import asyncio
+import statistics
+
+from common import report, setup_django, timed
+
+PATHS = ('/api/v1/categories/', '/api/v1/missing/')
+ASGI_PATH = '/api/v1/titles/'
+QUERY_HOOKS = {
+    'с учётом запросов': {
+        'QUERY_STATS': True, 'METRICS_ENABLED': True, 'SLOW_QUERY_MS': 100,
+    },
+    'без учёта запросов': {
+        'QUERY_STATS': False, 'METRICS_ENABLED': False,
+        'SLOW_QUERY_MS': None,
+    },
+}
+
+
+def make_handler(middleware):
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+
+    settings.MIDDLEWARE = middleware
+    return WSGIHandler()
+
+
+def make_asgi_handler(hooks):
+    from django.core.handlers.asgi import ASGIHandler
+    from django.test import override_settings
+
+    # Middleware решают, нужны ли они, при создании обработчика.
+    with override_settings(**hooks):
+        return ASGIHandler()
+
+
+def asgi_get(loop, handler, path):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'headers': [],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Клиент не отключается: Django снимет это ожидание сам.
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            assert message['status'] == 200, message
+
+    loop.run_until_complete(handler(scope, receive, send))
+
+
+def compare(handlers, repeat, rounds, call):
+    """Медианы наборов; замеры наборов чередуются."""
+    durations = {name: [] for name in handlers}
+    for _ in range(rounds):
+        for name, handler in handlers.items():
+            durations[name] += timed(
+                lambda _: call(handler), repeat // rounds
+            )
+    return durations
+
+
+def full_stack(middleware):
+    """Тот же список, но с исходными middleware Django вместо обёрток."""
+    from django.utils.module_loading import import_string
+
+    from api_yamdb.middleware import SkipForApiMixin
+
+    result = []
+    for path in middleware:
+        cls = import_string(path)
+        if issubclass(cls, SkipForApiMixin):
+            base = cls.__bases__[1]
+            path = f'{base.__module__}.{base.__name__}'
+        result.append(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=10,
+                        help='Замеры наборов чередуются, чтобы дрейф '
+                             'машины влиял на них одинаково.')
+    args = parser.parse_args()
+
+    setup_django(DEBUG=False)
+    from django.conf import settings
+    from django.test import RequestFactory
+
+    from reviews.models import Category, Title
+
+    categories = Category.objects.bulk_create(
+        Category(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(10)
+    )
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=2000, category=category)
+        for i, category in enumerate(categories)
+    )
+    middleware = settings.MIDDLEWARE
+    handlers = {
+        'полный набор': make_handler(full_stack(middleware)),
+        'без лишнего для API': make_handler(middleware),
+    }
+    factory = RequestFactory()
+    for path in PATHS:
+        environ = factory.get(path).environ
+        durations = compare(
+            handlers, args.repeat, args.rounds,
+            lambda handler: handler(dict(environ), lambda *args: None)
+        )
+        print_saving(path, durations)
+
+    # Как в api_yamdb/asgi.py.
+    settings.DATABASES['default']['CONN_MAX_AGE'] = 0
+    handlers = {
+        name: make_asgi_handler(hooks) for name, hooks in QUERY_HOOKS.items()
+    }
+    # Обработчик без учёта его настройки больше не читает.
+    for name, value in QUERY_HOOKS['с учётом запросов'].items():
+        setattr(settings, name, value)
+    loop = asyncio.new_event_loop()
+    durations = compare(
+        handlers, args.repeat, args.rounds,
+        lambda handler: asgi_get(loop, handler, ASGI_PATH)
+    )
+    loop.close()
+    print_saving(f'ASGI {ASGI_PATH}', durations)
+
+
+def print_saving(path, durations):
+    for name, values in durations.items():
+        report(f'{path} {name}', values)
+    first, second = (
+        statistics.median(values) for values in durations.values()
+    )
+    print(f'{path}: экономия {(first - second) * 1000:.0f} мкс на запрос')
+
+
+if __name__ == '__main__':
+    main()
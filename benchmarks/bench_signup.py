@@ -0,0 +1,98 @@
+"""
+Замер регистрации и проверки занятости username/email на большой таблице.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_signup.py --users 5000000
+"""
+import argparse
+import time
+
+from common import report, setup_django, timed
+
+
+def fill_users(count, chunk=100_000):
+    from django.db import connection, transaction
+
+    sql = (
+        'INSERT INTO users_user (password, is_superuser, is_staff, '
+        'is_active, date_joined, username, email, first_name, last_name, '
+        "bio, role) VALUES ('', 0, 0, 1, '2020-01-01 00:00:00', %s, %s, "
+        "'', '', '', 'user')"
+    )
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        for start in range(0, count, chunk):
+            rows = [
+                (f'user{i}', f'user{i}@yamdb.fake')
+                for i in range(start, min(start + chunk, count))
+            ]
+            with transaction.atomic():
+                cursor.executemany(sql, rows)
+    print(f'Создано {count} пользователей за '
+          f'{time.perf_counter() - started:.1f} с')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5_000_000)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--db', help='Путь к уже заполненной базе.')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.db import connection
+
+    from api.serializers import SignUpSerializer, UserSerializer
+    from users.models import User
+
+    settings.EMAIL_OUTBOX_EAGER = False
+    if args.db is None:
+        fill_users(args.users)
+    total = User.objects.count()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM users_user '
+            'WHERE username = %s OR email = %s',
+            ('user1', 'user1@yamdb.fake')
+        )
+        print('План проверки занятости:')
+        for row in cursor.fetchall():
+            print('   ', row[-1])
+
+    def signup(data):
+        serializer = SignUpSerializer(data=data)
+        serializer.is_valid()
+        if not serializer.errors:
+            serializer.save()
+
+    print(f'Пользователей в таблице: {total}')
+    report('signup: новый пользователь', timed(
+        lambda i: signup({
+            'username': f'bench{i}', 'email': f'bench{i}@yamdb.fake'
+        }),
+        args.repeat
+    ))
+    report('signup: повторный запрос', timed(
+        lambda i: signup({
+            'username': f'user{i}', 'email': f'USER{i}@yamdb.fake'
+        }),
+        args.repeat
+    ))
+    report('signup: email занят', timed(
+        lambda i: signup({
+            'username': f'other{i}', 'email': f'user{i}@yamdb.fake'
+        }),
+        args.repeat
+    ))
+    report('users: проверка занятости', timed(
+        lambda i: UserSerializer(data={
+            'username': f'fresh{i}', 'email': f'user{i}@yamdb.fake'
+        }).is_valid(),
+        args.repeat
+    ))
+
+
+if __name__ == '__main__':
+    main()
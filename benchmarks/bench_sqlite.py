@@ -0,0 +1,152 @@
+"""
+Чтение во время записи на SQLite: профиль settings.SQLITE_PRAGMAS против
+настроек SQLite по умолчанию.
+
+Процессы-читатели запрашивают произведение с рейтингом и последние отзывы
+к нему, пока процессы-писатели в транзакциях читают отзыв и добавляют
+к нему комментарий. Для каждого профиля печатаются операции в секунду,
+задержки и число ошибок «database is locked».
+
+Запуск из корня репозитория:
+    python benchmarks/bench_sqlite.py --readers 4 --writers 2 --duration 10
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from common import percentile, setup_django
+
+PROFILES = ('default', 'tuned')
+
+
+def configure(profile, db_path):
+    if profile == 'tuned':
+        setup_django(db_path, migrate=False)
+        return
+    setup_django(db_path, migrate=False, SQLITE_PRAGMAS={}, DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(db_path)
+        }
+    })
+
+
+def make_database(path, titles, reviews):
+    """Заполняет шаблонную базу и переводит её в журнал по умолчанию."""
+    setup_django(path)
+    from django.core.management import call_command
+    from django.db import connections
+
+    data_dir = Path(tempfile.mkdtemp(prefix='yamdb-csv-'))
+    call_command(
+        'generate_dataset', path=data_dir, users=max(reviews // 20, 10),
+        titles=titles, reviews=reviews, stdout=StringIO()
+    )
+    call_command('import_csv_data', path=data_dir, stdout=StringIO())
+    connections.close_all()
+    with sqlite3.connect(path) as db:
+        db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.execute('PRAGMA journal_mode = delete')
+
+
+def read(rng, titles, reviews):
+    from django.db.models import Avg
+
+    from reviews.models import Review, Title
+
+    title_id = rng.randint(1, titles)
+    Title.objects.annotate(rating=Avg('reviews__score')).get(pk=title_id)
+    list(
+        Review.objects.filter(title_id=title_id)
+        .select_related('author').order_by('-pub_date')[:10]
+    )
+
+
+def write(rng, titles, reviews):
+    from django.db import transaction
+
+    from reviews.models import Comment, Review
+
+    with transaction.atomic():
+        review = Review.objects.get(pk=rng.randint(1, reviews))
+        Comment.objects.create(
+            review=review, author_id=review.author_id, text='Комментарий'
+        )
+
+
+def worker(args):
+    profile, db_path, role, titles, reviews, duration, start, seed = args
+    configure(profile, db_path)
+    from django.db import OperationalError
+
+    operation = read if role == 'read' else write
+    rng = random.Random(seed)
+    durations = []
+    errors = 0
+    while time.time() < start:
+        time.sleep(0.001)
+    finish = time.perf_counter() + duration
+    while (now := time.perf_counter()) < finish:
+        try:
+            operation(rng, titles, reviews)
+        except OperationalError:
+            errors += 1
+            continue
+        durations.append((time.perf_counter() - now) * 1000)
+    return role, durations, errors
+
+
+def run(profile, template, args):
+    db_path = Path(tempfile.mkdtemp(prefix='yamdb-bench-')) / 'db.sqlite3'
+    shutil.copy(template, db_path)
+    start = time.time() + 2
+    roles = ['read'] * args.readers + ['write'] * args.writers
+    jobs = [
+        (profile, db_path, role, args.titles, args.reviews, args.duration,
+         start, seed)
+        for seed, role in enumerate(roles)
+    ]
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(jobs)) as pool:
+        results = pool.map(worker, jobs)
+
+    for role in ('read', 'write'):
+        durations = [
+            value for result_role, values, _ in results
+            if result_role == role for value in values
+        ]
+        errors = sum(
+            count for result_role, _, count in results if result_role == role
+        )
+        print(
+            f'{profile:<8} {role:<6} {len(durations) / args.duration:9.0f} '
+            f'оп/с p50={percentile(durations, 0.5):8.3f} ms '
+            f'p95={percentile(durations, 0.95):8.3f} ms ошибок={errors}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Длительность замера одного профиля, секунд.')
+    parser.add_argument('--titles', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=50_000)
+    parser.add_argument('--profiles', nargs='+', default=PROFILES,
+                        choices=PROFILES)
+    args = parser.parse_args()
+
+    template = Path(tempfile.mkdtemp(prefix='yamdb-bench-')) / 'db.sqlite3'
+    make_database(template, args.titles, args.reviews)
+    for profile in args.profiles:
+        run(profile, template, args)
+
+
+if __name__ == '__main__':
+    main()
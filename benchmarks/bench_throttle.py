@@ -0,0 +1,103 @@
+"""
+Нагрузочная проверка api.throttles при конкурирующих процессах.
+
+Все процессы одновременно бьют в один лимит от одного клиента. Лимит
+соблюдается, если принятых запросов не больше разрешённого числа. По
+умолчанию нужен Redis на localhost. Кэши с неатомарным incr (например,
+FileBasedCache) годятся только чтобы увидеть, как лимит превышается.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_throttle.py --workers 8 --requests 2000
+    python benchmarks/bench_throttle.py \\
+        --cache-backend django.core.cache.backends.filebased.FileBasedCache
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+from common import setup_django
+
+
+def configure(backend, location):
+    setup_django(migrate=False, CACHES={
+        'default': {'BACKEND': backend, 'LOCATION': location}
+    })
+
+
+def worker(args):
+    backend, location, rate, count, start = args
+    configure(backend, location)
+    from django.contrib.auth.models import AnonymousUser
+    from django.core.cache import cache
+
+    from api.throttles import SlidingWindowRateThrottle
+
+    class BenchThrottle(SlidingWindowRateThrottle):
+        scope = 'bench'
+
+    BenchThrottle.cache = cache
+    BenchThrottle.rate = rate
+
+    class FakeRequest:
+        user = AnonymousUser()
+        META = {'REMOTE_ADDR': '10.0.0.1'}
+
+    while time.time() < start:
+        time.sleep(0.001)
+    accepted = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        accepted += BenchThrottle().allow_request(FakeRequest, None)
+    return accepted, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='Запросов на один процесс.')
+    parser.add_argument('--rate', default='500/hour')
+    parser.add_argument(
+        '--cache-backend',
+        default='django.core.cache.backends.redis.RedisCache'
+    )
+    parser.add_argument(
+        '--cache-location',
+        help='По умолчанию redis://127.0.0.1:6379/0 для Redis и временный '
+             'каталог для остальных.'
+    )
+    args = parser.parse_args()
+
+    location = args.cache_location
+    if location is None:
+        location = (
+            'redis://127.0.0.1:6379/0' if 'redis' in args.cache_backend
+            else tempfile.mkdtemp(prefix='yamdb-cache-')
+        )
+    configure(args.cache_backend, location)
+    from django.core.cache import cache
+    cache.clear()
+
+    start = time.time() + 1
+    jobs = [
+        (args.cache_backend, location, args.rate, args.requests, start)
+        for _ in range(args.workers)
+    ]
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(worker, jobs)
+
+    accepted = sum(result[0] for result in results)
+    elapsed = max(result[1] for result in results)
+    total = args.workers * args.requests
+    limit = int(args.rate.split('/')[0])
+    print(f'Кэш: {args.cache_backend}')
+    print(f'Запросов: {total}, принято: {accepted}, лимит: {limit}')
+    print(f'Проверок в секунду: {total / elapsed:.0f}')
+    if accepted > limit:
+        print(f'Лимит превышен на {accepted - limit}: incr этого кэша '
+              'не атомарен между процессами.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Общая подготовка Django для скриптов замеров."""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent / 'api_yamdb'
+
+
+def setup_django(db_path=None, migrate=True, **overrides):
+    """
+    Настраивает Django на отдельную базу SQLite.
+
+    Без db_path база создаётся во временном каталоге, чтобы замеры
+    не трогали db.sqlite3 разработчика. overrides заменяют настройки
+    до инициализации Django.
+    """
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+    from django.conf import settings
+
+    if db_path is None:
+        db_path = Path(tempfile.mkdtemp(prefix='yamdb-bench-')) / 'db.sqlite3'
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+    import django
+
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+
+        call_command('migrate', verbosity=0)
+    return db_path
+
+
+async def read_response(reader):
+    """Код ответа HTTP/1.1 и признак закрытия соединения сервером."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(
+        line.lower().split(': ', 1) for line in lines[1:] if ': ' in line
+    )
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection') == 'close'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, repeat):
+    """Вызывает func repeat раз и возвращает длительности в миллисекундах."""
+    durations = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def report(name, durations):
+    print(
+        f'{name:<40} n={len(durations):<6} '
+        f'p50={percentile(durations, 0.5):8.3f} ms '
+        f'p95={percentile(durations, 0.95):8.3f} ms'
+    )
@@ -0,0 +1,177 @@
+"""
+Воспроизведение записанного трафика против запущенного сервера.
+
+Читает JSONL в формате api.capture (метод, путь, маршрут, роль, тело) и
+отправляет запросы --concurrency соединениями keep-alive. С --rate
+запросы уходят с заданной частотой, со --speed — с промежутками из
+записи, ускоренными в --speed раз, без них — так быстро, как отвечает
+сервер. При заданном расписании задержка считается от запланированного
+момента отправки, а не от фактического, иначе перегруженный сервер сам
+занижал бы себе задержки.
+
+Запросы от ролей подписываются токенами --token роль=JWT; запросы роли
+без токена уходят анонимно. Итог — запросы в секунду, p50/p95/p99 и
+число ответов 4xx и 5xx (включая обрывы соединения) по маршрутам.
+
+Запуск из корня репозитория против python manage.py runserver:
+    python benchmarks/replay.py api_yamdb/captured_requests.jsonl \\
+        --concurrency 20 --rate 100 --token admin=<JWT>
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from common import percentile, read_response
+
+
+def load_records(paths, limit=None):
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            records += [json.loads(line) for line in file if line.strip()]
+    records.sort(key=lambda record: record['time'])
+    return records[:limit]
+
+
+def build_request(record, host, tokens):
+    """Байты запроса HTTP/1.1 для одной записи."""
+    headers = [f'Host: {host}', 'Accept: application/json']
+    token = tokens.get(record.get('role'))
+    if token:
+        headers.append(f'Authorization: Bearer {token}')
+    body = b''
+    if record.get('body') is not None:
+        body = json.dumps(record['body'], ensure_ascii=False).encode()
+        headers.append('Content-Type: application/json')
+    headers.append(f'Content-Length: {len(body)}')
+    head = '\r\n'.join(
+        [f'{record["method"]} {record["path"]} HTTP/1.1', *headers]
+    )
+    return head.encode('utf-8') + b'\r\n\r\n' + body
+
+
+def schedule(records, repeat, rate, speed):
+    """Смещения отправки от начала в секундах или None без расписания."""
+    if rate:
+        return [number / rate for number in range(len(records) * repeat)]
+    if not speed:
+        return [None] * (len(records) * repeat)
+    times = [
+        datetime.fromisoformat(record['time']).timestamp()
+        for record in records
+    ]
+    offsets = [(moment - times[0]) / speed for moment in times]
+    # Повторные проходы идут следом за предыдущими.
+    span = offsets[-1] if offsets else 0
+    return [
+        offset + span * number
+        for number in range(repeat) for offset in offsets
+    ]
+
+
+async def worker(address, jobs, results):
+    loop = asyncio.get_running_loop()
+    reader = writer = None
+    for route, request, due in jobs:
+        if due is not None and due > loop.time():
+            await asyncio.sleep(due - loop.time())
+        started = loop.time() if due is None else min(due, loop.time())
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(*address)
+            writer.write(request)
+            status, close = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            status, close = None, True
+        results[route].append((loop.time() - started, status))
+        if close and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def replay(address, requests, offsets, concurrency):
+    loop = asyncio.get_running_loop()
+    start = loop.time() + 0.1
+    jobs = iter([
+        (route, request, None if offset is None else start + offset)
+        for (route, request), offset in zip(requests, offsets)
+    ])
+    results = defaultdict(list)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(address, jobs, results) for _ in range(concurrency)
+    ))
+    return results, time.perf_counter() - started
+
+
+def print_report(results, elapsed):
+    print(
+        f'{"маршрут":<50} {"запросов":>8} {"в с":>7} {"p50 ms":>8} '
+        f'{"p95 ms":>8} {"p99 ms":>8} {"4xx":>5} {"5xx":>5}'
+    )
+    everything = [item for items in results.values() for item in items]
+    for route, items in sorted(results.items()) + [('всего', everything)]:
+        durations = [duration * 1000 for duration, _ in items]
+        client_errors = sum(
+            1 for _, status in items if status and 400 <= status < 500
+        )
+        server_errors = sum(
+            1 for _, status in items if status is None or status >= 500
+        )
+        print(
+            f'{route:<50} {len(items):>8} {len(items) / elapsed:>7.1f} '
+            f'{percentile(durations, 0.5):>8.1f} '
+            f'{percentile(durations, 0.95):>8.1f} '
+            f'{percentile(durations, 0.99):>8.1f} '
+            f'{client_errors:>5} {server_errors:>5}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('logs', nargs='+',
+                        help='Файлы JSONL, записанные api.capture.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=10)
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument('--rate', type=float,
+                        help='Запросов в секунду.')
+    pacing.add_argument('--speed', type=float,
+                        help='Во сколько раз быстрее записи.')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Сколько раз пройти по записи.')
+    parser.add_argument('--limit', type=int,
+                        help='Взять только первые N записей.')
+    parser.add_argument('--token', action='append', default=[],
+                        metavar='РОЛЬ=JWT', help='Токен для роли.')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    address = (url.hostname, url.port or 80)
+    tokens = dict(item.split('=', 1) for item in args.token)
+    records = load_records(args.logs, args.limit)
+    requests = [
+        (
+            record.get('route') or record['path'].split('?')[0],
+            build_request(record, url.netloc, tokens),
+        )
+        for record in records
+    ] * args.repeat
+    offsets = schedule(records, args.repeat, args.rate, args.speed)
+    print(f'{len(requests)} запросов к {args.url}...')
+    results, elapsed = asyncio.run(
+        replay(address, requests, offsets, args.concurrency)
+    )
+    print_report(results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
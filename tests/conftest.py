@@ -1,6 +1,10 @@
+import json
+import logging
 import os
 import sys
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
@@ -28,4 +32,42 @@ if FILENAME not in project_dir_content:
 
 pytest_plugins = [
     'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_queries',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Лимиты запросов и кэши не должны переходить между тестами."""
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.fixture
+def json_log(tmp_path):
+    """
+    Перенаправляет лог с указанным именем в файл и возвращает функцию,
+    которая читает записанные в него строки JSON.
+    """
+    redirected = []
+
+    def redirect(name):
+        path = tmp_path / f'{name}.jsonl'
+        handler = logging.FileHandler(path, encoding='utf-8')
+        logger = logging.getLogger(name)
+        redirected.append((logger, logger.handlers, handler))
+        logger.handlers = [handler]
+
+        def entries():
+            handler.flush()
+            return [
+                json.loads(line) for line in path.read_text().splitlines()
+            ]
+
+        return entries
+
+    yield redirect
+    for logger, handlers, handler in reversed(redirected):
+        logger.handlers = handlers
+        handler.close()
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def assert_query_budget():
+    """
+    Выполняет запрос клиентом и проверяет, что вьюха уложилась в бюджет
+    запросов к базе, объявленный в query_budgets или query_budget.
+    """
+    from api.queries import QueryStats, view_budget
+
+    def check(send, url, *args, **kwargs):
+        stats = QueryStats()
+        with stats.capture():
+            response = send(url, *args, **kwargs)
+        name, budget = view_budget(
+            response.resolver_match.func, response.wsgi_request.method
+        )
+        assert budget is not None, (
+            f'Для `{name}` не объявлен бюджет запросов к базе.'
+        )
+        assert stats.count <= budget, (
+            f'`{name}` ({url}) выполняет больше запросов к базе, чем '
+            f'{budget}: {stats.describe()}'
+        )
+        return response
+
+    return check
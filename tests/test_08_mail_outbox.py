@@ -0,0 +1,119 @@
+from http import HTTPStatus
+from unittest import mock
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from users.mail import claim, deliver
+from users.models import OutgoingEmail
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08MailOutbox:
+    URL_SIGNUP = '/api/v1/auth/signup/'
+
+    @pytest.fixture(autouse=True)
+    def lazy_outbox(self, settings):
+        settings.EMAIL_OUTBOX_EAGER = False
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+
+    def signup(self, client):
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'queued@yamdb.fake',
+            'username': 'queued_user'
+        })
+        assert response.status_code == HTTPStatus.OK
+
+    def test_signup_queues_mail(self, client):
+        outbox_before_count = len(mail.outbox)
+
+        self.signup(client)
+
+        assert len(mail.outbox) == outbox_before_count, (
+            f'POST-запрос к `{self.URL_SIGNUP}` не должен отправлять '
+            'письмо синхронно.'
+        )
+        email = OutgoingEmail.objects.get()
+        assert email.recipient == 'queued@yamdb.fake'
+        assert email.status == OutgoingEmail.Status.PENDING
+
+        call_command('send_queued_mail')
+
+        assert len(mail.outbox) == outbox_before_count + 1, (
+            'Команда `send_queued_mail` должна отправить письмо из очереди.'
+        )
+        assert mail.outbox[-1].to == ['queued@yamdb.fake']
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.Status.SENT
+        assert email.sent_at is not None
+
+    def test_failed_mail_is_retried_later(self, client):
+        self.signup(client)
+
+        with mock.patch(
+            'users.mail.EmailMessage.send', side_effect=OSError('down')
+        ):
+            call_command('send_queued_mail')
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.Status.PENDING
+        assert email.attempts == 1
+        assert email.last_error == 'down'
+        assert email.send_after > timezone.now(), (
+            'Повторная отправка письма должна откладываться.'
+        )
+
+        OutgoingEmail.objects.update(send_after=timezone.now())
+        with mock.patch(
+            'users.mail.EmailMessage.send', side_effect=OSError('down')
+        ):
+            call_command('send_queued_mail')
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.Status.FAILED, (
+            'После EMAIL_OUTBOX_MAX_ATTEMPTS неудачных попыток письмо '
+            'должно помечаться как неотправленное.'
+        )
+
+    def test_claimed_mail_is_sent_once(self, client):
+        self.signup(client)
+        claimed = claim(10)
+
+        assert [email.status for email in claimed] == [
+            OutgoingEmail.Status.SENDING
+        ]
+        call_command('send_queued_mail')
+        assert len(mail.outbox) == 0, (
+            'Письмо, захваченное другим отправителем, не должно '
+            'отправляться повторно.'
+        )
+
+        deliver(claimed)
+        call_command('send_queued_mail')
+        assert len(mail.outbox) == 1
+        assert OutgoingEmail.objects.get().status == (
+            OutgoingEmail.Status.SENT
+        )
+
+    def test_expired_claim_is_retaken(self, client):
+        self.signup(client)
+        claim(10)
+        OutgoingEmail.objects.update(send_after=timezone.now())
+
+        call_command('send_queued_mail')
+
+        assert len(mail.outbox) == 1, (
+            'Письмо упавшего отправителя должно уйти после истечения '
+            'EMAIL_OUTBOX_CLAIM_TIMEOUT.'
+        )
+
+    def test_eager_mail_is_not_requeued(self, client, settings):
+        settings.EMAIL_OUTBOX_EAGER = True
+
+        self.signup(client)
+        call_command('send_queued_mail')
+
+        assert len(mail.outbox) == 1
+        assert OutgoingEmail.objects.get().status == (
+            OutgoingEmail.Status.SENT
+        )
@@ -0,0 +1,185 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import override_settings
+
+from api.throttles import SignUpRateThrottle, check_shared_cache
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09Auth:
+    URL_SIGNUP = '/api/v1/auth/signup/'
+    URL_TOKEN = '/api/v1/auth/token/'
+    URL_USERS = '/api/v1/users/'
+
+    def test_email_is_case_insensitive(self, client, admin_client,
+                                       django_user_model):
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'Mixed.Case@YaMDb.fake',
+            'username': 'mixed_case'
+        })
+        assert response.status_code == HTTPStatus.OK
+        assert django_user_model.objects.filter(
+            email='mixed.case@yamdb.fake'
+        ).exists(), 'Email должен сохраняться в нижнем регистре.'
+
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'MIXED.CASE@yamdb.fake',
+            'username': 'other_username'
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'POST-запрос к `{self.URL_SIGNUP}` с email, отличающимся от '
+            'занятого только регистром, должен вернуть ответ со статусом 400.'
+        )
+
+        response = admin_client.post(self.URL_USERS, data={
+            'email': 'mixed.CASE@yamdb.fake',
+            'username': 'other_username'
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'POST-запрос к `{self.URL_USERS}` с email, отличающимся от '
+            'занятого только регистром, должен вернуть ответ со статусом 400.'
+        )
+
+    def test_signup_query_count(self, client, settings,
+                                django_assert_num_queries):
+        settings.EMAIL_OUTBOX_EAGER = False
+        data = {'email': 'fast@yamdb.fake', 'username': 'fast_user'}
+        # Проверка занятости и транзакция со вставкой пользователя
+        # и письма в очередь.
+        with django_assert_num_queries(5):
+            client.post(self.URL_SIGNUP, data=data)
+        # Повторный запрос: пользователь уже неактивен, обновлять нечего.
+        with django_assert_num_queries(4):
+            response = client.post(self.URL_SIGNUP, data=data)
+        assert response.status_code == HTTPStatus.OK
+
+    def get_confirmation_code(self, client, django_user_model):
+        client.post(self.URL_SIGNUP, data={
+            'email': 'token@yamdb.fake', 'username': 'token_user'
+        })
+        user = django_user_model.objects.get(username='token_user')
+        return default_token_generator.make_token(user)
+
+    def test_token_updates_only_inactive_user(self, client,
+                                              django_user_model,
+                                              django_assert_num_queries):
+        data = {
+            'username': 'token_user',
+            'confirmation_code': self.get_confirmation_code(
+                client, django_user_model
+            )
+        }
+        with django_assert_num_queries(2):
+            response = client.post(self.URL_TOKEN, data=data)
+        assert response.status_code == HTTPStatus.OK
+        assert django_user_model.objects.get(username='token_user').is_active
+
+        with django_assert_num_queries(1):
+            response = client.post(self.URL_TOKEN, data=data)
+        assert response.status_code == HTTPStatus.OK, (
+            'Повторный запрос токена активным пользователем не должен '
+            'записывать в базу.'
+        )
+
+    def test_token_cache(self, client, settings, django_user_model):
+        settings.TOKEN_CACHE_TIMEOUT = 60
+        data = {
+            'username': 'token_user',
+            'confirmation_code': self.get_confirmation_code(
+                client, django_user_model
+            )
+        }
+        first = client.post(self.URL_TOKEN, data=data).json()['token']
+        second = client.post(self.URL_TOKEN, data=data).json()['token']
+        assert first == second, (
+            'При включённом TOKEN_CACHE_TIMEOUT повторный запрос с тем же '
+            'кодом должен возвращать ранее выданный токен.'
+        )
+
+    def test_signup_throttle(self, client, monkeypatch):
+        monkeypatch.setattr(
+            SignUpRateThrottle, 'rate', '2/min', raising=False
+        )
+        for i in range(2):
+            response = client.post(self.URL_SIGNUP, data={
+                'email': f'spam{i}@yamdb.fake', 'username': f'spam{i}'
+            })
+            assert response.status_code == HTTPStatus.OK
+
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'spam@yamdb.fake', 'username': 'spam'
+        })
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            f'Превышение лимита POST-запросов к `{self.URL_SIGNUP}` должно '
+            'возвращать ответ со статусом 429.'
+        )
+        assert 'Retry-After' in response
+
+    def test_expired_window_does_not_break_throttle(
+        self, client, monkeypatch
+    ):
+        monkeypatch.setattr(
+            SignUpRateThrottle, 'rate', '1/min', raising=False
+        )
+
+        def decr(key, *args, **kwargs):
+            raise ValueError(f'Key {key} not found')
+
+        monkeypatch.setattr(SignUpRateThrottle.cache, 'decr', decr)
+        for i in range(2):
+            response = client.post(self.URL_SIGNUP, data={
+                'email': f'spam{i}@yamdb.fake', 'username': f'spam{i}'
+            })
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Истёкший между incr и decr счётчик не должен приводить '
+            'к ошибке сервера.'
+        )
+
+    def test_shared_cache_is_required(self):
+        errors = check_shared_cache(None)
+        assert [error.id for error in errors] == ['api.E001'], (
+            'check --deploy должен сообщать, что кэш лимитов не общий.'
+        )
+
+        out = StringIO()
+        with pytest.raises(SystemCheckError, match='api.E001'):
+            call_command('check', deploy=True, stdout=out, stderr=out)
+        call_command('check', stdout=out)
+        with override_settings(SILENCED_SYSTEM_CHECKS=['api.E001']):
+            call_command('check', deploy=True, stdout=out, stderr=out)
+
+    def test_email_migration_reports_conflicts(self):
+        before = [('users', '0002_outgoingemail')]
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes('users')
+        executor.migrate(before)
+        try:
+            User = executor.loader.project_state(before).apps.get_model(
+                'users', 'User'
+            )
+            ids = [
+                User.objects.create(username=f'user{i}', email=email).pk
+                for i, email in enumerate(
+                    ('Foo@yamdb.fake', 'foo@yamdb.fake', '', '')
+                )
+            ]
+            with pytest.raises(IntegrityError) as error:
+                MigrationExecutor(connection).migrate(latest)
+        finally:
+            User.objects.all().delete()
+            MigrationExecutor(connection).migrate(latest)
+
+        message = str(error.value)
+        assert f'foo@yamdb.fake: id {ids[0]}, {ids[1]}' in message, (
+            'Миграция должна перечислять id пользователей с email, '
+            'совпадающими без учёта регистра.'
+        )
+        assert f'(пустой): id {ids[2]}, {ids[3]}' in message
@@ -0,0 +1,302 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from reviews.csv_data import dependency_order
+from reviews.models import Comment, GenreTitle, Review, Title
+
+CSV_FILES = {
+    'users.csv': (
+        'id,username,email,role,bio,first_name,last_name\n'
+        '100,reader,Reader@yamdb.fake,user,,,\n'
+        '101,critic,critic@yamdb.fake,moderator,,,\n'
+    ),
+    'category.csv': 'id,name,slug\n1,Фильм,movie\n',
+    'genre.csv': 'id,name,slug\n1,Драма,drama\n2,Комедия,comedy\n',
+    'titles.csv': (
+        'id,name,year,category\n'
+        '1,Побег из Шоушенка,1994,1\n'
+        '2,Без категории,2000,7\n'
+    ),
+    'genre_title.csv': 'id,title_id,genre_id\n1,1,1\n2,1,2\n3,2,1\n',
+    'review.csv': (
+        'id,title_id,text,author,score,pub_date\n'
+        '1,1,"Отлично,\nпересматриваю",100,10,2019-09-24T21:08:21.567Z\n'
+        '2,1,Неплохо,101,11,2019-09-24T21:08:21.567Z\n'
+        '3,1,Неплохо,101,7,2019-09-25T10:00:00Z\n'
+    ),
+    'comments.csv': (
+        'id,review_id,text,author,pub_date\n'
+        '1,3,Согласен,100,2020-01-13T23:20:02.422Z\n'
+        '2,2,Потерянный,100,2020-01-13T23:20:02.422Z\n'
+    ),
+}
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    for name, content in CSV_FILES.items():
+        (tmp_path / name).write_text(content, encoding='utf-8')
+    return tmp_path
+
+
+def import_csv(path, *args):
+    out = StringIO()
+    call_command('import_csv_data', *args, path=path, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ImportCsv:
+
+    def test_import(self, csv_dir, django_user_model):
+        output = import_csv(csv_dir)
+
+        assert django_user_model.objects.get(pk=100).email == (
+            'reader@yamdb.fake'
+        )
+        assert list(Title.objects.values_list('pk', flat=True)) == [1], (
+            'Произведение с несуществующей категорией не должно '
+            'импортироваться.'
+        )
+        assert GenreTitle.objects.count() == 2
+        assert set(Review.objects.values_list('pk', flat=True)) == {1, 3}, (
+            'Отзыв с оценкой вне диапазона не должен импортироваться.'
+        )
+        assert Review.objects.get(pk=1).text == 'Отлично,\nпересматриваю'
+        assert Review.objects.get(pk=1).pub_date.year == 2019, (
+            'Дата публикации должна браться из CSV.'
+        )
+        assert list(Comment.objects.values_list('pk', flat=True)) == [1]
+        assert 'строк/с' in output
+
+    def test_reimport_skips_existing_rows(self, csv_dir):
+        import_csv(csv_dir)
+        output = import_csv(csv_dir)
+
+        assert 'добавлено 0, обновлено 0, пропущено 2, ошибок 0' in output
+        assert Review.objects.count() == 2
+
+    def test_parallel_import(self, csv_dir):
+        import_csv(csv_dir, '--workers', '2', '--batch-size', '1')
+
+        assert set(Review.objects.values_list('pk', flat=True)) == {1, 3}, (
+            'Импорт с несколькими процессами разбора должен давать тот же '
+            'результат, что и последовательный.'
+        )
+        assert list(Comment.objects.values_list('pk', flat=True)) == [1]
+
+    def test_dependency_order(self):
+        order = [table.name for table in dependency_order()]
+        assert order.index('titles') > order.index('categories')
+        assert order.index('reviews') > order.index('users')
+        assert order.index('comments') > order.index('reviews')
+
+    def test_upsert(self, csv_dir):
+        import_csv(csv_dir)
+        (csv_dir / 'review.csv').write_text(
+            'id,title_id,text,author,score,pub_date\n'
+            '1,1,"Отлично,\nпересматриваю",100,10,2019-09-24T21:08:21.567Z\n'
+            '3,1,Передумал,101,3,2019-09-25T10:00:00Z\n',
+            encoding='utf-8'
+        )
+        (csv_dir / 'genre.csv').write_text(
+            CSV_FILES['genre.csv'] + '3,Триллер,thriller\n', encoding='utf-8'
+        )
+
+        output = import_csv(csv_dir, '--upsert')
+
+        assert 'Отзывы: добавлено 0, обновлено 1, пропущено 1' in output, (
+            'С --upsert неизменённые строки должны пропускаться без записи, '
+            'а изменённые обновляться.'
+        )
+        assert 'Жанры: добавлено 1, обновлено 0, пропущено 2' in output
+        review = Review.objects.get(pk=3)
+        assert (review.text, review.score) == ('Передумал', 3)
+
+    def test_export_round_trip(self, csv_dir, tmp_path, django_user_model):
+        import_csv(csv_dir)
+        Title.objects.filter(pk=1).update(description='Описание')
+        critic = django_user_model.objects.get(username='critic')
+        critic.set_password('critic-password')
+        critic.is_staff = critic.is_superuser = True
+        critic.is_active = False
+        critic.last_login = critic.date_joined
+        critic.save()
+        tables = (django_user_model, Title, GenreTitle, Review, Comment)
+        before = {
+            model: list(model.objects.order_by('pk').values())
+            for model in tables
+        }
+        export_dir = tmp_path / 'export'
+
+        call_command(
+            'export_csv_data', path=export_dir, gzip=True, stdout=StringIO()
+        )
+        assert (export_dir / 'review.csv.gz').exists()
+        django_user_model.objects.all().delete()
+        Title.objects.all().delete()
+        import_csv(export_dir)
+
+        for model in tables:
+            after = list(model.objects.order_by('pk').values())
+            assert after == before[model], (
+                'Данные, выгруженные `export_csv_data`, должны без потерь '
+                'загружаться обратно `import_csv_data`, включая пароли, '
+                'права и даты пользователей.'
+            )
+
+    def test_upsert_keeps_fields_missing_from_file(
+        self, csv_dir, django_user_model
+    ):
+        import_csv(csv_dir)
+        reader = django_user_model.objects.get(username='reader')
+        reader.set_password('reader-password')
+        reader.is_staff = True
+        reader.save()
+        (csv_dir / 'users.csv').write_text(
+            'id,username,email,role,bio,first_name,last_name\n'
+            '100,reader,reader@yamdb.fake,user,Новое,,\n',
+            encoding='utf-8'
+        )
+
+        import_csv(csv_dir, '--upsert')
+
+        reader = django_user_model.objects.get(username='reader')
+        assert reader.bio == 'Новое'
+        assert reader.check_password('reader-password'), (
+            'Колонки, которых нет в файле, не должны сбрасывать пароль '
+            'и права существующих пользователей.'
+        )
+        assert reader.is_staff
+
+    def test_export_since(self, csv_dir, tmp_path):
+        import_csv(csv_dir)
+
+        call_command(
+            'export_csv_data', path=tmp_path, since='2019-09-25',
+            stdout=StringIO()
+        )
+
+        lines = (tmp_path / 'review.csv').read_text(encoding='utf-8')
+        assert lines.splitlines()[1:] == [
+            '3,1,Неплохо,101,7,2019-09-25T10:00:00.000000Z'
+        ]
+
+    def test_password_modes(self, csv_dir, django_user_model):
+        import_csv(csv_dir, '--password', 'secret-123')
+
+        first, second = django_user_model.objects.order_by('pk')
+        assert first.password == second.password, (
+            'По умолчанию импортированные пользователи получают один общий '
+            'хеш временного пароля.'
+        )
+        assert first.check_password('secret-123')
+
+        django_user_model.objects.all().delete()
+        import_csv(csv_dir, '--passwords', 'unusable')
+
+        assert not any(
+            user.has_usable_password()
+            for user in django_user_model.objects.all()
+        )
+
+    def test_generate_dataset(self, tmp_path):
+        options = {'users': 50, 'titles': 20, 'reviews': 300, 'seed': 7}
+        call_command(
+            'generate_dataset', path=tmp_path / 'first', stdout=StringIO(),
+            **options
+        )
+        call_command(
+            'generate_dataset', path=tmp_path / 'second', stdout=StringIO(),
+            **options
+        )
+        first = (tmp_path / 'first' / 'review.csv').read_text('utf-8')
+        assert first == (
+            tmp_path / 'second' / 'review.csv'
+        ).read_text('utf-8'), (
+            'При одинаковом --seed `generate_dataset` должен давать '
+            'одинаковые файлы.'
+        )
+
+        output = import_csv(tmp_path / 'first')
+
+        assert output.count('ошибок 0 ') == 7, (
+            'Сгенерированные данные должны импортироваться без ошибок.'
+        )
+        assert Review.objects.count() == 300
+        assert Comment.objects.count() == 150
+
+    @pytest.mark.parametrize('workers', (1, 2))
+    def test_validate_only(self, csv_dir, workers):
+        (csv_dir / 'review.csv').write_text(
+            CSV_FILES['review.csv']
+            + '3,1,Повтор id,100,5,2019-09-25T10:00:00Z\n'
+            + '4,1,Второй отзыв,100,5,2019-09-25T10:00:00Z\n',
+            encoding='utf-8'
+        )
+        out = StringIO()
+
+        with pytest.raises(CommandError, match='ошибок: 6'):
+            call_command(
+                'import_csv_data', path=csv_dir, validate_only=True,
+                workers=workers, stdout=out
+            )
+
+        report = out.getvalue()
+        assert Title.objects.count() == 0, (
+            'С --validate-only в базу ничего не должно записываться.'
+        )
+        for expected in (
+            'titles.csv: category: нет объекта с таким id — 1 (строки 3)',
+            'genre_title.csv: title_id: нет объекта с таким id — 1',
+            'review.csv: score: вне диапазона 1..10 — 1 (строки 4)',
+            'review.csv: повтор id — 1 (строки 6)',
+            'review.csv: повтор пары (title_id, author) — 1 (строки 7)',
+            'comments.csv: review_id: нет объекта с таким id — 1',
+        ):
+            assert expected in report, (
+                f'В отчёте проверки должна быть строка «{expected}».'
+            )
+
+    def test_validate_only_checks_stored_pairs(self, csv_dir):
+        import_csv(csv_dir)
+        (csv_dir / 'review.csv').write_text(
+            'id,title_id,text,author,score,pub_date\n'
+            '3,1,Исправленный отзыв,101,8,2019-09-25T10:00:00Z\n'
+            '4,1,Второй отзыв,100,5,2019-09-25T10:00:00Z\n',
+            encoding='utf-8'
+        )
+        out = StringIO()
+
+        with pytest.raises(CommandError):
+            call_command(
+                'import_csv_data', path=csv_dir, validate_only=True,
+                stdout=out
+            )
+
+        report = out.getvalue()
+        assert (
+            'review.csv: пара (title_id, author) уже есть в базе — 1 '
+            '(строки 3)'
+        ) in report, (
+            'Отзыв автора на произведение, отзыв на которое уже есть в '
+            'базе, должен попадать в отчёт проверки.'
+        )
+        assert 'review.csv: повтор' not in report, (
+            'Строка, которая перезапишет отзыв с тем же id, не повтор.'
+        )
+
+    def test_validate_only_clean_files(self, tmp_path):
+        call_command(
+            'generate_dataset', path=tmp_path, users=50, titles=20,
+            reviews=300, stdout=StringIO()
+        )
+        out = StringIO()
+
+        call_command(
+            'import_csv_data', path=tmp_path, validate_only=True, stdout=out
+        )
+
+        assert 'ошибок нет' in out.getvalue()
@@ -0,0 +1,58 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from api.queries import QueryCounter
+
+
+@pytest.mark.django_db
+class Test11Sqlite:
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self, settings):
+        expected = {
+            'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+            'synchronous': 1,
+            'temp_store': 2,
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+        }
+        for name, value in expected.items():
+            assert self.pragma(name) == value, (
+                f'На соединении SQLite должна выполняться PRAGMA {name} '
+                'из settings.SQLITE_PRAGMAS.'
+            )
+
+    def test_pragmas_are_not_counted(self, settings):
+        other = connection.copy()
+        counter = QueryCounter()
+        try:
+            with other.execute_wrapper(counter):
+                with other.cursor() as cursor:
+                    cursor.execute('PRAGMA busy_timeout')
+                    busy_timeout = cursor.fetchone()[0]
+        finally:
+            other.close()
+
+        assert busy_timeout == settings.SQLITE_PRAGMAS['busy_timeout']
+        assert counter.count == 1, (
+            'PRAGMA нового соединения не должны попадать в учёт запросов '
+            'вьюхи: под ASGI соединение открывается на каждый запрос.'
+        )
+
+    def test_transaction_mode(self):
+        assert connection.transaction_mode == 'IMMEDIATE', (
+            'Транзакции SQLite должны сразу брать блокировку записи.'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_optimize_db(self):
+        out = StringIO()
+        call_command('optimize_db', '--analyze', '--checkpoint', stdout=out)
+
+        assert 'ANALYZE выполнен' in out.getvalue()
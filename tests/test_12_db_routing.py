@@ -0,0 +1,95 @@
+import pytest
+from django.test import RequestFactory
+
+from api_yamdb.db_routing import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from reviews.models import Title
+
+
+def read_database(request):
+    return PrimaryReplicaRouter().db_for_read(Title)
+
+
+class Test12DbRouting:
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = ['replica']
+
+    def test_reads_outside_requests_use_primary(self):
+        router = PrimaryReplicaRouter()
+        assert router.db_for_read(Title) == 'default', (
+            'Вне запроса (команды, тесты) чтение должно идти с основной базы.'
+        )
+        assert router.db_for_write(Title) == 'default'
+        assert router.allow_migrate('replica', 'reviews') is False
+
+    def test_safe_requests_read_from_replica(self):
+        middleware = ReplicaRoutingMiddleware(read_database)
+        request = RequestFactory().get('/api/v1/titles/')
+
+        assert middleware(request) == 'replica'
+
+    def test_replica_is_chosen_once_per_request(self, settings):
+        settings.DATABASE_REPLICAS = [f'replica_{i}' for i in range(10)]
+
+        def read_databases(request):
+            return {read_database(request) for _ in range(20)}
+
+        middleware = ReplicaRoutingMiddleware(read_databases)
+        chosen = [
+            middleware(RequestFactory().get('/api/v1/titles/'))
+            for _ in range(20)
+        ]
+
+        assert all(len(databases) == 1 for databases in chosen), (
+            'Все чтения одного запроса должны идти с одной реплики.'
+        )
+        assert len(set().union(*chosen)) > 1, (
+            'Разные запросы должны распределяться по репликам.'
+        )
+
+    def test_read_your_writes(self):
+        middleware = ReplicaRoutingMiddleware(read_database)
+        factory = RequestFactory()
+        headers = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+
+        assert middleware(factory.post('/api/v1/titles/', **headers)) == (
+            'default'
+        )
+        assert middleware(factory.get('/api/v1/titles/', **headers)) == (
+            'default'
+        ), (
+            'После записи клиент должен читать с основной базы, чтобы '
+            'видеть свои изменения.'
+        )
+        assert middleware(factory.get(
+            '/api/v1/titles/', HTTP_AUTHORIZATION='Bearer reader',
+            REMOTE_ADDR='10.0.0.2'
+        )) == 'replica', 'Метка записи не должна влиять на других клиентов.'
+
+    def test_token_after_signup_reads_primary(self):
+        middleware = ReplicaRoutingMiddleware(read_database)
+        factory = RequestFactory(REMOTE_ADDR='10.0.0.1')
+
+        middleware(factory.post('/api/v1/auth/signup/'))
+        middleware(factory.post('/api/v1/auth/token/'))
+
+        assert middleware(factory.get(
+            '/api/v1/users/me/', HTTP_AUTHORIZATION='Bearer new'
+        )) == 'default', (
+            'Первый запрос с новым токеном должен читать пользователя с '
+            'основной базы: на реплике его может ещё не быть.'
+        )
+
+    def test_only_api_reads_from_replica(self):
+        middleware = ReplicaRoutingMiddleware(read_database)
+
+        assert middleware(RequestFactory().get('/admin/')) == 'default'
+
+    def test_no_replicas(self, settings):
+        settings.DATABASE_REPLICAS = []
+        middleware = ReplicaRoutingMiddleware(read_database)
+
+        assert middleware(RequestFactory().get('/api/v1/titles/')) == (
+            'default'
+        )
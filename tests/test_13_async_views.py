@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+@pytest.fixture
+def titles(user, moderator):
+    category = Category.objects.create(name='Фильм', slug='movie')
+    genres = [
+        Genre.objects.create(name='Драма', slug='drama'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    titles = []
+    for number in range(12):
+        title = Title.objects.create(
+            name=f'Произведение {number:02}', year=2000 + number,
+            category=category if number % 2 else None
+        )
+        title.genre.set(genres[:number % 3])
+        titles.append(title)
+    for author, score in ((user, 4), (moderator, 9)):
+        review = Review.objects.create(
+            title=titles[0], author=author, text='Отзыв', score=score
+        )
+        Comment.objects.create(review=review, author=user, text='Согласен')
+    return titles
+
+
+@pytest.mark.django_db
+class Test13AsyncViews:
+
+    def compare(self, url, **headers):
+        sync_response = Client().get(url, headers=headers)
+        async_response = async_to_sync(AsyncClient().get)(
+            url, headers=headers
+        )
+        assert async_response.status_code == sync_response.status_code, (
+            f'Под ASGI `{url}` должен отвечать тем же кодом, что и под WSGI.'
+        )
+        assert async_response.json() == sync_response.json(), (
+            f'Под ASGI `{url}` должен возвращать те же данные, что и '
+            'под WSGI.'
+        )
+        return async_response
+
+    def test_same_responses(self, titles):
+        title = titles[0]
+        review = title.reviews.first()
+        for url in (
+            '/api/v1/titles/',
+            '/api/v1/titles/?page=2',
+            '/api/v1/titles/?page_size=5&page=last',
+            '/api/v1/titles/?genre=drama&year=2004',
+            '/api/v1/titles/?year=abc',
+            '/api/v1/titles/?page=10',
+            f'/api/v1/titles/{title.pk}/',
+            '/api/v1/titles/999/',
+            f'/api/v1/titles/{title.pk}/reviews/',
+            '/api/v1/titles/999/reviews/',
+            f'/api/v1/titles/{title.pk}/reviews/{review.pk}/comments/',
+            f'/api/v1/titles/{titles[1].pk}/reviews/{review.pk}/comments/',
+        ):
+            response = self.compare(url)
+            assert response.resolver_match.func.__module__ == (
+                'api.async_views'
+            ), f'Под ASGI `{url}` должен обрабатываться асинхронной вьюхой.'
+
+    def test_tokens(self, titles, user):
+        url = f'/api/v1/titles/{titles[0].pk}/'
+        token = AccessToken.for_user(user)
+        assert self.compare(
+            url, Authorization=f'Bearer {token}'
+        ).status_code == 200
+        assert self.compare(
+            url, Authorization='Bearer invalid'
+        ).status_code == 401
+
+        user.is_active = False
+        user.save()
+        assert self.compare(
+            url, Authorization=f'Bearer {token}'
+        ).status_code == 401
+
+    def test_writes_fall_back_to_viewsets(self, titles, user):
+        url = f'/api/v1/titles/{titles[1].pk}/reviews/'
+
+        response = async_to_sync(AsyncClient().post)(
+            url, {'text': 'Новый отзыв', 'score': 7},
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        )
+
+        assert response.status_code == 201, (
+            'Под ASGI запись должна обрабатываться обычным вьюсетом.'
+        )
+        assert Review.objects.filter(title=titles[1], author=user).exists()
+
+    def test_asgi_disables_persistent_connections(self):
+        result = subprocess.run(
+            [sys.executable, '-c', (
+                'import api_yamdb.asgi\n'
+                'from django.conf import settings\n'
+                'print(settings.DATABASES["default"]["CONN_MAX_AGE"])'
+            )],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'api_yamdb.settings'}
+        )
+
+        assert result.stdout.strip() == '0', (
+            'Под ASGI соединение с базой должно жить один запрос.'
+        )
@@ -0,0 +1,49 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+
+
+@pytest.mark.django_db
+class Test14Middleware:
+
+    def test_api_skips_browser_middleware(self):
+        response = Client().get('/api/v1/categories/')
+
+        assert response.status_code == 200
+        assert not hasattr(response.wsgi_request, 'session'), (
+            'Запросы к API не должны проходить через SessionMiddleware.'
+        )
+        assert 'X-Frame-Options' not in response.headers
+        assert not response.cookies
+
+    def test_api_skips_browser_middleware_under_asgi(self):
+        response = async_to_sync(AsyncClient().get)('/api/v1/categories/')
+
+        assert response.status_code == 200
+        assert not hasattr(response.asgi_request, 'session')
+
+    def test_admin_keeps_middleware(self):
+        response = Client().get('/admin/login/')
+
+        assert response.status_code == 200
+        assert response.headers['X-Frame-Options'] == 'DENY', (
+            'Админка должна работать со всеми middleware.'
+        )
+        assert 'csrftoken' in response.cookies
+        assert hasattr(response.wsgi_request, 'session')
+
+    def test_admin_login(self, admin):
+        admin.is_staff = True
+        admin.save()
+        client = Client(enforce_csrf_checks=True)
+        page = client.get('/admin/login/')
+
+        response = client.post('/admin/login/', {
+            'username': admin.username,
+            'password': '1234567',
+            'csrfmiddlewaretoken': page.cookies['csrftoken'].value,
+        })
+
+        assert response.status_code == 302, (
+            'Вход в админку с CSRF-токеном должен работать.'
+        )
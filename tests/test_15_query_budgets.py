@@ -0,0 +1,245 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.test import AsyncClient, Client, override_settings
+from django.urls import URLPattern, get_resolver
+
+from api.queries import view_budget
+from reviews.models import Category, Comment, Genre, Review, Title
+
+ENDPOINTS = (
+    ('user_client', 'get', '/api/v1/categories/', None, 200),
+    ('admin_client', 'post', '/api/v1/categories/',
+     {'name': 'Новая', 'slug': 'new'}, 201),
+    ('admin_client', 'delete', '/api/v1/categories/{category}/', None, 204),
+    ('user_client', 'get', '/api/v1/genres/', None, 200),
+    ('admin_client', 'post', '/api/v1/genres/',
+     {'name': 'Новый', 'slug': 'new'}, 201),
+    ('admin_client', 'delete', '/api/v1/genres/{genre}/', None, 204),
+    ('user_client', 'get', '/api/v1/titles/', None, 200),
+    ('user_client', 'get', '/api/v1/titles/?genre={genre}', None, 200),
+    ('user_client', 'get', '/api/v1/titles/{title}/', None, 200),
+    ('admin_client', 'post', '/api/v1/titles/',
+     {'name': 'Новое', 'year': 2000, 'genre': ['{genre}'],
+      'category': '{category}'}, 201),
+    ('admin_client', 'patch', '/api/v1/titles/{title}/',
+     {'genre': ['{genre}']}, 200),
+    ('admin_client', 'delete', '/api/v1/titles/{title}/', None, 204),
+    ('admin_client', 'get', '/api/v1/users/', None, 200),
+    ('admin_client', 'post', '/api/v1/users/',
+     {'username': 'new', 'email': 'new@yamdb.fake'}, 201),
+    ('admin_client', 'get', '/api/v1/users/{username}/', None, 200),
+    ('admin_client', 'patch', '/api/v1/users/{username}/',
+     {'bio': 'Новое'}, 200),
+    ('admin_client', 'delete', '/api/v1/users/{username}/', None, 204),
+    ('user_client', 'get', '/api/v1/users/me/', None, 200),
+    ('user_client', 'patch', '/api/v1/users/me/', {'bio': 'Новое'}, 200),
+    ('user_client', 'get', '/api/v1/titles/{title}/reviews/', None, 200),
+    ('user_client', 'get', '/api/v1/titles/{title}/reviews/{review}/',
+     None, 200),
+    ('user_client', 'post', '/api/v1/titles/{other_title}/reviews/',
+     {'text': 'Отзыв', 'score': 5}, 201),
+    ('moderator_client', 'patch',
+     '/api/v1/titles/{title}/reviews/{review}/', {'score': 1}, 200),
+    ('moderator_client', 'delete',
+     '/api/v1/titles/{title}/reviews/{review}/', None, 204),
+    ('user_client', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/', None, 200),
+    ('user_client', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     None, 200),
+    ('user_client', 'post',
+     '/api/v1/titles/{title}/reviews/{review}/comments/',
+     {'text': 'Комментарий'}, 201),
+    ('moderator_client', 'patch',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     {'text': 'Исправлено'}, 200),
+    ('moderator_client', 'delete',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     None, 204),
+)
+
+
+@pytest.fixture
+def catalog(django_user_model, user):
+    """Данных больше страницы, чтобы N+1 был заметен в числе запросов."""
+    categories = Category.objects.bulk_create(
+        Category(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(12)
+    )
+    genres = Genre.objects.bulk_create(
+        Genre(name=f'Жанр {i}', slug=f'genre-{i}') for i in range(12)
+    )
+    titles = Title.objects.bulk_create(
+        Title(name=f'Произведение {i:02}', year=2000, category=category)
+        for i, category in enumerate(categories)
+    )
+    for title in titles:
+        title.genre.set(genres[:3])
+    authors = django_user_model.objects.bulk_create(
+        django_user_model(username=f'author{i}', email=f'a{i}@yamdb.fake')
+        for i in range(12)
+    )
+    reviews = Review.objects.bulk_create(
+        Review(title=titles[0], author=author, text='Отзыв', score=i % 10 + 1)
+        for i, author in enumerate(authors)
+    )
+    comments = Comment.objects.bulk_create(
+        Comment(review=reviews[0], author=author, text='Комментарий')
+        for author in authors
+    )
+    return {
+        'category': categories[0].slug,
+        'genre': genres[0].slug,
+        'title': titles[0].pk,
+        'other_title': titles[1].pk,
+        'review': reviews[0].pk,
+        'comment': comments[0].pk,
+        'username': authors[0].username,
+    }
+
+
+def fill(value, names):
+    if isinstance(value, str):
+        return value.format(**names)
+    if isinstance(value, list):
+        return [fill(item, names) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, names) for key, item in value.items()}
+    return value
+
+
+def api_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern):
+            yield pattern.callback
+        else:
+            yield from api_views(pattern.url_patterns)
+
+
+@pytest.mark.django_db
+class Test15QueryBudgets:
+
+    @pytest.mark.parametrize(
+        'client_name, method, url, data, status', ENDPOINTS
+    )
+    def test_endpoint_budgets(
+        self, request, catalog, assert_query_budget,
+        client_name, method, url, data, status
+    ):
+        client = request.getfixturevalue(client_name)
+
+        response = assert_query_budget(
+            getattr(client, method), fill(url, catalog),
+            data=fill(data, catalog), format='json'
+        )
+
+        assert response.status_code == status
+
+    # Письмо с EMAIL_OUTBOX_EAGER отправляется в on_commit, а он
+    # срабатывает только в транзакционном тесте.
+    @pytest.mark.django_db(transaction=True)
+    def test_auth_budgets(
+        self, user, user_client, assert_query_budget, settings
+    ):
+        settings.EMAIL_OUTBOX_EAGER = True
+
+        response = assert_query_budget(
+            user_client.post, '/api/v1/auth/signup/',
+            {'username': 'newuser', 'email': 'newuser@yamdb.fake'}
+        )
+        assert response.status_code == 200
+        assert len(mail.outbox) == 1
+
+        response = assert_query_budget(
+            Client().post, '/api/v1/auth/token/', {
+                'username': user.username,
+                'confirmation_code': default_token_generator.make_token(user)
+            }
+        )
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize(
+        'urlconf', ('api_yamdb.urls', 'api_yamdb.asgi_urls')
+    )
+    def test_every_endpoint_has_budget(self, urlconf):
+        missing = set()
+        for view in api_views(get_resolver(urlconf).url_patterns):
+            if not view.__module__.startswith('api.'):
+                continue
+            cls = getattr(view, 'cls', None)
+            for method in getattr(view, 'actions', None) or ('get',):
+                if cls is not None and method not in cls.http_method_names:
+                    continue
+                name, budget = view_budget(view, method)
+                if budget is None:
+                    missing.add(name)
+        assert not missing, (
+            f'Объявите бюджет запросов к базе для {", ".join(missing)}.'
+        )
+
+    @override_settings(QUERY_STATS=True)
+    def test_middleware_logs_violations(
+        self, catalog, monkeypatch, caplog
+    ):
+        from api.views import TitleViewSet
+
+        monkeypatch.setattr(TitleViewSet, 'query_budgets', {'list': 1})
+        with caplog.at_level(logging.DEBUG, logger='api.queries'):
+            Client().get('/api/v1/titles/')
+            Client().get('/api/v1/categories/')
+
+        warnings = [
+            record.getMessage() for record in caplog.records
+            if record.levelno == logging.WARNING
+        ]
+        assert len(warnings) == 1, (
+            'Превышение бюджета запросов должно попадать в лог api.queries.'
+        )
+        assert warnings[0].startswith('TitleViewSet.list /api/v1/titles/')
+        assert 'запросов' in warnings[0]
+
+    @override_settings(QUERY_STATS=True)
+    def test_middleware_counts_async_queries(
+        self, catalog, monkeypatch, caplog
+    ):
+        from api import async_views
+
+        monkeypatch.setattr(async_views.title_list, 'query_budget', 1)
+        with caplog.at_level(logging.WARNING, logger='api.queries'):
+            response = async_to_sync(AsyncClient().get)('/api/v1/titles/')
+
+        assert response.status_code == 200
+        assert [record.getMessage()[:30] for record in caplog.records] == [
+            'title_list /api/v1/titles/: бю'
+        ], 'Под ASGI запросы асинхронного ORM тоже должны учитываться.'
+
+    def test_async_middleware_stays_on_event_loop(self, catalog, monkeypatch):
+        from asgiref.sync import SyncToAsync
+
+        calls = []
+        call = SyncToAsync.__call__
+
+        async def counted(self, *args, **kwargs):
+            calls.append(self.func)
+            return await call(self, *args, **kwargs)
+
+        monkeypatch.setattr(SyncToAsync, '__call__', counted)
+
+        def hops(**overrides):
+            calls.clear()
+            with override_settings(**overrides):
+                async_to_sync(AsyncClient().get)('/api/v1/titles/')
+            return len(calls)
+
+        assert hops(
+            QUERY_STATS=True, METRICS_ENABLED=True, SLOW_QUERY_MS=10_000
+        ) == hops(
+            QUERY_STATS=False, METRICS_ENABLED=False, SLOW_QUERY_MS=None
+        ), (
+            'Учёт запросов к базе под ASGI не должен добавлять переходов '
+            'в поток sync_to_async.'
+        )
@@ -0,0 +1,68 @@
+import pytest
+from django.test import override_settings
+
+from reviews.models import Category, Title
+
+
+def parse(header):
+    timings = {}
+    for item in header.split(', '):
+        name, duration = item.split(';dur=')
+        timings[name] = float(duration)
+    return timings
+
+
+@pytest.mark.django_db
+class Test16ServerTiming:
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_breakdown(self, user_client):
+        category = Category.objects.create(name='Фильм', slug='movie')
+        title = Title.objects.create(
+            name='Произведение', year=2000, category=category
+        )
+
+        for url in (
+            '/api/v1/titles/',
+            f'/api/v1/titles/{title.pk}/',
+            '/api/v1/titles/999/',
+        ):
+            response = user_client.get(url)
+            assert 'Server-Timing' in response.headers, (
+                f'Ответ `{url}` должен содержать заголовок Server-Timing.'
+            )
+            timings = parse(response.headers['Server-Timing'])
+            assert set(timings) == {
+                'auth', 'perm', 'db', 'serialize', 'render'
+            }
+            assert all(duration >= 0 for duration in timings.values())
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_rejected_request(self, client):
+        response = client.post('/api/v1/categories/', {})
+
+        assert response.status_code == 401
+        assert set(parse(response.headers['Server-Timing'])) == {
+            'auth', 'perm', 'render'
+        }, 'Без обработчика действия в Server-Timing нет db и serialize.'
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self, client):
+        response = client.get('/api/v1/titles/')
+
+        assert response.status_code == 200
+        assert 'Server-Timing' not in response.headers
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.5)
+    def test_sampling(self, client, monkeypatch):
+        values = iter((0.3, 0.7))
+        monkeypatch.setattr('api.timing.random.random', lambda: next(values))
+
+        sampled = client.get('/api/v1/genres/')
+        skipped = client.get('/api/v1/genres/')
+
+        assert 'Server-Timing' in sampled.headers
+        assert 'Server-Timing' not in skipped.headers, (
+            'Server-Timing должен добавляться только к доле ответов '
+            'SERVER_TIMING_SAMPLE_RATE.'
+        )
@@ -0,0 +1,133 @@
+import multiprocessing
+import re
+
+import pytest
+from django.core.cache import cache
+
+from api.metrics import LATENCY_BUCKETS, Metrics
+
+
+def samples(text):
+    """{'имя{метки}': значение} из ответа в формате Prometheus."""
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in text.splitlines() if line and not line.startswith('#')
+    }
+
+
+def record(directory, count):
+    metrics = Metrics(directory)
+    for _ in range(count):
+        metrics.inc('yamdb_requests_total', {'view': 'signup'})
+        metrics.observe(
+            'yamdb_request_duration_seconds', {'view': 'signup'}, 0.02,
+            LATENCY_BUCKETS
+        )
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr('api.metrics.metrics', metrics)
+    monkeypatch.setattr('api.views.app_metrics', metrics)
+    return metrics
+
+
+@pytest.mark.django_db
+class Test17Metrics:
+
+    def test_endpoint_requires_admin(self, client, user_client):
+        assert client.get('/api/v1/metrics/').status_code == 401
+        assert user_client.get('/api/v1/metrics/').status_code == 403, (
+            'Метрики должны быть доступны только администраторам.'
+        )
+
+    def test_requests_are_counted(self, metrics, client, admin_client):
+        for _ in range(3):
+            client.get('/api/v1/titles/')
+        client.post('/api/v1/categories/', {})
+
+        response = admin_client.get('/api/v1/metrics/')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        values = samples(response.content.decode())
+        labels = 'route="api/v1/titles/",view="TitleViewSet.list"'
+        assert values[
+            'yamdb_requests_total{method="GET",route="api/v1/titles/",'
+            'status="200",view="TitleViewSet.list"}'
+        ] == 3, 'Ручка метрик должна считать запросы по вьюхам и кодам.'
+        assert values[
+            'yamdb_requests_total{method="POST",'
+            'route="api/v1/categories/",status="401",'
+            'view="CategoryViewSet.create"}'
+        ] == 1
+        assert values[
+            'yamdb_request_duration_seconds_bucket{' + labels + ',le="+Inf"}'
+        ] == 3
+        assert values[
+            'yamdb_request_duration_seconds_count{' + labels + '}'
+        ] == 3
+        assert values[
+            'yamdb_db_queries_per_request_count{' + labels + '}'
+        ] == 3
+        assert values[
+            'yamdb_db_queries_per_request_sum{' + labels + '}'
+        ] == 3, 'На пустом списке выполняется только COUNT.'
+
+    def test_cache_hits(self, metrics):
+        cache.set('key', 'value')
+        assert cache.get('key') == 'value'
+        assert cache.get('missing', 'default') == 'default'
+        assert cache.get('key') == 'value'
+
+        values = samples(metrics.render())
+
+        assert values['yamdb_cache_gets_total{result="hit"}'] == 2
+        assert values['yamdb_cache_gets_total{result="miss"}'] == 1
+
+    def test_histogram_is_cumulative(self):
+        metrics = Metrics()
+        for value in (0.001, 0.02, 0.02, 20):
+            metrics.observe('yamdb_request_duration_seconds', {}, value,
+                            LATENCY_BUCKETS)
+
+        values = samples(metrics.render())
+
+        assert values['yamdb_request_duration_seconds_bucket{le="0.005"}'] == 1
+        assert values['yamdb_request_duration_seconds_bucket{le="0.025"}'] == 3
+        assert values['yamdb_request_duration_seconds_bucket{le="+Inf"}'] == 4
+        assert values['yamdb_request_duration_seconds_count'] == 4
+        assert values['yamdb_request_duration_seconds_sum'] == pytest.approx(
+            20.041
+        )
+
+    def test_processes_are_aggregated(self, tmp_path):
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=record, args=(tmp_path, count))
+            for count in (2000, 3000, 5000)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        values = samples(Metrics(tmp_path).render())
+
+        assert len(list(tmp_path.iterdir())) == 3
+        assert values['yamdb_requests_total{view="signup"}'] == 10000, (
+            'Метрики процессов из METRICS_DIR должны складываться.'
+        )
+        assert values[
+            'yamdb_request_duration_seconds_count{view="signup"}'
+        ] == 10000
+
+    def test_labels_are_escaped(self):
+        metrics = Metrics()
+        metrics.inc('yamdb_requests_total', {'route': 'a"b\\c'})
+
+        assert re.search(
+            r'^yamdb_requests_total\{route="a\\"b\\\\c"\} 1$',
+            metrics.render(), re.MULTILINE
+        )
@@ -0,0 +1,85 @@
+
+import pytest
+from django.test import Client, override_settings
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.fixture
+def slow_log(json_log):
+    """Строки лога api.slow_queries, записанные во время теста."""
+    return json_log('api.slow_queries')
+
+
+@pytest.mark.django_db
+class Test18SlowQueries:
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_queries_are_logged_with_plan(self, client, slow_log):
+        category = Category.objects.create(name='Фильм', slug='movie')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(
+            name='Произведение', year=2000, category=category
+        )
+        title.genre.add(genre)
+
+        response = client.get('/api/v1/titles/?genre=drama&year=2000')
+
+        assert response.status_code == 200
+        entries = slow_log()
+        assert entries, (
+            'Запросы дольше SLOW_QUERY_MS должны попадать в лог '
+            'api.slow_queries.'
+        )
+        count = entries[0]
+        assert count['view'] == 'TitleViewSet.list'
+        assert count['method'] == 'GET'
+        assert count['path'] == '/api/v1/titles/'
+        assert count['database'] == 'default'
+        assert 'COUNT' in count['sql']
+        assert count['params'] == ['drama', 2000]
+        assert count['duration_ms'] >= 0
+        assert count['plan'] and all(
+            isinstance(line, str) for line in count['plan']
+        ), 'В запись должен попадать план EXPLAIN QUERY PLAN.'
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_writes_are_logged_without_plan(self, admin_client, slow_log):
+        admin_client.post(
+            '/api/v1/categories/', {'name': 'Фильм', 'slug': 'movie'}
+        )
+
+        inserts = [
+            entry for entry in slow_log()
+            if entry['sql'].startswith('INSERT')
+        ]
+        assert len(inserts) == 1
+        assert inserts[0]['view'] == 'CategoryViewSet.create'
+        assert inserts[0]['plan'] is None
+
+    def test_explain_is_not_counted(self, slow_log):
+        category = Category.objects.create(name='Фильм', slug='movie')
+        Title.objects.create(name='Произведение', year=2000, category=category)
+
+        def query_stats(slow_query_ms):
+            # Middleware включаются при создании обработчика клиента.
+            with override_settings(
+                QUERY_STATS=True, SLOW_QUERY_MS=slow_query_ms
+            ):
+                return Client().get('/api/v1/titles/').wsgi_request.query_stats
+
+        plain = query_stats(None)
+        logged = query_stats(0)
+
+        assert len(slow_log()) == plain.count
+        assert logged.count == plain.count, (
+            'EXPLAIN журнала медленных запросов не должен попадать в '
+            'учёт запросов вьюхи.'
+        )
+        assert not any('EXPLAIN' in sql for sql in logged.statements)
+
+    @override_settings(SLOW_QUERY_MS=10_000)
+    def test_fast_queries_are_skipped(self, client, slow_log):
+        client.get('/api/v1/titles/')
+
+        assert slow_log() == []
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from django.test import override_settings
+
+from api.capture import pseudonym
+
+
+@pytest.fixture
+def captured(json_log):
+    """Строки лога api.capture, записанные во время теста."""
+    return json_log('api.capture')
+
+
+@pytest.mark.django_db
+class Test19RequestCapture:
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=1)
+    def test_requests_are_captured(self, admin_client, admin, captured):
+        admin_client.get('/api/v1/titles/?year=2000')
+        admin_client.post(
+            '/api/v1/categories/', {'name': 'Фильм', 'slug': 'movie'},
+            format='json'
+        )
+
+        read, write = captured()
+        assert read['method'] == 'GET'
+        assert read['path'] == '/api/v1/titles/?year=2000', (
+            'Путь должен записываться вместе со строкой запроса.'
+        )
+        assert read['route'] == 'api/v1/titles/'
+        assert read['role'] == admin.role
+        assert read['body'] is None
+        assert read['status'] == 200
+        assert read['duration_ms'] >= 0
+        assert write['body'] == {'name': 'Фильм', 'slug': 'movie'}
+        assert write['status'] == 201
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=1)
+    def test_secrets_are_redacted(self, client, captured):
+        client.post(
+            '/api/v1/auth/token/',
+            {'username': 'user', 'confirmation_code': 'secret'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer token',
+        )
+
+        entry, = captured()
+        assert entry['body'] == {
+            'username': pseudonym('user'), 'confirmation_code': '***'
+        }, 'Коды подтверждения не должны попадать в лог.'
+        assert 'Bearer' not in json.dumps(entry), (
+            'Заголовки с токенами не должны попадать в лог.'
+        )
+        assert entry['role'] is None
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=1)
+    def test_personal_data_is_pseudonymized(
+        self, client, admin_client, user, captured
+    ):
+        client.post(
+            '/api/v1/auth/signup/',
+            {'username': 'new_user', 'email': 'New@Example.com'},
+            content_type='application/json',
+        )
+        client.post(
+            '/api/v1/auth/signup/',
+            {'username': 'new_user', 'email': 'new@example.com'},
+            content_type='application/json',
+        )
+        admin_client.post('/api/v1/batch/', {'requests': [{
+            'method': 'POST', 'path': '/api/v1/users/',
+            'body': {'username': 'other', 'email': 'other@example.com'},
+        }]}, format='json')
+        admin_client.get(f'/api/v1/users/{user.username}/')
+
+        first, second, batch, detail = captured()
+        assert 'new_user' not in json.dumps(first), (
+            'Имена пользователей не должны попадать в лог.'
+        )
+        assert 'example.com' in first['body']['email']
+        assert 'new@' not in first['body']['email'].lower(), (
+            'Email не должен попадать в лог.'
+        )
+        assert first['body'] == second['body'], (
+            'Одно и то же значение должно заменяться одним псевдонимом.'
+        )
+        assert 'other' not in json.dumps(batch['body']), (
+            'Вложенные тела, например подзапросы пакета, тоже скрываются.'
+        )
+        assert user.username not in detail['path']
+        assert detail['path'].startswith('/api/v1/users/user-')
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=1)
+    def test_only_api_is_captured(self, client, captured):
+        client.get('/redoc/')
+
+        assert captured() == []
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=0)
+    def test_disabled_by_default(self, client, captured):
+        client.get('/api/v1/titles/')
+
+        assert captured() == []
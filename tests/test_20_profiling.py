@@ -0,0 +1,108 @@
+import json
+import pstats
+import sys
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+
+from api.queries import collectors
+from api.views import TitleViewSet
+from reviews.models import Category, Genre, Title
+
+
+@pytest.fixture
+def titles():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    for year in (1999, 2000, 2000):
+        title = Title.objects.create(
+            name=f'Произведение {year}', year=year, category=category
+        )
+        title.genre.add(genre)
+
+
+def functions(tree):
+    for node in tree:
+        yield node['function']
+        yield from functions(node['children'])
+
+
+@pytest.mark.django_db
+class Test20Profiling:
+
+    def test_admin_gets_profile(self, admin_client, titles):
+        response = admin_client.get('/api/v1/titles/?year=2000&profile=1')
+
+        assert response.status_code == 200
+        report = json.loads(response.content)
+        assert report['view'] == 'TitleViewSet.list'
+        assert report['path'] == '/api/v1/titles/?year=2000&profile=1'
+        assert report['status'] == 200, (
+            'В профиле должен быть код исходного ответа.'
+        )
+        assert report['duration_ms'] > 0
+        assert report['sql_count'] == len(report['sql']) == 3
+        assert 'COUNT' in report['sql'][0]['sql']
+        assert report['sql'][0]['params'] == [2000]
+        assert report['functions'], 'В профиле должны быть функции.'
+        assert any(
+            'list' in name for name in functions(report['tree'])
+        ), 'Дерево вызовов должно доходить до обработчика действия.'
+        assert report['file'] is None
+
+    def test_header_enables_profile(self, admin_client, titles):
+        response = admin_client.get('/api/v1/titles/', HTTP_X_PROFILE='1')
+
+        assert json.loads(response.content)['view'] == 'TitleViewSet.list'
+
+    @pytest.mark.parametrize('client_name', ('client', 'user_client'))
+    def test_only_admins_get_profile(self, request, client_name, titles):
+        response = request.getfixturevalue(client_name).get(
+            '/api/v1/titles/?profile=1', HTTP_X_PROFILE='1'
+        )
+
+        assert response.status_code == 200
+        assert response.json()['count'] == 3, (
+            'Профиль должен быть доступен только администраторам, '
+            'остальные получают обычный ответ.'
+        )
+
+    def test_failed_request_stops_profiler(
+        self, admin_client, titles, monkeypatch
+    ):
+        def fail(*args, **kwargs):
+            raise RuntimeError('Ошибка вьюхи')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(TitleViewSet, 'list', fail)
+            with pytest.raises(RuntimeError):
+                admin_client.get('/api/v1/titles/?profile=1')
+
+        assert sys.getprofile() is None, (
+            'Профилировщик должен выключаться, даже если вьюха упала.'
+        )
+        assert collectors.get() == (), (
+            'Учёт запросов профиля должен сниматься, даже если вьюха упала.'
+        )
+        response = admin_client.get('/api/v1/titles/?profile=1')
+        assert json.loads(response.content)['view'] == 'TitleViewSet.list'
+
+    def test_profile_is_saved(self, admin_client, titles, tmp_path):
+        with override_settings(PROFILE_DIR=str(tmp_path)):
+            response = admin_client.get('/api/v1/categories/?profile=1')
+
+        path = json.loads(response.content)['file']
+        assert path.startswith(str(tmp_path))
+        assert path.endswith('-CategoryViewSet.list.prof')
+        assert pstats.Stats(path).total_tt > 0
+
+    def test_async_views_fall_back(self, token_admin, titles):
+        response = async_to_sync(AsyncClient().get)(
+            '/api/v1/titles/?profile=1',
+            headers={'Authorization': f'Bearer {token_admin["access"]}'}
+        )
+
+        assert json.loads(response.content)['view'] == 'TitleViewSet.list', (
+            'Под ASGI запрос профиля должен уходить синхронному вьюсету.'
+        )
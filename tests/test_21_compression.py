@@ -0,0 +1,118 @@
+import gzip
+import json
+from importlib import import_module, reload
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+from api_yamdb.compression import ENCODINGS, negotiate
+from reviews.models import Category, Title
+
+
+@pytest.fixture
+def titles():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    Title.objects.bulk_create(
+        Title(
+            name=f'Произведение {i}', year=2000, category=category,
+            description='Длинное описание произведения. ' * 10
+        )
+        for i in range(20)
+    )
+
+
+def reload_urls():
+    clear_url_caches()
+    reload(import_module(settings.ROOT_URLCONF))
+
+
+@pytest.mark.django_db
+class Test21Compression:
+
+    def test_large_api_responses_are_compressed(self, client, titles):
+        plain = client.get('/api/v1/titles/')
+        response = client.get(
+            '/api/v1/titles/', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+
+        assert response['Content-Encoding'] == 'gzip', (
+            'Большие ответы API должны сжиматься, если клиент принимает gzip.'
+        )
+        assert 'Accept-Encoding' in response['Vary']
+        assert int(response['Content-Length']) == len(response.content)
+        assert len(response.content) < len(plain.content)
+        assert json.loads(gzip.decompress(response.content)) == plain.json()
+
+    def test_small_responses_are_not_compressed(self, client):
+        response = client.get(
+            '/api/v1/categories/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        assert len(response.content) < settings.COMPRESS_MIN_SIZE
+        assert not response.has_header('Content-Encoding')
+
+    @pytest.mark.parametrize('accept_encoding', ('', 'identity', 'gzip;q=0'))
+    def test_compression_is_negotiated(self, client, titles, accept_encoding):
+        response = client.get(
+            '/api/v1/titles/', HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+
+        assert not response.has_header('Content-Encoding')
+        assert response.json()['count'] == 20
+
+    @pytest.mark.parametrize('accept_encoding, available, expected', (
+        ('gzip, br', ('br', 'gzip'), 'br'),
+        ('gzip, br;q=0.5', ('br', 'gzip'), 'gzip'),
+        ('br', ('gzip',), None),
+        ('*', ('br', 'gzip'), 'br'),
+        ('*, gzip;q=0', ('gzip',), None),
+        ('GZIP ; q=0.8', ('gzip',), 'gzip'),
+    ))
+    def test_negotiate(self, accept_encoding, available, expected):
+        assert negotiate(accept_encoding, available) == expected
+
+    def test_static_files_are_precompressed(self, client, tmp_path):
+        with override_settings(STATIC_ROOT=tmp_path):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            compressed = client.get(
+                '/static/redoc.yaml', HTTP_ACCEPT_ENCODING='gzip'
+            )
+            plain = client.get('/static/redoc.yaml')
+
+        source = (settings.BASE_DIR / 'static' / 'redoc.yaml').read_bytes()
+        assert (tmp_path / 'redoc.yaml.gz').exists(), (
+            'collectstatic должен сохранять сжатые варианты статики.'
+        )
+        assert compressed['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in compressed['Vary']
+        assert gzip.decompress(
+            b''.join(compressed.streaming_content)
+        ) == source
+        assert not plain.has_header('Content-Encoding')
+        assert b''.join(plain.streaming_content) == source
+
+    @pytest.mark.parametrize('enabled', (True, False))
+    def test_static_route_is_optional(self, client, tmp_path, enabled):
+        (tmp_path / 'redoc.yaml').write_text('openapi: 3.0.2\n')
+        try:
+            with override_settings(SERVE_STATIC=enabled, STATIC_ROOT=tmp_path):
+                reload_urls()
+                response = client.get('/static/redoc.yaml')
+        finally:
+            reload_urls()
+
+        assert response.status_code == (200 if enabled else 404), (
+            'Django должен отдавать /static/ только при SERVE_STATIC, '
+            'иначе статику отдаёт сервер перед приложением.'
+        )
+
+    @pytest.mark.skipif('br' not in ENCODINGS, reason='brotli не установлен')
+    def test_brotli_is_preferred(self, client, titles):
+        response = client.get(
+            '/api/v1/titles/', HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+
+        assert response['Content-Encoding'] == 'br'
@@ -0,0 +1,160 @@
+import threading
+
+import pytest
+from django.test import override_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from api import batch
+from reviews.models import Category, Genre, Title
+
+URL = '/api/v1/batch/'
+
+
+@pytest.fixture
+def catalog():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    Genre.objects.create(name='Драма', slug='drama')
+    Title.objects.create(name='Произведение', year=2000, category=category)
+
+
+def get(path):
+    return {'method': 'GET', 'path': path}
+
+
+# Подзапросы выполняются в потоках пула со своими соединениями, поэтому
+# данные теста должны быть закоммичены.
+@pytest.mark.django_db(transaction=True)
+class Test22Batch:
+
+    def test_boot_sequence(self, user_client, user, catalog):
+        paths = (
+            '/api/v1/categories/', '/api/v1/genres/',
+            '/api/v1/titles/?year=2000', '/api/v1/users/me/',
+        )
+
+        response = user_client.post(
+            URL, {'requests': [get(path) for path in paths]}, format='json'
+        )
+
+        assert response.status_code == 200
+        responses = response.json()['responses']
+        assert [item['status'] for item in responses] == [200] * 4
+        assert responses == [
+            {'status': 200, 'body': user_client.get(path).json()}
+            for path in paths
+        ], 'Ответы пакета должны совпадать с ответами отдельных запросов.'
+        assert responses[3]['body']['username'] == user.username
+
+    def test_authenticates_once(self, user_client, monkeypatch):
+        calls = []
+        authenticate = JWTAuthentication.authenticate
+
+        def counted(self, request):
+            calls.append(request.path)
+            return authenticate(self, request)
+
+        monkeypatch.setattr(JWTAuthentication, 'authenticate', counted)
+        user_client.post(URL, {'requests': [
+            get('/api/v1/users/me/'), get('/api/v1/categories/'),
+        ]}, format='json')
+
+        assert calls == [URL], (
+            'JWT должен проверяться один раз на весь пакет.'
+        )
+
+    def test_anonymous_batch(self, client):
+        response = client.post(URL, {'requests': [
+            get('/api/v1/categories/'), get('/api/v1/users/me/'),
+        ]}, content_type='application/json')
+
+        assert [item['status'] for item in response.json()['responses']] == [
+            200, 401
+        ]
+
+    def test_writes_are_ordered(self, admin_client):
+        response = admin_client.post(URL, {'requests': [
+            {'method': 'POST', 'path': '/api/v1/categories/',
+             'body': {'name': 'Книга', 'slug': 'book'}},
+            get('/api/v1/categories/'),
+            {'method': 'DELETE', 'path': '/api/v1/categories/book/'},
+            get('/api/v1/categories/'),
+        ]}, format='json')
+
+        created, listed, deleted, relisted = response.json()['responses']
+        assert created['status'] == 201
+        assert listed['body']['results'] == [created['body']], (
+            'Чтение после записи в пакете должно видеть эту запись.'
+        )
+        assert deleted == {'status': 204, 'body': None}
+        assert relisted['body']['count'] == 0
+
+    def test_reads_run_concurrently(self, client, monkeypatch):
+        barrier = threading.Barrier(2, timeout=5)
+        dispatch = batch.dispatch
+
+        def waiting(request, item):
+            barrier.wait()
+            return dispatch(request, item)
+
+        monkeypatch.setattr(batch, 'dispatch', waiting)
+        response = client.post(URL, {'requests': [
+            get('/api/v1/categories/'), get('/api/v1/genres/'),
+        ]}, content_type='application/json')
+
+        assert response.status_code == 200, (
+            'Идущие подряд чтения должны выполняться параллельно.'
+        )
+
+    def test_unknown_path(self, client):
+        response = client.post(
+            URL, {'requests': [get('/api/v1/unknown/')]},
+            content_type='application/json'
+        )
+
+        assert response.json()['responses'][0]['status'] == 404
+
+    @pytest.mark.parametrize('requests', (
+        [],
+        [get('/admin/')],
+        [get(URL)],
+        [{'method': 'PUT', 'path': '/api/v1/categories/'}],
+    ))
+    def test_invalid_batch(self, client, requests):
+        response = client.post(
+            URL, {'requests': requests}, content_type='application/json'
+        )
+
+        assert response.status_code == 400
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_is_limited(self, client):
+        response = client.post(
+            URL, {'requests': [get('/api/v1/genres/')] * 3},
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+
+    def test_failed_item_does_not_fail_batch(self, admin_client, monkeypatch):
+        dispatch = batch.dispatch
+
+        def failing(request, item):
+            if item['path'] == '/api/v1/genres/':
+                raise RuntimeError('сбой вьюхи')
+            return dispatch(request, item)
+
+        monkeypatch.setattr(batch, 'dispatch', failing)
+        response = admin_client.post(URL, {'requests': [
+            {'method': 'POST', 'path': '/api/v1/categories/',
+             'body': {'name': 'Книга', 'slug': 'book'}},
+            get('/api/v1/genres/'),
+            get('/api/v1/categories/'),
+        ]}, format='json')
+
+        assert response.status_code == 200
+        assert [item['status'] for item in response.json()['responses']] == [
+            201, 500, 200
+        ], (
+            'Исключение в подзапросе должно давать 500 только ему, чтобы '
+            'клиент видел, какие записи выполнены.'
+        )
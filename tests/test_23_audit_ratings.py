@@ -0,0 +1,93 @@
+import csv
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Max
+
+from api.views import TitleViewSet
+from reviews.models import Category, Review, Title
+from reviews.ratings import RatingTotals, split_range
+
+
+@pytest.fixture
+def reviews(user, moderator, admin):
+    category = Category.objects.create(name='Фильм', slug='movie')
+    rated, unrated = Title.objects.bulk_create(
+        Title(name=name, year=2000, category=category)
+        for name in ('С отзывами', 'Без отзывов')
+    )
+    Review.objects.bulk_create(
+        Review(title=rated, author=author, score=score, text='Отзыв')
+        for author, score in ((user, 10), (moderator, 7), (admin, 7))
+    )
+    return rated, unrated
+
+
+def audit(**options):
+    out = StringIO()
+    call_command('audit_ratings', stdout=out, **options)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class Test23AuditRatings:
+
+    def test_consistent_ratings(self, client, reviews, tmp_path):
+        rated, unrated = reviews
+        output = audit(output=tmp_path / 'ratings.csv', chunk_size=2)
+
+        assert 'default: расхождений нет.' in output
+        assert client.get(f'/api/v1/titles/{rated.id}/').json()[
+            'rating'
+        ] == 8
+        with open(tmp_path / 'ratings.csv', encoding='utf-8') as file:
+            rows = {row['id']: row for row in csv.DictReader(file)}
+        assert rows[str(rated.id)]['reviews'] == '3'
+        assert rows[str(rated.id)]['rating'] == '8.0'
+        assert rows[str(rated.id)]['score_7'] == '2', (
+            'CSV должен содержать распределение оценок произведения.'
+        )
+        assert rows[str(unrated.id)]['rating'] == ''
+
+    def test_api_mismatch_is_reported(self, reviews, monkeypatch):
+        rated, _ = reviews
+        monkeypatch.setattr(
+            TitleViewSet, 'queryset',
+            Title.objects.annotate(rating=Max('reviews__score'))
+        )
+
+        out = StringIO()
+
+        with pytest.raises(CommandError, match='Найдено расхождений: 1'):
+            call_command('audit_ratings', stdout=out)
+        assert f'id={rated.id}: API 10, пересчёт 8' in out.getvalue(), (
+            'Аудит должен показывать, чем рейтинг в API отличается '
+            'от пересчитанного.'
+        )
+
+    def test_invalid_scores_are_reported(self, reviews):
+        Review.objects.filter(score=10).update(score=11)
+
+        with pytest.raises(CommandError):
+            audit()
+
+    def test_ranges_add_up(self):
+        assert split_range(1, 10, 3) == [(1, 5), (5, 9), (9, 11)]
+        assert split_range(None, None, 3) == []
+        title_ids = np.array([1, 2, 1, 3, 1])
+        scores = np.array([5, 6, 7, 10, 0])
+        whole = RatingTotals(4)
+        whole.add(title_ids, scores)
+        parts = RatingTotals(4)
+        for start, stop in split_range(0, 4, 2):
+            part = RatingTotals(4)
+            part.add(title_ids[start:stop], scores[start:stop])
+            parts.merge(part)
+
+        for name in ('counts', 'sums', 'distribution', 'invalid'):
+            assert (getattr(parts, name) == getattr(whole, name)).all()
+        assert whole.invalid.tolist() == [0, 1, 0, 0]
+        assert whole.ratings()[1] == 4
+        assert np.isnan(whole.ratings()[0])